@@ -1,15 +1,17 @@
 from datetime import datetime, timedelta
 from typing import Optional, Union
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-from fastapi import HTTPException, status, Depends
+from fastapi import HTTPException, status, Depends, Header
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, bindparam
+from sqlalchemy.orm import make_transient_to_detached
 import os
+import hmac
+import asyncio
 from dotenv import load_dotenv
 
 from data.database import get_db
+from data.cache import Cache
 from models import User
 
 load_dotenv()
@@ -18,23 +20,46 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Diagnostics endpoints are disabled unless this is set
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+# How long an authenticated user's row may be served from the cache
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing context, created on first use by get_pwd_context
+pwd_context = None
 
 # JWT token security
 security = HTTPBearer()
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+# Runs on every authenticated request, so it is built and compiled only once
+USER_BY_ID = select(User).where(User.id == bindparam("user_id"))
+
+# User rows by id, without the password hash; any committed change to the user drops its entry
+user_cache = Cache("auth_user", ttl=AUTH_CACHE_TTL)
+user_cache.invalidated_by(User, lambda user: user.id)
+CACHED_USER_COLUMNS = ["id", "email", "username", "is_active", "created_at"]
+
+def get_pwd_context():
+    """bcrypt context; passlib is imported on first use to keep imports of this module cheap"""
+    global pwd_context
+    if pwd_context is None:
+        from passlib.context import CryptContext
+        pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return pwd_context
+
+# bcrypt is slow on purpose (~100ms of CPU) and releases the GIL, so it runs in a worker thread
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    return await asyncio.to_thread(lambda: get_pwd_context().verify(plain_password, hashed_password))
 
-def get_password_hash(password: str) -> str:
+async def get_password_hash(password: str) -> str:
     """Hash a password"""
-    return pwd_context.hash(password)
+    return await asyncio.to_thread(lambda: get_pwd_context().hash(password))
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token"""
+    from jose import jwt
+
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -47,6 +72,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 
 def verify_token(token: str) -> Optional[dict]:
     """Verify and decode a JWT token"""
+    from jose import JWTError, jwt
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload
@@ -64,25 +91,30 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    try:
-        payload = verify_token(credentials.credentials)
-        if payload is None:
-            raise credentials_exception
-        
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-        
-    except JWTError:
+    # verify_token returns None for any invalid or expired token
+    payload = verify_token(credentials.credentials)
+    if payload is None:
         raise credentials_exception
     
-    # Get user from database
-    query = select(User).where(User.id == user_id)
-    result = await db.execute(query)
-    user = result.scalar_one_or_none()
+    user_id: str = payload.get("sub")
+    if user_id is None:
+        raise credentials_exception
     
-    if user is None:
+    async def load_user_row():
+        result = await db.execute(USER_BY_ID, {"user_id": user_id})
+        loaded = result.scalar_one_or_none()
+        return {column: getattr(loaded, column) for column in CACHED_USER_COLUMNS} if loaded else None
+
+    row = await user_cache.get_or_load(user_id, "row", load_user_row)
+    if row is None:
         raise credentials_exception
+
+    # Attach the cached row to the session without a query; on a miss this
+    # returns the instance the loader put in the identity map. The password
+    # hash stays unloaded and must be refreshed by the code that needs it.
+    user = User(**row)
+    make_transient_to_detached(user)
+    user = await db.merge(user, load=False)
     
     if not user.is_active:
         raise HTTPException(
@@ -99,4 +131,16 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Inactive user"
         )
-    return current_user 
\ No newline at end of file
+    return current_user
+
+def is_admin_token(token: Optional[str]) -> bool:
+    """Check a token against the configured ADMIN_TOKEN"""
+    return bool(ADMIN_TOKEN and token and hmac.compare_digest(token, ADMIN_TOKEN))
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Allow access only with the configured X-Admin-Token"""
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
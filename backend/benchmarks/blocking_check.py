@@ -0,0 +1,115 @@
+"""
+CI check for code that blocks the event loop.
+
+Starts serve.py with one worker, with the loop watchdog (utils.loop_watchdog)
+writing every stall to a report file. It then runs benchmarks.load
+against the server, stops it, and lists every code site that blocked the
+loop for longer than --threshold-ms:
+
+    python -m benchmarks.blocking_check
+    python -m benchmarks.blocking_check --scenarios dashboard,transactions --duration 60
+    python -m benchmarks.blocking_check --allow "services/local_coach.py"
+
+Needs the same setup as the load test: a seeded database (benchmarks.seed)
+and, for the coach scenario, benchmarks.llm_stub with OPENAI_BASE_URL
+exported. Exits non-zero when a site that no --allow pattern matches
+blocked the loop, printing its stack, so new blocking calls are caught
+before release.
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from benchmarks.load import SCENARIOS
+from benchmarks.scaling import BACKEND_DIR, wait_ready
+
+def run_server_under_load(report: str, args: argparse.Namespace) -> None:
+    base_url = f"http://127.0.0.1:{args.port}"
+    env = {
+        **os.environ,
+        "LOOP_WATCHDOG": "true",
+        "LOOP_WATCHDOG_REPORT": report,
+        "BLOCKING_THRESHOLD_MS": str(args.threshold_ms),
+        # Every request has to run; a shed request cannot reveal a blocking call
+        "LOAD_SHEDDING": "false",
+    }
+    server = subprocess.Popen([
+        sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(args.port),
+        "--workers", "1", "--max-requests", "0"
+    ], cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(base_url, server)
+        # Lazily loaded libraries finish importing in the background after readiness
+        time.sleep(args.settle)
+        load = subprocess.run([
+            sys.executable, "-m", "benchmarks.load", "--base-url", base_url, "--scenarios", args.scenarios,
+            "--users", str(args.users), "--duration", str(args.duration), "--warmup", str(args.warmup),
+            "--population", str(args.population)
+        ], cwd=BACKEND_DIR, stdout=subprocess.DEVNULL)
+        if load.returncode != 0:
+            raise SystemExit(f"Load generator failed with code {load.returncode}")
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=90)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+
+def group_by_site(report: str) -> Dict[str, Dict[str, Any]]:
+    sites: Dict[str, Dict[str, Any]] = {}
+    if not os.path.exists(report):
+        return sites
+    with open(report) as f:
+        for line in f:
+            stall = json.loads(line)
+            site = sites.setdefault(stall["site"], {"count": 0, "max_ms": 0.0, "total_ms": 0.0, "stack": stall["stack"]})
+            site["count"] += 1
+            site["total_ms"] += stall["blocked_ms"]
+            if stall["blocked_ms"] > site["max_ms"]:
+                site["max_ms"] = stall["blocked_ms"]
+                site["stack"] = stall["stack"]
+    return sites
+
+def main(args: argparse.Namespace) -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        report = os.path.join(tmp, "blocking.jsonl")
+        run_server_under_load(report, args)
+        sites = group_by_site(report)
+
+    allowed: List[str] = args.allow or []
+    violations = [site for site in sites if not any(pattern in site for pattern in allowed)]
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"threshold_ms": args.threshold_ms, "sites": sites, "violations": violations}, f, indent=2)
+    if not sites:
+        print(f"No callback blocked the event loop for more than {args.threshold_ms:g}ms")
+        return 0
+
+    print(f"{'count':>6} {'max ms':>8} {'total ms':>9}  site")
+    for site, stats in sorted(sites.items(), key=lambda item: -item[1]["total_ms"]):
+        marker = "" if site in violations else "  (allowed)"
+        print(f"{stats['count']:>6} {stats['max_ms']:>8.0f} {stats['total_ms']:>9.0f}  {site}{marker}")
+    for site in violations:
+        print(f"\n{site}, longest stall:\n{''.join(sites[site]['stack'])}")
+    return 1 if violations else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fail when request handling blocks the event loop under load")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users per scenario")
+    parser.add_argument("--population", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=5.0)
+    parser.add_argument("--threshold-ms", type=float, default=100.0)
+    parser.add_argument("--settle", type=float, default=3.0, help="Seconds to wait after readiness before the load starts")
+    parser.add_argument("--allow", action="append", help="Substring of a site that may block (repeatable)")
+    parser.add_argument("--port", type=int, default=8200)
+    parser.add_argument("--output", help="Also write the grouped report as JSON")
+    sys.exit(main(parser.parse_args()))
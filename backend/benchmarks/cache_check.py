@@ -0,0 +1,187 @@
+"""
+Behaviour check for the cache backends.
+
+Runs the same checks against the in-memory backend and a Redis-protocol
+server: the local stand-in (benchmarks.redis_stub) by default, or a real
+server given with --redis-url:
+
+    python -m benchmarks.cache_check
+    python -m benchmarks.cache_check --redis-url redis://localhost:6379/0
+
+Checked: values round-trip, entries expire with their TTL, invalidating a
+scope forces a reload and leaves other scopes alone, a load racing an
+invalidation is not served afterwards, and flushes collect the scopes of
+changed objects. Against Redis, a second process plays another node. It
+must see an invalidation through pub/sub well before CACHE_VERSION_TTL
+would have expired its version.
+
+Exits non-zero on the first failed check.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from typing import Callable, List
+
+# The second node must rely on pub/sub, not on its versions timing out
+FANOUT_VERSION_TTL = "60"
+os.environ.setdefault("CACHE_VERSION_TTL", FANOUT_VERSION_TTL)
+
+from sqlalchemy import Column, Integer, String, create_engine
+from sqlalchemy.orm import Session, declarative_base
+
+from data import cache as cache_module
+from data.cache import Cache, MemoryBackend, RedisBackend, use_backend, start_cache, close_cache
+from benchmarks.redis_stub import start_stub
+
+_CheckBase = declarative_base()
+
+class _CheckRow(_CheckBase):
+    __tablename__ = "cache_check_rows"
+    id = Column(Integer, primary_key=True)
+    owner = Column(String(36), nullable=False)
+
+class Loader:
+    """Counts how often the cache had to call it"""
+
+    def __init__(self, value, on_load: Callable = None):
+        self.value = value
+        self.calls = 0
+        self.on_load = on_load
+
+    async def __call__(self):
+        self.calls += 1
+        if self.on_load:
+            await self.on_load()
+        return self.value
+
+def _expect(condition: bool, message: str) -> None:
+    if not condition:
+        raise AssertionError(message)
+
+async def check_roundtrip(cache: Cache) -> None:
+    value = {
+        "at": datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc), "day": date(2024, 5, 1),
+        "id": uuid.uuid4(), "amount": Decimal("12.50"), "items": [1, 2.5, "x", None], "nested": {"ok": True},
+    }
+    loader = Loader(value)
+    await cache.get_or_load("roundtrip", "value", loader)
+    cached = await cache.get_or_load("roundtrip", "value", loader)
+    _expect(loader.calls == 1, f"second lookup should hit, loader ran {loader.calls} times")
+    _expect(cached == value, f"value changed on the way through the cache: {cached!r}")
+
+async def check_ttl(cache: Cache) -> None:
+    loader = Loader("fresh")
+    await cache.get_or_load("ttl", "value", loader, ttl=0.2)
+    await cache.get_or_load("ttl", "value", loader, ttl=0.2)
+    _expect(loader.calls == 1, "entry should be served before its TTL")
+    await asyncio.sleep(0.3)
+    await cache.get_or_load("ttl", "value", loader, ttl=0.2)
+    _expect(loader.calls == 2, "entry should expire after its TTL")
+
+async def check_invalidation(cache: Cache) -> None:
+    first, other = Loader("v1"), Loader("other")
+    await cache.get_or_load("alice", "value", first)
+    await cache.get_or_load("bob", "value", other)
+    await cache.invalidate("alice")
+    second = Loader("v2")
+    _expect(await cache.get_or_load("alice", "value", second) == "v2", "invalidated scope should reload")
+    await cache.get_or_load("bob", "value", other)
+    _expect(other.calls == 1, "invalidating one scope should keep the others")
+
+async def check_racing_load(cache: Cache) -> None:
+    # A write commits (and invalidates) while the loader is still reading the old state
+    stale = Loader("stale", on_load=lambda: cache.invalidate("race"))
+    await cache.get_or_load("race", "value", stale)
+    fresh = Loader("fresh")
+    _expect(await cache.get_or_load("race", "value", fresh) == "fresh", "a load that raced an invalidation was served")
+
+async def check_flush_collects_scopes(cache: Cache) -> None:
+    cache.invalidated_by(_CheckRow, lambda row: row.owner)
+    engine = create_engine("sqlite://")
+    _CheckBase.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(_CheckRow(id=1, owner="carol"))
+        session.flush()
+        pending = session.info.get("cache_invalidations", set())
+        _expect((cache.name, "carol") in pending, f"flush should collect the changed row's scope, got {pending}")
+        session.rollback()
+        _expect("cache_invalidations" not in session.info, "rollback should discard collected scopes")
+
+def _other_node(redis_url: str, name: str, ready, results) -> None:
+    """Second node: reads a scope, then reports what it sees after the first node invalidated it"""
+    async def run():
+        use_backend(RedisBackend(redis_url))
+        await start_cache()
+        cache = Cache(name, ttl=60)
+        results.put(await cache.get_or_load("dave", "value", Loader("before")))
+        ready.set()
+        deadline = time.monotonic() + 2
+        value = "before"
+        while value == "before" and time.monotonic() < deadline:
+            await asyncio.sleep(0.02)
+            value = await cache.get_or_load("dave", "value", Loader("after"))
+        results.put(value)
+        await close_cache()
+
+    asyncio.run(run())
+
+async def check_fanout(cache: Cache, redis_url: str) -> None:
+    context = multiprocessing.get_context("spawn")
+    ready, results = context.Event(), context.Queue()
+    node = context.Process(target=_other_node, args=(redis_url, cache.name, ready, results))
+    node.start()
+    try:
+        await asyncio.to_thread(ready.wait, 30)
+        _expect(results.get(timeout=5) == "before", "other node should have loaded the entry")
+        started = time.monotonic()
+        await cache.invalidate("dave")
+        seen = await asyncio.to_thread(results.get, True, 5)
+        _expect(seen == "after", f"other node still served the old entry ({seen!r}) after the invalidation")
+        print(f"    other node reloaded {1000 * (time.monotonic() - started):.0f}ms after the invalidation")
+    finally:
+        node.join(10)
+
+async def run_checks(label: str, redis_url: str = None) -> None:
+    use_backend(RedisBackend(redis_url) if redis_url else MemoryBackend())
+    await start_cache()
+    # Unique names, so a shared server holds no entries from an earlier run
+    cache = Cache(f"check_{label}_{uuid.uuid4().hex[:8]}", ttl=30)
+    checks: List = [check_roundtrip, check_ttl, check_invalidation, check_racing_load, check_flush_collects_scopes]
+    print(f"{label}:")
+    try:
+        for check in checks:
+            await check(cache)
+            print(f"  ok  {check.__name__}")
+        if redis_url:
+            await check_fanout(cache, redis_url)
+            print("  ok  check_fanout")
+    finally:
+        await close_cache()
+        cache_module._caches.pop(cache.name, None)
+        cache_module._invalidation_rules.pop(_CheckRow, None)
+
+async def main(args: argparse.Namespace) -> int:
+    try:
+        await run_checks("memory")
+        if args.redis_url:
+            await run_checks("redis", args.redis_url)
+        else:
+            stub = await start_stub(port=args.stub_port)
+            async with stub:
+                await run_checks("redis-stub", f"redis://127.0.0.1:{args.stub_port}/0")
+    except AssertionError as e:
+        print(f"  FAIL {e}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check cache backends for TTL, invalidation and pub/sub fan-out")
+    parser.add_argument("--redis-url", help="Check against this server instead of the local stand-in")
+    parser.add_argument("--stub-port", type=int, default=6399)
+    sys.exit(asyncio.run(main(parser.parse_args())))
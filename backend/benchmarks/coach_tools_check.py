@@ -0,0 +1,80 @@
+"""
+Check that every coach tool runs.
+
+run_tool_call turns any exception into {"error": ...} for the model, so
+a tool that breaks (say, a handler whose signature changed) only makes
+the coach's answers worse, silently. This calls execute_tool directly for
+every tool in COACH_TOOLS, as the user with the most transactions of a
+seeded database (see benchmarks.seed), and fails on the first exception
+or result that cannot be encoded as JSON:
+
+    python -m benchmarks.coach_tools_check
+
+Tools that take a date range run once without one and once over the last
+90 days. Tools with required parameters need an entry in SAMPLE_ARGUMENTS.
+"""
+import asyncio
+import json
+import os
+import sys
+from datetime import date, timedelta
+from typing import Any, Dict, List
+
+# The handlers themselves must run, not answer from data.cache
+os.environ.setdefault("CACHE_ENABLED", "false")
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select, func
+
+from data.database import AsyncSessionLocal, engine
+from models import Transaction, User
+from services.coach_tools import COACH_TOOLS, execute_tool
+
+SAMPLE_ARGUMENTS: Dict[str, Dict[str, Any]] = {
+    "get_spending_trends": {"period": "monthly"},
+    "get_monthly_comparison": {"year": date.today().year},
+    "get_recent_transactions": {"limit": 5},
+}
+
+def tool_calls() -> List[tuple]:
+    """(name, arguments) for every call to check"""
+    today = date.today()
+    date_range = {"start_date": (today - timedelta(days=90)).isoformat(), "end_date": today.isoformat()}
+    calls = []
+    for tool in COACH_TOOLS:
+        function = tool["function"]
+        arguments = SAMPLE_ARGUMENTS.get(function["name"], {})
+        missing = set(function["parameters"].get("required", [])) - arguments.keys()
+        if missing:
+            raise SystemExit(f"{function['name']} requires {', '.join(sorted(missing))}; add it to SAMPLE_ARGUMENTS")
+        calls.append((function["name"], arguments))
+        if "start_date" in function["parameters"]["properties"]:
+            calls.append((function["name"], {**arguments, **date_range}))
+    return calls
+
+async def main() -> int:
+    failed = 0
+    async with AsyncSessionLocal() as db:
+        user_id = (await db.execute(
+            select(Transaction.user_id).group_by(Transaction.user_id).order_by(func.count().desc()).limit(1)
+        )).scalar()
+        if user_id is None:
+            raise SystemExit("No transactions found; seed the database with benchmarks.seed first")
+        user = await db.get(User, user_id)
+
+        for name, arguments in tool_calls():
+            try:
+                result = await execute_tool(name, arguments, db, user)
+                json.dumps(jsonable_encoder(result))
+            except Exception as e:
+                failed += 1
+                await db.rollback()
+                print(f"  FAIL {name}({arguments}): {e!r}")
+            else:
+                size = len(result) if isinstance(result, list) else 1
+                print(f"  ok   {name}({arguments}): {size} item(s)")
+    await engine.dispose()
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,103 @@
+"""
+Load test comparing database engine profiles.
+
+Runs the same mix of read queries from many concurrent workers against each
+profile and prints throughput and latency percentiles as JSON:
+
+    python -m benchmarks.engine_profiles --profiles baseline,development,production --concurrency 50 --duration 15
+
+"baseline" reproduces the engine as it was configured before profiles existed
+(echo on, default pool, no pre-ping, no server-side timeout).
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Dict, Any, List
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine
+
+from data.database import ASYNC_DATABASE_URL
+from data.engine_profiles import get_engine_profile, async_engine_kwargs
+from models import Transaction, Budget, Goal
+from benchmarks.stats import summarize
+
+BASELINE_KWARGS = {"echo": True}
+
+def _build_engine(profile_name: str) -> AsyncEngine:
+    if profile_name == "baseline":
+        return create_async_engine(ASYNC_DATABASE_URL, **BASELINE_KWARGS)
+    return create_async_engine(ASYNC_DATABASE_URL, **async_engine_kwargs(get_engine_profile(profile_name)))
+
+def _queries(user_id: uuid.UUID) -> List:
+    """Representative dashboard reads, parametrised so prepared statements get reused"""
+    return [
+        select(
+            Transaction.type,
+            func.coalesce(func.sum(Transaction.amount), 0)
+        ).where(Transaction.user_id == user_id).group_by(Transaction.type),
+        select(Transaction).where(Transaction.user_id == user_id).order_by(Transaction.date.desc()).limit(20),
+        select(Budget).where(Budget.user_id == user_id),
+        select(Goal).where(Goal.user_id == user_id),
+    ]
+
+async def _worker(engine: AsyncEngine, user_ids: List[uuid.UUID], deadline: float, latencies: List[float], errors: List[str]) -> None:
+    i = 0
+    while time.monotonic() < deadline:
+        user_id = user_ids[i % len(user_ids)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            async with engine.connect() as conn:
+                for query in _queries(user_id):
+                    await conn.execute(query)
+        except Exception as e:
+            errors.append(type(e).__name__)
+            continue
+        latencies.append((time.perf_counter() - started) * 1000)
+
+async def run_profile(profile_name: str, concurrency: int, duration: float, warmup: float) -> Dict[str, Any]:
+    engine = _build_engine(profile_name)
+    try:
+        async with engine.connect() as conn:
+            rows = await conn.execute(select(Transaction.user_id).distinct().limit(100))
+            user_ids = [row[0] for row in rows] or [uuid.uuid4()]
+
+        # Warm-up fills the pool and the statement caches before measuring
+        await asyncio.gather(*(
+            _worker(engine, user_ids, time.monotonic() + warmup, [], []) for _ in range(concurrency)
+        ))
+
+        latencies: List[float] = []
+        errors: List[str] = []
+        started = time.monotonic()
+        await asyncio.gather(*(
+            _worker(engine, user_ids, started + duration, latencies, errors) for _ in range(concurrency)
+        ))
+        elapsed = time.monotonic() - started
+    finally:
+        await engine.dispose()
+
+    return {
+        "profile": profile_name,
+        "concurrency": concurrency,
+        **summarize(latencies, len(errors), elapsed),
+    }
+
+async def main(args: argparse.Namespace) -> None:
+    results = []
+    for profile_name in args.profiles.split(","):
+        results.append(await run_profile(profile_name.strip(), args.concurrency, args.duration, args.warmup))
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare engine profiles under concurrent load")
+    parser.add_argument("--profiles", default="baseline,production")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(main(parser.parse_args()))
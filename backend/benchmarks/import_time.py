@@ -0,0 +1,118 @@
+"""
+Import-time benchmark.
+
+Imports each entry point in fresh interpreters under `python -X importtime`
+and reports the best cumulative import time, the packages that cost the
+most, and whether any lazily loaded library (openai, httpx, passlib, jose,
+alembic, redis) was pulled in at import time after all:
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --update-baseline
+
+Fails when a target got slower than its baseline by more than --threshold,
+or when an entry point imports a lazily loaded library.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Tuple
+
+from benchmarks.stats import machine_description
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "import_time.json")
+TIME_THRESHOLD = 0.25
+
+# The API, what Alembic's env.py loads, and the insights CLI job
+TARGETS = ["main", "models", "services.coach_insights"]
+# Must only be imported on first use (see data.boot.LAZY_MODULES)
+LAZY_PACKAGES = ["openai", "httpx", "passlib", "jose", "alembic", "redis"]
+
+def _run(code: str, importtime: bool) -> subprocess.CompletedProcess:
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    env.setdefault("OPENAI_API_KEY", "benchmark")
+    args = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-W", "ignore", "-c", code]
+    return subprocess.run(args, cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True)
+
+def _parse(stderr: str) -> List[Tuple[str, int, int]]:
+    """(module, self_us, cumulative_us) rows of an -X importtime report"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        rows.append((module.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+def measure(target: str, runs: int, top: int) -> Dict[str, Any]:
+    best_rows = None
+    best_total = None
+    for _ in range(runs):
+        rows = _parse(_run(f"import {target}", importtime=True).stderr)
+        total = next(cumulative for module, _, cumulative in reversed(rows) if module == target)
+        if best_total is None or total < best_total:
+            best_total, best_rows = total, rows
+
+    by_package: Dict[str, int] = {}
+    for module, self_us, _ in best_rows:
+        package = module.split(".")[0]
+        by_package[package] = by_package.get(package, 0) + self_us
+    heaviest = sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top]
+
+    loaded = json.loads(_run(f"import sys, json, {target}; print(json.dumps(sorted(sys.modules)))", importtime=False).stdout)
+    eager = sorted({name.split(".")[0] for name in loaded} & set(LAZY_PACKAGES))
+    return {
+        "total_ms": round(best_total / 1000, 1),
+        "modules": len(best_rows),
+        "heaviest_packages_ms": {package: round(us / 1000, 1) for package, us in heaviest},
+        "eager_lazy_packages": eager,
+    }
+
+def main(args: argparse.Namespace) -> int:
+    results = {}
+    for target in args.targets.split(","):
+        results[target] = measure(target, args.runs, args.top)
+        result = results[target]
+        heaviest = ", ".join(f"{package} {ms}ms" for package, ms in list(result["heaviest_packages_ms"].items())[:5])
+        print(f"{target:28} {result['total_ms']:>8}ms {result['modules']:>5} modules   {heaviest}")
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump({
+                "machine": machine_description(),
+                "recorded_at": datetime.now(timezone.utc).isoformat(),
+                "targets": {target: {"total_ms": r["total_ms"]} for target, r in results.items()},
+            }, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+
+    failures = []
+    for target, result in results.items():
+        if result["eager_lazy_packages"]:
+            failures.append(f"{target} imports {', '.join(result['eager_lazy_packages'])} at import time")
+    if not args.update_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("machine") != machine_description():
+            print(f"Warning: baseline was recorded on {baseline.get('machine')}, this is {machine_description()}")
+        for target, result in results.items():
+            expected = baseline.get("targets", {}).get(target)
+            if expected and result["total_ms"] > expected["total_ms"] * (1 + args.threshold):
+                failures.append(f"{target}: {result['total_ms']}ms vs baseline {expected['total_ms']}ms")
+
+    for message in failures:
+        print(f"REGRESSION {message}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Track the import cost of the application entry points")
+    parser.add_argument("--targets", default=",".join(TARGETS))
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per target; the fastest counts")
+    parser.add_argument("--top", type=int, default=10, help="Heaviest packages to report")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=TIME_THRESHOLD, help="Allowed slowdown, 0.25 = 25%%")
+    parser.add_argument("--update-baseline", action="store_true")
+    sys.exit(main(parser.parse_args()))
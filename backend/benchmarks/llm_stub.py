@@ -0,0 +1,89 @@
+"""
+Stand-in for the OpenAI chat completions API, for load tests.
+
+Streams a canned answer with configurable latency so coach benchmarks
+measure our side (context loading, tool plumbing, SSE) and not the
+provider. Run it as a server and point the API at it:
+
+    uvicorn benchmarks.llm_stub:app --port 8900
+    OPENAI_BASE_URL=http://localhost:8900/v1 uvicorn main:app
+
+or call install_stub() to route the in-process coach client to it.
+"""
+import os
+import json
+import time
+import asyncio
+import uuid
+
+import httpx
+from openai import AsyncOpenAI
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+# Chunks streamed per answer and the pauses around them
+LLM_STUB_TOKENS = int(os.getenv("LLM_STUB_TOKENS", "60"))
+LLM_STUB_FIRST_TOKEN_MS = float(os.getenv("LLM_STUB_FIRST_TOKEN_MS", "400"))
+LLM_STUB_TOKEN_INTERVAL_MS = float(os.getenv("LLM_STUB_TOKEN_INTERVAL_MS", "20"))
+
+WORDS = ["Сократи", "траты", "на", "кафе", "до", "30,000₸", "и", "отложи", "разницу", "на", "цель."]
+
+def _chunk(completion_id: str, model: str, delta: dict, finish_reason=None, usage=None) -> str:
+    payload = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [] if usage else [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    if usage:
+        payload["usage"] = usage
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+def _usage(body: dict) -> dict:
+    prompt_tokens = sum(len(str(m.get("content") or "")) for m in body.get("messages", [])) // 4
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": LLM_STUB_TOKENS, "total_tokens": prompt_tokens + LLM_STUB_TOKENS}
+
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "stub")
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    text = " ".join(WORDS[i % len(WORDS)] for i in range(LLM_STUB_TOKENS))
+
+    if not body.get("stream"):
+        await asyncio.sleep((LLM_STUB_FIRST_TOKEN_MS + LLM_STUB_TOKEN_INTERVAL_MS * LLM_STUB_TOKENS) / 1000)
+        return JSONResponse({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": _usage(body),
+        })
+
+    async def stream():
+        await asyncio.sleep(LLM_STUB_FIRST_TOKEN_MS / 1000)
+        yield _chunk(completion_id, model, {"role": "assistant", "content": ""})
+        for i in range(LLM_STUB_TOKENS):
+            yield _chunk(completion_id, model, {"content": WORDS[i % len(WORDS)] + " "})
+            await asyncio.sleep(LLM_STUB_TOKEN_INTERVAL_MS / 1000)
+        yield _chunk(completion_id, model, {}, finish_reason="stop")
+        if (body.get("stream_options") or {}).get("include_usage"):
+            yield _chunk(completion_id, model, {}, usage=_usage(body))
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+app = Starlette(routes=[Route("/v1/chat/completions", chat_completions, methods=["POST"])])
+
+def install_stub() -> None:
+    """Send the coach's OpenAI calls to the stub app, in-process"""
+    from services import ai_coach
+
+    ai_coach.client = AsyncOpenAI(
+        api_key="stub",
+        base_url="http://llm-stub/v1",
+        http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=app))
+    )
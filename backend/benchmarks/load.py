@@ -0,0 +1,236 @@
+"""
+End-to-end load test for the API.
+
+Virtual users log in as seeded benchmark users (see benchmarks.seed) and
+repeat a scenario until the duration is up:
+
+    dashboard     the calls the dashboard page makes on load, in parallel
+    transactions  posting an expense
+    coach         asking the coach and reading the whole stream (LLM stubbed)
+
+    python -m benchmarks.load --scenarios dashboard,transactions,coach --users 50 --duration 30 --output before.json
+    python -m benchmarks.load --compare before.json --output after.json
+
+By default the app runs in-process; --base-url targets a running server
+instead (start it with OPENAI_BASE_URL pointing at benchmarks.llm_stub for
+the coach scenario). In-process, responses are buffered, so coach
+first-event times are only meaningful against a server.
+
+The JSON report has p50/p95/p99 and throughput per scenario and per
+endpoint, plus the commit it was taken at.
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional
+
+import httpx
+
+from benchmarks.seed import BENCH_EMAIL, BENCH_PASSWORD
+from benchmarks.stats import summarize
+
+SCENARIOS = ["dashboard", "transactions", "coach"]
+COACH_QUESTIONS = [
+    "Как мне сократить траты на еду?",
+    "Успею ли я накопить на отпуск к лету?",
+    "Где я перерасходую бюджет в этом месяце?",
+]
+
+class Recorder:
+    """Latencies and errors per scenario and per endpoint"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def add(self, key: str, elapsed_ms: float, ok: bool) -> None:
+        if ok:
+            self.latencies.setdefault(key, []).append(elapsed_ms)
+        else:
+            self.latencies.setdefault(key, [])
+            self.errors[key] = self.errors.get(key, 0) + 1
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        return {
+            key: summarize(latencies, self.errors.get(key, 0), elapsed)
+            for key, latencies in sorted(self.latencies.items())
+        }
+
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, endpoints: Recorder, rng: random.Random):
+        self.client = client
+        self.endpoints = endpoints
+        self.rng = rng
+        self.headers: Dict[str, str] = {}
+        self.user_id: Optional[str] = None
+
+    async def call(self, name: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        """One request, recorded under the route template given as name"""
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=self.headers, **kwargs)
+        except httpx.HTTPError:
+            self.endpoints.add(f"{method} {name}", (time.perf_counter() - started) * 1000, False)
+            return None
+        ok = response.status_code < 400
+        self.endpoints.add(f"{method} {name}", (time.perf_counter() - started) * 1000, ok)
+        return response if ok else None
+
+    async def login(self, population: int) -> bool:
+        index = self.rng.randrange(population)
+        response = await self.call(
+            "/api/auth/login", "POST", "/api/auth/login",
+            json={"email": BENCH_EMAIL.format(index), "password": BENCH_PASSWORD}
+        )
+        if response is None:
+            return False
+        token = response.json()
+        self.headers = {"Authorization": f"Bearer {token['access_token']}"}
+        self.user_id = token["user_id"]
+        return True
+
+    async def dashboard(self) -> bool:
+        today = datetime.now(timezone.utc).date()
+        month_start = today.replace(day=1)
+        previous_end = month_start - timedelta(days=1)
+        previous_start = previous_end.replace(day=1)
+        uid = self.user_id
+        responses = await asyncio.gather(
+            self.call("/api/auth/me", "GET", "/api/auth/me"),
+            self.call("/api/accounts/summary", "GET", "/api/accounts/summary"),
+            self.call("/api/users/{user_id}/stats", "GET", f"/api/users/{uid}/stats",
+                      params={"start_date": month_start.isoformat()}),
+            self.call("/api/users/{user_id}/stats", "GET", f"/api/users/{uid}/stats",
+                      params={"start_date": previous_start.isoformat(), "end_date": previous_end.isoformat()}),
+            self.call("/api/goals/user/{user_id}/overview", "GET", f"/api/goals/user/{uid}/overview"),
+            self.call("/api/transactions/", "GET", "/api/transactions/", params={"limit": 5}),
+        )
+        return all(response is not None for response in responses)
+
+    async def transactions(self) -> bool:
+        response = await self.call("/api/transactions/", "POST", "/api/transactions/", json={
+            "amount": round(self.rng.lognormvariate(8.3, 0.7), 2),
+            "type": "expense",
+            "category": self.rng.choice(["Food & Dining", "Transportation", "Shopping", "Entertainment"]),
+            "description": "benchmark",
+        })
+        return response is not None
+
+    async def coach(self) -> bool:
+        started = time.perf_counter()
+        first_event = None
+        try:
+            async with self.client.stream(
+                "POST", "/api/coach/ask", headers=self.headers,
+                json={"message": self.rng.choice(COACH_QUESTIONS)}
+            ) as response:
+                if response.status_code >= 400:
+                    raise httpx.HTTPStatusError("coach failed", request=response.request, response=response)
+                async for _ in response.aiter_raw():
+                    if first_event is None:
+                        first_event = (time.perf_counter() - started) * 1000
+        except httpx.HTTPError:
+            self.endpoints.add("POST /api/coach/ask", (time.perf_counter() - started) * 1000, False)
+            return False
+        self.endpoints.add("POST /api/coach/ask", (time.perf_counter() - started) * 1000, True)
+        if first_event is not None:
+            self.endpoints.add("POST /api/coach/ask (first event)", first_event, True)
+        return True
+
+async def _run_user(client: httpx.AsyncClient, scenario: str, args, seed: int,
+                    scenarios: Recorder, endpoints: Recorder, deadline: float) -> None:
+    user = VirtualUser(client, endpoints, random.Random(seed))
+    if not await user.login(args.population):
+        return
+    step = getattr(user, scenario)
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        ok = await step()
+        scenarios.add(scenario, (time.perf_counter() - started) * 1000, ok)
+
+async def run_scenario(client: httpx.AsyncClient, scenario: str, args) -> Dict[str, Any]:
+    # Warm-up logs in and fills pools and caches; its numbers are discarded
+    await asyncio.gather(*(
+        _run_user(client, scenario, args, i, Recorder(), Recorder(), time.monotonic() + args.warmup)
+        for i in range(args.users)
+    ))
+
+    scenarios, endpoints = Recorder(), Recorder()
+    started = time.monotonic()
+    await asyncio.gather(*(
+        _run_user(client, scenario, args, args.users + i, scenarios, endpoints, started + args.duration)
+        for i in range(args.users)
+    ))
+    elapsed = time.monotonic() - started
+    return {"scenario": scenarios.report(elapsed).get(scenario, summarize([], 0, elapsed)), "endpoints": endpoints.report(elapsed)}
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _client(args) -> httpx.AsyncClient:
+    limits = httpx.Limits(max_connections=args.users * 8)
+    timeout = httpx.Timeout(60.0)
+    if args.base_url:
+        return httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=timeout)
+
+    from benchmarks.llm_stub import install_stub
+    import main as api
+
+    install_stub()
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url="http://bench", timeout=timeout)
+
+def compare(previous: Dict[str, Any], current: Dict[str, Any]) -> None:
+    """Print p95 and throughput changes per endpoint against an earlier report"""
+    print(f"{'endpoint':60} {'p95 before':>11} {'p95 after':>10} {'rps before':>11} {'rps after':>10}")
+    for scenario, result in current["scenarios"].items():
+        before = previous.get("scenarios", {}).get(scenario, {}).get("endpoints", {})
+        for key, stats in result["endpoints"].items():
+            old = before.get(key)
+            if old is None:
+                continue
+            print(f"{key:60} {old['p95_ms']:>11} {stats['p95_ms']:>10} {old['throughput_rps']:>11} {stats['throughput_rps']:>10}")
+
+async def main(args: argparse.Namespace) -> None:
+    report: Dict[str, Any] = {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "target": args.base_url or "in-process",
+        "config": {"users": args.users, "population": args.population, "duration": args.duration, "warmup": args.warmup},
+        "scenarios": {},
+    }
+    async with _client(args) as client:
+        for scenario in args.scenarios.split(","):
+            scenario = scenario.strip()
+            if scenario not in SCENARIOS:
+                raise SystemExit(f"Unknown scenario {scenario!r}, expected one of {SCENARIOS}")
+            report["scenarios"][scenario] = await run_scenario(client, scenario, args)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run concurrent API scenarios and report latency percentiles")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users per scenario")
+    parser.add_argument("--population", type=int, default=1000, help="Number of seeded benchmark users to log in as")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=5.0)
+    parser.add_argument("--base-url", help="Target a running server instead of the in-process app")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    parser.add_argument("--compare", help="Earlier JSON report to compare against")
+    asyncio.run(main(parser.parse_args()))
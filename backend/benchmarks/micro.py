@@ -0,0 +1,206 @@
+"""
+Micro-benchmarks for the pure-Python code that runs on every request.
+
+Each case calls one hot function with fixed inputs. The harness reports
+the best per-call time over several repeats and the peak memory allocated
+by a single call (tracemalloc), then compares both with the stored
+baseline and exits non-zero when either regressed beyond its threshold:
+
+    python -m benchmarks.micro                      # compare with the baseline
+    python -m benchmarks.micro --update-baseline    # after an intended change
+    python -m benchmarks.micro --filter pydantic
+
+Timings depend on the machine, so baselines are only comparable on the
+machine (or CI runner class) that recorded them; the file notes which one.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+import tracemalloc
+import uuid
+from datetime import datetime, date, timedelta, timezone
+from typing import Callable, Dict, Any, List
+
+from pydantic import TypeAdapter
+from sqlalchemy import select
+
+from models import Transaction, UserStats, UserProfile
+from utils.gamification import (
+    calculate_hourly_rate, calculate_lost_minutes, calculate_xp_gain, calculate_level, update_user_stats
+)
+from utils.spending import calculate_spending_volatility, find_most_active_month
+from utils.filters import apply_transaction_filters, transaction_list_statement
+from services.gamification_service import GamificationService
+from routes.transactions import TransactionResponse
+from routes.analytics import FinancialHealth
+from routes.users import UserStats as UserStatsResponse
+from benchmarks.stats import machine_description
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "micro.json")
+# Allowed slowdown / extra peak memory relative to the baseline
+TIME_THRESHOLD = 0.25
+ALLOC_THRESHOLD = 0.10
+# Peak differences below this are noise from interpreter internals
+ALLOC_NOISE_BYTES = 1024
+# A case only fails if it is still over the threshold after this many re-runs
+CONFIRM_RUNS = 2
+
+def _fixtures() -> Dict[str, Any]:
+    """Deterministic inputs shared by the cases"""
+    rng = random.Random(42)
+    user_id = uuid.UUID(int=rng.getrandbits(128))
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    transactions = [
+        Transaction(
+            id=uuid.UUID(int=rng.getrandbits(128)), user_id=user_id, account_id=None,
+            amount=round(rng.uniform(100, 50_000), 2), type=rng.choice(["income", "expense"]),
+            category=rng.choice(["Food & Dining", "Transportation", "Shopping", "Salary"]),
+            description=rng.choice([None, "coffee", "taxi"]),
+            date=start + timedelta(minutes=rng.randrange(365 * 24 * 60)),
+        )
+        for _ in range(100)
+    ]
+    profile = UserProfile(user_id=user_id, monthly_income=450_000, weekly_hours=40, weeks_per_month=4, currency="KZT")
+    return {
+        "user_id": user_id,
+        "profile": profile,
+        "amounts": [round(rng.lognormvariate(8.3, 0.9), 2) for _ in range(1000)],
+        "transactions": transactions,
+        "daily_amounts": [rng.lognormvariate(9, 0.8) for _ in range(365)],
+        "dates": [start + timedelta(minutes=rng.randrange(2 * 365 * 24 * 60)) for _ in range(5000)],
+    }
+
+def _cases(f: Dict[str, Any]) -> Dict[str, Callable[[], Any]]:
+    profile = f["profile"]
+    stats = UserStats(user_id=f["user_id"], xp=740, level=8, streak=5, total_minutes_lost=3200,
+                      last_transaction_date=date(2025, 6, 1))
+    running_stats = UserStats(user_id=f["user_id"], xp=0, level=1, streak=0, total_minutes_lost=0)
+    transaction_list = TypeAdapter(List[TransactionResponse])
+
+    def gamification_helpers():
+        hourly_rate = calculate_hourly_rate(profile)
+        for amount in f["amounts"]:
+            calculate_lost_minutes(amount, hourly_rate)
+            calculate_level(calculate_xp_gain(amount))
+
+    def gamification_update():
+        update_user_stats(running_stats, profile, 12_500.0, date(2025, 6, 2))
+
+    def pydantic_transactions():
+        return transaction_list.dump_json([TransactionResponse.model_validate(t) for t in f["transactions"]])
+
+    def pydantic_small_models():
+        FinancialHealth(
+            savings_rate=12.5, expense_to_income_ratio=87.5, largest_expense_category="Housing",
+            most_frequent_category="Food & Dining", average_daily_spending=9_800.0, spending_volatility=4_210.7
+        ).model_dump_json()
+        UserStatsResponse(
+            total_transactions=812, total_income=5_400_000.0, total_expenses=4_700_000.0, net_balance=700_000.0,
+            favorite_category="Food & Dining", most_active_month="March 2025", average_transaction_amount=12_400.0
+        ).model_dump_json()
+
+    return {
+        "gamification.helpers_1000_amounts": gamification_helpers,
+        "gamification.update_user_stats": gamification_update,
+        "gamification_service.status": lambda: GamificationService.calculate_gamification_status(stats, profile),
+        "filters.apply_transaction_filters": lambda: apply_transaction_filters(
+            select(Transaction).where(Transaction.user_id == f["user_id"]),
+            "expense", "Food & Dining", date(2025, 1, 1), date(2025, 3, 31), "coffee"
+        ),
+        "filters.transaction_list_statement": lambda: transaction_list_statement(
+            f["user_id"], "expense", "Food & Dining", date(2025, 1, 1), date(2025, 3, 31), "coffee"
+        ),
+        "pydantic.transaction_list_100": pydantic_transactions,
+        "pydantic.small_models": pydantic_small_models,
+        "analytics.volatility_365_days": lambda: calculate_spending_volatility(f["daily_amounts"]),
+        "users.most_active_month_5000_dates": lambda: find_most_active_month(f["dates"]),
+    }
+
+def measure(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=repeat, number=number)) / number
+
+    tracemalloc.start()
+    try:
+        fn()  # first call may fill caches; measure a steady-state call
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"time_us": round(best * 1e6, 3), "peak_bytes": max(0, peak - baseline)}
+
+def check(results: Dict[str, Dict[str, float]], baseline: Dict[str, Any], time_threshold: float, alloc_threshold: float) -> List[str]:
+    """Regression messages for cases slower or hungrier than the baseline allows"""
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get("cases", {}).get(name)
+        if expected is None:
+            continue
+        if result["time_us"] > expected["time_us"] * (1 + time_threshold):
+            regressions.append(f"{name}: {result['time_us']}us vs baseline {expected['time_us']}us")
+        extra = result["peak_bytes"] - expected["peak_bytes"]
+        if extra > ALLOC_NOISE_BYTES and result["peak_bytes"] > expected["peak_bytes"] * (1 + alloc_threshold):
+            regressions.append(f"{name}: peak {result['peak_bytes']}B vs baseline {expected['peak_bytes']}B")
+    return regressions
+
+def main(args: argparse.Namespace) -> int:
+    cases = _cases(_fixtures())
+    results = {}
+    for name, fn in cases.items():
+        if args.filter and args.filter not in name:
+            continue
+        results[name] = measure(fn, args.repeat)
+        print(f"{name:45} {results[name]['time_us']:>12.3f}us {results[name]['peak_bytes']:>10}B")
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        stored = {"machine": machine_description(), "recorded_at": datetime.now(timezone.utc).isoformat(), "cases": results}
+        if args.filter and os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                previous = json.load(f)
+            stored["cases"] = {**previous.get("cases", {}), **results}
+        with open(args.baseline, "w") as f:
+            json.dump(stored, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline first")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("machine") != machine_description():
+        print(f"Warning: baseline was recorded on {baseline.get('machine')}, this is {machine_description()}")
+
+    regressions = check(results, baseline, args.threshold, args.alloc_threshold)
+    # Re-measure flagged cases so a noisy neighbour does not fail the run
+    for _ in range(CONFIRM_RUNS):
+        flagged = {message.split(":")[0] for message in regressions}
+        if not flagged:
+            break
+        for name in flagged:
+            rerun = measure(cases[name], args.repeat)
+            results[name] = {
+                "time_us": min(results[name]["time_us"], rerun["time_us"]),
+                "peak_bytes": min(results[name]["peak_bytes"], rerun["peak_bytes"]),
+            }
+        regressions = check({name: results[name] for name in flagged}, baseline, args.threshold, args.alloc_threshold)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmark per-request hot paths against a stored baseline")
+    parser.add_argument("--filter", help="Only run cases whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=TIME_THRESHOLD, help="Allowed slowdown, 0.25 = 25%%")
+    parser.add_argument("--alloc-threshold", type=float, default=ALLOC_THRESHOLD, help="Allowed extra peak memory")
+    parser.add_argument("--update-baseline", action="store_true")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,237 @@
+"""
+Query-plan regression check for the data-access endpoints.
+
+Boots the app in-process against a seeded database (see benchmarks.seed),
+calls every GET endpoint under /api plus a create/update/delete cycle on
+transactions as the user with the most transactions, and captures the
+SQL each request issues. Every captured statement is then run through
+EXPLAIN (FORMAT JSON) with its original parameters; EXPLAIN without
+ANALYZE only plans, so the writes are not executed a second time.
+
+A request fails the check when:
+
+- a plan sequentially scans a watched table (transactions) that holds
+  more than --seqscan-rows rows;
+- a statement's estimated total cost exceeds --max-cost;
+- it issues more than --max-statements statements, or the same statement
+  shape more than --max-repeats times (the N+1 pattern).
+
+    python -m benchmarks.query_plans
+    python -m benchmarks.query_plans --max-cost 50000 --output plans.json
+
+Exits non-zero on any violation, so it can gate CI against a seeded
+Postgres.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from datetime import date
+from typing import Dict, Any, List, Optional, Tuple
+
+# Every request must run its SQL, not answer from data.cache or a 503
+os.environ.setdefault("CACHE_ENABLED", "false")
+os.environ.setdefault("LOAD_SHEDDING", "false")
+
+import httpx
+from fastapi.routing import APIRoute
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+
+from data.database import engine
+from data.slow_queries import normalize_sql, fingerprint_sql
+from auth.security import create_access_token
+
+SEQSCAN_TABLES = ["transactions"]
+SEQSCAN_ROWS = 10_000
+MAX_COST = 100_000.0
+MAX_STATEMENTS = 10
+MAX_REPEATS = 3
+
+# Known exceptions, keyed by "METHOD /route"; each should name the fix that removes it
+ENDPOINT_LIMITS: Dict[str, Dict[str, int]] = {}
+# Operational endpoints are not part of the check
+SKIPPED_PREFIXES = ("/api/diagnostics",)
+
+# Extra parameters for routes that need or benefit from them
+QUERY_PARAMS: Dict[str, Dict[str, Any]] = {
+    "/api/analytics/monthly-comparison": {"year": date.today().year},
+    "/api/transactions/": {"limit": 20},
+}
+# Filtered variants of the busiest reads, checked in addition to the plain call
+EXTRA_REQUESTS: List[Tuple[str, str, Dict[str, Any]]] = [
+    ("GET", "/api/transactions/", {"type": "expense", "category": "Food & Dining", "start_date": date.today().replace(day=1).isoformat()}),
+    ("GET", "/api/transactions/", {"search": "Food"}),
+    ("GET", "/api/users/{user_id}/stats", {"start_date": date.today().replace(day=1).isoformat()}),
+    ("GET", "/api/summary/", {"start_date": date.today().replace(day=1).isoformat()}),
+    ("GET", "/api/analytics/financial-health", {"start_date": date.today().replace(month=1, day=1).isoformat()}),
+]
+EXPLAINABLE = ("select", "insert", "update", "delete", "with")
+
+_captured: Optional[List[Tuple[str, Any]]] = None
+
+def _capture(conn, cursor, statement, parameters, context, executemany):
+    # Route statement timeouts (data.statement_timeouts) are settings, not queries
+    if _captured is not None and not executemany and not statement.startswith("SET LOCAL"):
+        _captured.append((statement, parameters))
+
+def _plan_nodes(node: Dict[str, Any]):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _plan_nodes(child)
+
+async def _fixture_ids() -> Dict[str, str]:
+    """The heaviest user and one of each of their objects, for path parameters"""
+    async with engine.connect() as conn:
+        user_id = (await conn.execute(text(
+            "SELECT user_id FROM transactions GROUP BY user_id ORDER BY count(*) DESC LIMIT 1"
+        ))).scalar()
+        if user_id is None:
+            raise SystemExit("No transactions found; seed the database with benchmarks.seed first")
+        ids = {"user_id": str(user_id)}
+        for name, table in [("goal_id", "goals"), ("budget_id", "budgets"), ("transaction_id", "transactions"),
+                            ("account_id", "accounts"), ("conversation_id", "coach_conversations")]:
+            value = (await conn.execute(text(f"SELECT id FROM {table} WHERE user_id = :user_id LIMIT 1"), {"user_id": user_id})).scalar()
+            if value is not None:
+                ids[name] = str(value)
+    return ids
+
+async def _table_rows() -> Dict[str, float]:
+    async with engine.connect() as conn:
+        rows = await conn.execute(text(
+            "SELECT relname, reltuples FROM pg_class WHERE relkind = 'r' AND relnamespace = 'public'::regnamespace"
+        ))
+        return {name: tuples for name, tuples in rows}
+
+async def _explain(statement: str, parameters) -> Optional[Dict[str, Any]]:
+    if not statement.lstrip().lower().startswith(EXPLAINABLE):
+        return None
+    async with engine.connect() as conn:
+        result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+        plan = result.scalar()
+        await conn.rollback()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+def _requests(app, ids: Dict[str, str]) -> List[Tuple[str, str, str, Dict[str, Any]]]:
+    """(method, route, url, params) for every checkable GET route, then the extras"""
+    requests = []
+    for route in app.routes:
+        if not isinstance(route, APIRoute) or "GET" not in route.methods:
+            continue
+        if not route.path.startswith("/api") or route.path.startswith(SKIPPED_PREFIXES):
+            continue
+        try:
+            url = route.path.format(**ids)
+        except KeyError:
+            continue
+        requests.append(("GET", route.path, url, QUERY_PARAMS.get(route.path, {})))
+    for method, path, params in EXTRA_REQUESTS:
+        requests.append((method, path, path.format(**ids), params))
+    return requests
+
+async def _check_request(client: httpx.AsyncClient, method: str, route: str, url: str, table_rows: Dict[str, float],
+                         args, **kwargs) -> Dict[str, Any]:
+    global _captured
+    _captured = []
+    try:
+        response = await client.request(method, url, **kwargs)
+    finally:
+        statements, _captured = _captured, None
+
+    key = f"{method} {route}"
+    limits = {"max_statements": args.max_statements, "max_repeats": args.max_repeats, **ENDPOINT_LIMITS.get(key, {})}
+    violations = []
+    if len(statements) > limits["max_statements"]:
+        violations.append(f"{len(statements)} statements (limit {limits['max_statements']})")
+
+    shapes: Dict[str, int] = {}
+    checked = []
+    for statement, parameters in statements:
+        normalized = normalize_sql(statement)
+        shapes[normalized] = shapes.get(normalized, 0) + 1
+        if shapes[normalized] > 1:
+            continue  # same shape, same plan
+        try:
+            plan = await _explain(statement, parameters)
+        except Exception as e:
+            violations.append(f"EXPLAIN failed for {fingerprint_sql(normalized)}: {e!r}")
+            continue
+        if plan is None:
+            continue
+        cost = plan["Total Cost"]
+        checked.append({"fingerprint": fingerprint_sql(normalized), "query": normalized[:300], "cost": cost})
+        if cost > args.max_cost:
+            violations.append(f"cost {cost:.0f} > {args.max_cost:.0f}: {normalized[:120]}")
+        for node in _plan_nodes(plan):
+            table = node.get("Relation Name")
+            if node["Node Type"] == "Seq Scan" and table in args.seqscan_tables and table_rows.get(table, 0) > args.seqscan_rows:
+                violations.append(f"seq scan on {table} ({table_rows[table]:.0f} rows): {normalized[:120]}")
+
+    for normalized, count in shapes.items():
+        if count > limits["max_repeats"]:
+            violations.append(f"same statement {count} times (limit {limits['max_repeats']}), likely N+1: {normalized[:120]}")
+
+    return {
+        "endpoint": key,
+        "url": url,
+        "status": response.status_code,
+        "statements": len(statements),
+        "plans": checked,
+        "violations": violations,
+    }
+
+async def main(args: argparse.Namespace) -> int:
+    import main as api
+
+    event.listen(Engine, "before_cursor_execute", _capture)
+    ids = await _fixture_ids()
+    table_rows = await _table_rows()
+    token = create_access_token(data={"sub": ids["user_id"]})
+    results = []
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=api.app), base_url="http://plans",
+        headers={"Authorization": f"Bearer {token}"}, timeout=60.0
+    ) as client:
+        for method, route, url, params in _requests(api.app, ids):
+            results.append(await _check_request(client, method, route, url, table_rows, args, params=params))
+
+        # Write path: create, update and delete one transaction
+        created = await _check_request(client, "POST", "/api/transactions/", "/api/transactions/", table_rows, args, json={
+            "amount": 1500.0, "type": "expense", "category": "Transportation", "description": "query plan check"
+        })
+        results.append(created)
+        if created["status"] == 200:
+            # The id is only known after the fact, so fetch it outside the capture
+            async with engine.connect() as conn:
+                transaction_id = (await conn.execute(text(
+                    "SELECT id FROM transactions WHERE user_id = :user_id AND description = 'query plan check' ORDER BY date DESC LIMIT 1"
+                ), {"user_id": ids["user_id"]})).scalar()
+            url = f"/api/transactions/{transaction_id}"
+            results.append(await _check_request(client, "PATCH", "/api/transactions/{transaction_id}", url, table_rows, args, json={"amount": 1600.0}))
+            results.append(await _check_request(client, "DELETE", "/api/transactions/{transaction_id}", url, table_rows, args))
+    await engine.dispose()
+
+    failed = [r for r in results if r["violations"]]
+    for result in results:
+        mark = "FAIL" if result["violations"] else "ok  "
+        print(f"{mark} {result['endpoint']:55} {result['status']} {result['statements']:>3} statements")
+        for violation in result["violations"]:
+            print(f"       {violation}")
+    print(f"{len(results)} requests checked, {len(failed)} with violations")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check query plans and statement counts of the API endpoints")
+    parser.add_argument("--seqscan-tables", type=lambda value: value.split(","), default=SEQSCAN_TABLES)
+    parser.add_argument("--seqscan-rows", type=int, default=SEQSCAN_ROWS, help="Tables smaller than this may be scanned")
+    parser.add_argument("--max-cost", type=float, default=MAX_COST, help="Largest allowed estimated total cost per statement")
+    parser.add_argument("--max-statements", type=int, default=MAX_STATEMENTS)
+    parser.add_argument("--max-repeats", type=int, default=MAX_REPEATS, help="Times one statement shape may repeat in a request")
+    parser.add_argument("--output", help="Write the per-request results as JSON")
+    sys.exit(asyncio.run(main(parser.parse_args())))
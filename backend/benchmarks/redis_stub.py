@@ -0,0 +1,152 @@
+"""
+Local stand-in for a Redis server.
+
+Speaks enough of the Redis protocol (RESP2) for data.cache: GET, SET
+with PX/EX/NX/XX, INCR/INCRBY, DEL, EXISTS, PUBLISH, SUBSCRIBE and
+UNSUBSCRIBE, plus the PING, SELECT and CLIENT calls redis-py makes when
+connecting. Single database, no persistence, keys expire lazily on
+access:
+
+    python -m benchmarks.redis_stub --port 6399
+    CACHE_URL=redis://127.0.0.1:6399/0 python serve.py --workers 4
+
+Runs the cache across workers on a machine without Redis, and is what
+benchmarks.cache_check uses by default.
+"""
+import argparse
+import asyncio
+import math
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+class RedisStub:
+    def __init__(self):
+        self.data: Dict[bytes, Tuple[bytes, float]] = {}
+        self.channels: Dict[bytes, Set[asyncio.StreamWriter]] = {}
+
+    def _get(self, key: bytes) -> Optional[bytes]:
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            del self.data[key]
+            return None
+        return entry[0]
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        subscriptions: Set[bytes] = set()
+        try:
+            while True:
+                command = await _read_command(reader)
+                if command is None:
+                    break
+                writer.write(self.execute(command, writer, subscriptions))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for channel in subscriptions:
+                self.channels.get(channel, set()).discard(writer)
+            writer.close()
+
+    def execute(self, command: List[bytes], writer: asyncio.StreamWriter, subscriptions: Set[bytes]) -> bytes:
+        name, args = command[0].upper(), command[1:]
+        if name == b"PING":
+            return b"+PONG\r\n"
+        if name in (b"SELECT", b"CLIENT", b"FLUSHDB", b"FLUSHALL"):
+            if name in (b"FLUSHDB", b"FLUSHALL"):
+                self.data.clear()
+            return b"+OK\r\n"
+        if name == b"GET":
+            return _bulk(self._get(args[0]))
+        if name == b"SET":
+            key, value, options = args[0], args[1], [a.upper() for a in args[2:]]
+            expires = math.inf
+            for i, option in enumerate(options):
+                if option == b"PX":
+                    expires = time.monotonic() + int(args[2 + i + 1]) / 1000
+                elif option == b"EX":
+                    expires = time.monotonic() + int(args[2 + i + 1])
+            exists = self._get(key) is not None
+            if (b"NX" in options and exists) or (b"XX" in options and not exists):
+                return _bulk(None)
+            self.data[key] = (value, expires)
+            return b"+OK\r\n"
+        if name in (b"INCR", b"INCRBY"):
+            entry = self.data.get(args[0])
+            value = int(self._get(args[0]) or 0) + (int(args[1]) if name == b"INCRBY" else 1)
+            self.data[args[0]] = (str(value).encode(), entry[1] if entry else math.inf)
+            return f":{value}\r\n".encode()
+        if name == b"DEL":
+            return f":{sum(self.data.pop(key, None) is not None for key in args)}\r\n".encode()
+        if name == b"EXISTS":
+            return f":{sum(self._get(key) is not None for key in args)}\r\n".encode()
+        if name == b"PUBLISH":
+            receivers = self.channels.get(args[0], set())
+            message = _array([b"message", args[0], args[1]])
+            for receiver in list(receivers):
+                receiver.write(message)
+            return f":{len(receivers)}\r\n".encode()
+        if name == b"SUBSCRIBE":
+            replies = b""
+            for channel in args:
+                subscriptions.add(channel)
+                self.channels.setdefault(channel, set()).add(writer)
+                replies += _array([b"subscribe", channel, len(subscriptions)])
+            return replies
+        if name == b"PUNSUBSCRIBE":
+            # Pattern subscriptions are not supported, so there is never one to drop
+            return _array([b"punsubscribe", None, len(subscriptions)])
+        if name == b"UNSUBSCRIBE":
+            channels = args or list(subscriptions)
+            if not channels:
+                return _array([b"unsubscribe", None, 0])
+            replies = b""
+            for channel in channels:
+                subscriptions.discard(channel)
+                self.channels.get(channel, set()).discard(writer)
+                replies += _array([b"unsubscribe", channel, len(subscriptions)])
+            return replies
+        return f"-ERR unknown command '{name.decode(errors='replace')}'\r\n".encode()
+
+def _bulk(value: Optional[bytes]) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+def _array(items) -> bytes:
+    parts = [b"*%d\r\n" % len(items)]
+    for item in items:
+        parts.append(f":{item}\r\n".encode() if isinstance(item, int) else _bulk(item))
+    return b"".join(parts)
+
+async def _read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        # Inline command, as typed into telnet
+        return line.strip().split() or [b"PING"]
+    parts = []
+    for _ in range(int(line[1:])):
+        length = int((await reader.readline())[1:])
+        parts.append((await reader.readexactly(length + 2))[:-2])
+    return parts
+
+async def start_stub(host: str = "127.0.0.1", port: int = 6399) -> asyncio.AbstractServer:
+    return await asyncio.start_server(RedisStub().handle, host, port)
+
+async def main(args: argparse.Namespace) -> None:
+    server = await start_stub(args.host, args.port)
+    print(f"Redis stand-in listening on redis://{args.host}:{args.port}/0")
+    async with server:
+        await server.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Minimal Redis-protocol server for local runs and checks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6399)
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,128 @@
+"""
+Throughput scaling with the number of worker processes.
+
+Starts serve.py with each worker count in turn, waits for /health/ready,
+drives it with benchmarks.load over HTTP and stops it again:
+
+    python -m benchmarks.scaling --workers 1,2,4 --scenario dashboard --users 64
+    python -m benchmarks.scaling --workers 1,2,4,8 --output scaling.json
+
+The database must be seeded (benchmarks.seed). For the coach scenario
+start benchmarks.llm_stub and export OPENAI_BASE_URL first; the servers
+inherit the environment. The load generator is itself a Python process,
+so it runs in --load-processes processes; leave it enough cores, or the
+client caps the throughput instead of the server.
+
+Reports throughput, p95 and the speedup and efficiency against the first
+worker count for each run.
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, Any, List
+
+import httpx
+
+from benchmarks.stats import machine_description
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+READY_TIMEOUT = 120.0
+
+def wait_ready(base_url: str, server: subprocess.Popen) -> None:
+    deadline = time.monotonic() + READY_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f"Server exited with code {server.returncode} before becoming ready")
+        try:
+            if httpx.get(f"{base_url}/health/ready", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise SystemExit(f"Server not ready after {READY_TIMEOUT:g}s")
+
+def _run_load(base_url: str, args) -> Dict[str, Any]:
+    """Run the load generator in several processes and add up their throughput"""
+    users = max(args.users // args.load_processes, 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        outputs = [os.path.join(tmp, f"load-{i}.json") for i in range(args.load_processes)]
+        clients = [
+            subprocess.Popen([
+                sys.executable, "-m", "benchmarks.load", "--base-url", base_url, "--scenarios", args.scenario,
+                "--users", str(users), "--duration", str(args.duration), "--warmup", str(args.warmup),
+                "--population", str(args.population), "--output", output
+            ], cwd=BACKEND_DIR, stdout=subprocess.DEVNULL)
+            for output in outputs
+        ]
+        for client in clients:
+            if client.wait() != 0:
+                raise SystemExit(f"Load generator failed with code {client.returncode}")
+        results = []
+        for output in outputs:
+            with open(output) as f:
+                results.append(json.load(f)["scenarios"][args.scenario]["scenario"])
+    return {
+        "throughput_rps": round(sum(r["throughput_rps"] for r in results), 1),
+        "requests": sum(r["requests"] for r in results),
+        "errors": sum(r["errors"] for r in results),
+        # Percentiles cannot be merged exactly; the worst client is the conservative figure
+        "p50_ms": max(r["p50_ms"] for r in results),
+        "p95_ms": max(r["p95_ms"] for r in results),
+    }
+
+def measure(workers: int, args) -> Dict[str, Any]:
+    base_url = f"http://127.0.0.1:{args.port}"
+    server = subprocess.Popen([
+        sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(args.port),
+        "--workers", str(workers), "--max-requests", "0"
+    ], cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(base_url, server)
+        return {"workers": workers, **_run_load(base_url, args)}
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=90)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+
+def main(args: argparse.Namespace) -> int:
+    runs: List[Dict[str, Any]] = []
+    print(f"{'workers':>7} {'rps':>9} {'speedup':>8} {'efficiency':>10} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+    for workers in [int(value) for value in args.workers.split(",")]:
+        run = measure(workers, args)
+        base = runs[0] if runs else run
+        run["speedup"] = round(run["throughput_rps"] / base["throughput_rps"], 2) if base["throughput_rps"] else 0.0
+        run["efficiency"] = round(run["speedup"] * base["workers"] / workers, 2)
+        runs.append(run)
+        print(f"{workers:>7} {run['throughput_rps']:>9} {run['speedup']:>8} {run['efficiency']:>10} "
+              f"{run['p50_ms']:>8} {run['p95_ms']:>8} {run['errors']:>7}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "machine": machine_description(),
+                "cpus": os.cpu_count(),
+                "config": {"scenario": args.scenario, "users": args.users, "duration": args.duration},
+                "runs": runs,
+            }, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure throughput for increasing numbers of worker processes")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts")
+    parser.add_argument("--scenario", default="dashboard")
+    parser.add_argument("--users", type=int, default=64, help="Concurrent virtual users in total")
+    parser.add_argument("--population", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=5.0)
+    parser.add_argument("--load-processes", type=int, default=2)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--output", help="Also write the results as JSON")
+    sys.exit(main(parser.parse_args()))
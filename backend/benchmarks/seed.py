@@ -0,0 +1,209 @@
+"""
+Synthetic data generator for benchmarks.
+
+Seeds Postgres with a reproducible population of users, each with a
+profile, stats, accounts, budgets, goals and a transaction history. The
+transaction count per user is log-uniform between --min-transactions and
+--max-transactions, so most users are small and a few are very large,
+like in production:
+
+    python -m benchmarks.seed --users 10000 --min-transactions 1 --max-transactions 100000
+
+Users are bench-<n>@example.com / bench_<n> with password BENCH_PASSWORD,
+which is what benchmarks.load logs in with. --reset removes a previous
+population first. Rows are written with COPY, so millions of transactions
+take minutes, not hours.
+"""
+import argparse
+import asyncio
+import math
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List, Tuple
+
+import asyncpg
+
+from categories import ALL_DEFAULT_CATEGORIES
+from data.database import DATABASE_URL
+from auth.security import get_password_hash
+
+BENCH_PASSWORD = "benchmark-password"
+BENCH_EMAIL = "bench-{}@example.com"
+BENCH_USERNAME = "bench_{}"
+COPY_BATCH = 50_000
+
+# category: (relative frequency, median amount in KZT, spread of the log-normal)
+EXPENSE_PROFILE = {
+    "Food & Dining": (30, 4_000, 0.7),
+    "Transportation": (18, 1_500, 0.6),
+    "Shopping": (12, 15_000, 0.9),
+    "Entertainment": (9, 8_000, 0.8),
+    "Utilities": (5, 20_000, 0.4),
+    "Healthcare": (4, 10_000, 0.9),
+    "Housing": (3, 150_000, 0.3),
+    "Education": (3, 30_000, 0.6),
+    "Travel": (2, 80_000, 0.8),
+    "Insurance": (2, 25_000, 0.3),
+    "Debt Payment": (3, 50_000, 0.5),
+    "Savings": (3, 50_000, 0.6),
+    "Taxes": (1, 40_000, 0.5),
+    "Other Expense": (5, 5_000, 1.0),
+}
+INCOME_PROFILE = {
+    "Salary": 80,
+    "Freelance": 10,
+    "Gift": 4,
+    "Refund": 4,
+    "Investment": 2,
+}
+# Share of a user's transactions that are income
+INCOME_SHARE = 0.08
+ACCOUNT_TEMPLATES = [("Kaspi Gold", "card"), ("Наличные", "wallet"), ("Депозит", "deposit")]
+GOAL_NAMES = ["Подушка безопасности", "Отпуск", "Новый ноутбук", "Автомобиль", "Первый взнос за квартиру"]
+NAMES = ["Айгерим", "Ержан", "Дана", "Алихан", "Мадина", "Нурлан", "Асель", "Тимур"]
+
+TRANSACTION_COLUMNS = ["id", "user_id", "account_id", "amount", "type", "category", "description", "date"]
+
+def _uuid(rng: random.Random) -> uuid.UUID:
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+def _transaction_count(rng: random.Random, minimum: int, maximum: int) -> int:
+    # Log-uniform: long tail of heavy users, most users small
+    return int(math.exp(rng.uniform(math.log(minimum), math.log(maximum + 1))))
+
+def _random_moment(rng: random.Random, start: datetime, span_seconds: float) -> datetime:
+    moment = start + timedelta(seconds=rng.uniform(0, span_seconds))
+    # Weekends see more spending; re-draw a share of weekday moments
+    if moment.weekday() < 5 and rng.random() < 0.2:
+        moment = start + timedelta(seconds=rng.uniform(0, span_seconds))
+    hour = min(23, max(7, int(rng.gauss(15, 4))))
+    return moment.replace(hour=hour, minute=rng.randrange(60))
+
+def generate_transactions(rng: random.Random, user_id: uuid.UUID, account_ids: List[uuid.UUID],
+                          count: int, monthly_income: int, months: int, now: datetime):
+    """Yield COPY records for one user's transaction history"""
+    start = now - timedelta(days=30 * months)
+    span = (now - start).total_seconds()
+    expense_categories = list(EXPENSE_PROFILE)
+    expense_weights = [EXPENSE_PROFILE[c][0] for c in expense_categories]
+    income_categories = list(INCOME_PROFILE)
+    income_weights = list(INCOME_PROFILE.values())
+
+    for _ in range(count):
+        account_id = rng.choice(account_ids) if rng.random() < 0.9 else None
+        if rng.random() < INCOME_SHARE:
+            category = rng.choices(income_categories, income_weights)[0]
+            amount = monthly_income * rng.uniform(0.9, 1.1) if category == "Salary" else rng.lognormvariate(math.log(30_000), 0.8)
+            kind = "income"
+        else:
+            category = rng.choices(expense_categories, expense_weights)[0]
+            _, median, sigma = EXPENSE_PROFILE[category]
+            amount = rng.lognormvariate(math.log(median), sigma)
+            kind = "expense"
+        yield (
+            _uuid(rng), user_id, account_id, round(amount, 2), kind, category,
+            None if rng.random() < 0.6 else f"{category} #{rng.randrange(1000)}",
+            _random_moment(rng, start, span),
+        )
+
+async def reset_population(conn: asyncpg.Connection) -> None:
+    users = "SELECT id FROM users WHERE email LIKE 'bench-%@example.com'"
+    for table in ["transactions", "budgets", "goals", "accounts", "user_stats", "user_profiles", "coach_insights", "coach_conversations"]:
+        await conn.execute(f"DELETE FROM {table} WHERE user_id IN ({users})")
+    await conn.execute(f"DELETE FROM users WHERE id IN ({users})")
+
+async def seed_user(conn: asyncpg.Connection, index: int, args, password_hash: str, now: datetime) -> int:
+    rng = random.Random(f"{args.seed}-{index}")
+    user_id = _uuid(rng)
+    monthly_income = rng.randrange(150_000, 1_500_000, 10_000)
+    created_at = now - timedelta(days=30 * args.months + rng.randrange(30))
+
+    await conn.copy_records_to_table(
+        "users", columns=["id", "email", "username", "password_hash", "is_active", "created_at"],
+        records=[(user_id, BENCH_EMAIL.format(index), BENCH_USERNAME.format(index), password_hash, True, created_at)]
+    )
+    await conn.copy_records_to_table(
+        "user_profiles", columns=["id", "user_id", "name", "age", "monthly_income", "currency", "created_at"],
+        records=[(_uuid(rng), user_id, rng.choice(NAMES), rng.randrange(18, 65), monthly_income, "KZT", created_at)]
+    )
+    await conn.copy_records_to_table(
+        "user_stats", columns=["id", "user_id", "xp", "level", "streak", "total_minutes_lost", "last_transaction_date"],
+        records=[(_uuid(rng), user_id, rng.randrange(5000), rng.randrange(1, 20), rng.randrange(30), rng.randrange(10_000), now.date())]
+    )
+
+    accounts = [
+        (_uuid(rng), user_id, name, round(rng.uniform(0, monthly_income * 3), 2), icon, created_at)
+        for name, icon in ACCOUNT_TEMPLATES[:rng.randint(1, len(ACCOUNT_TEMPLATES))]
+    ]
+    await conn.copy_records_to_table("accounts", columns=["id", "user_id", "name", "balance", "icon", "created_at"], records=accounts)
+
+    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    budget_categories = rng.sample(list(EXPENSE_PROFILE), rng.randint(2, 5))
+    budgets = [
+        (_uuid(rng), user_id, category, round(EXPENSE_PROFILE[category][1] * rng.uniform(5, 15), -2), "monthly", month_start, True, created_at)
+        for category in budget_categories
+    ]
+    await conn.copy_records_to_table(
+        "budgets", columns=["id", "user_id", "category", "amount", "period", "start_date", "is_active", "created_at"], records=budgets
+    )
+
+    goals = []
+    for name in rng.sample(GOAL_NAMES, rng.randint(1, 3)):
+        target = round(rng.uniform(200_000, 5_000_000), -3)
+        goals.append((
+            _uuid(rng), user_id, name, target, round(target * rng.uniform(0, 0.8), -2),
+            now + timedelta(days=rng.randrange(60, 900)), "Savings", True, created_at
+        ))
+    await conn.copy_records_to_table(
+        "goals", columns=["id", "user_id", "name", "target_amount", "current_amount", "target_date", "category", "is_active", "created_at"],
+        records=goals
+    )
+
+    count = _transaction_count(rng, args.min_transactions, args.max_transactions)
+    batch: List[Tuple] = []
+    for record in generate_transactions(rng, user_id, [a[0] for a in accounts], count, monthly_income, args.months, now):
+        batch.append(record)
+        if len(batch) >= COPY_BATCH:
+            await conn.copy_records_to_table("transactions", columns=TRANSACTION_COLUMNS, records=batch)
+            batch = []
+    if batch:
+        await conn.copy_records_to_table("transactions", columns=TRANSACTION_COLUMNS, records=batch)
+    return count
+
+async def main(args: argparse.Namespace) -> None:
+    dsn = DATABASE_URL.replace("+asyncpg", "")
+    conn = await asyncpg.connect(dsn)
+    try:
+        if args.reset:
+            await reset_population(conn)
+        await conn.executemany(
+            "INSERT INTO categories (name, is_default) VALUES ($1, true) ON CONFLICT (name) DO NOTHING",
+            [(name,) for name in ALL_DEFAULT_CATEGORIES]
+        )
+
+        password_hash = await get_password_hash(BENCH_PASSWORD)
+        now = datetime.now(timezone.utc)
+        started = time.monotonic()
+        total = 0
+        for index in range(args.users):
+            async with conn.transaction():
+                total += await seed_user(conn, index, args, password_hash, now)
+            if (index + 1) % 100 == 0:
+                print(f"{index + 1}/{args.users} users, {total} transactions, {time.monotonic() - started:.0f}s")
+        # Fresh statistics so the planner sees the new row counts
+        await conn.execute("ANALYZE")
+        print(f"Seeded {args.users} users and {total} transactions in {time.monotonic() - started:.0f}s")
+    finally:
+        await conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed Postgres with a synthetic benchmark population")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--min-transactions", type=int, default=1)
+    parser.add_argument("--max-transactions", type=int, default=20_000)
+    parser.add_argument("--months", type=int, default=24, help="Length of the transaction history")
+    parser.add_argument("--seed", type=int, default=42, help="Same seed, same population")
+    parser.add_argument("--reset", action="store_true", help="Delete the previous benchmark population first")
+    asyncio.run(main(parser.parse_args()))
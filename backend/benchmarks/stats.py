@@ -0,0 +1,28 @@
+import platform
+import statistics
+from typing import Dict, Any, List
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of the samples (0 when empty)"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def summarize(latencies_ms: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    """Latency percentiles and throughput in the format shared by all benchmark reports"""
+    return {
+        "requests": len(latencies_ms),
+        "errors": errors,
+        "throughput_rps": round(len(latencies_ms) / elapsed, 1) if elapsed > 0 else 0.0,
+        "mean_ms": round(statistics.fmean(latencies_ms), 2) if latencies_ms else 0.0,
+        "p50_ms": round(percentile(latencies_ms, 50), 2),
+        "p95_ms": round(percentile(latencies_ms, 95), 2),
+        "p99_ms": round(percentile(latencies_ms, 99), 2),
+        "max_ms": round(max(latencies_ms), 2) if latencies_ms else 0.0,
+    }
+
+def machine_description() -> str:
+    """Identifies where a baseline was recorded; timings only compare on the same kind of machine"""
+    return f"{platform.machine()} {platform.processor() or platform.system()} / Python {platform.python_version()}"
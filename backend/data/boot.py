@@ -0,0 +1,86 @@
+import os
+import uuid
+import asyncio
+import logging
+import importlib
+from typing import Set
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from auth.security import USER_BY_ID, get_pwd_context
+from services.ai_coach import get_client
+from utils.filters import transaction_list_statement
+
+logger = logging.getLogger(__name__)
+
+# "strict" refuses to start on a schema that is not at the Alembic head, "warn" only logs, "off" skips
+SCHEMA_VERSION_CHECK = os.getenv("SCHEMA_VERSION_CHECK", "strict").lower()
+# Open the whole pool and compile the hottest statements before serving
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "true").lower() == "true"
+
+# Imported on first use by the code that needs them; preloaded in the background after boot
+LAZY_MODULES = ["jose.jwt", "passlib.handlers.bcrypt", "httpx", "openai"]
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class SchemaVersionError(RuntimeError):
+    pass
+
+def expected_schema_heads() -> Set[str]:
+    """Head revisions of the Alembic migrations shipped with this build"""
+    # Half a second of imports, and only needed here
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+
+    config = Config(os.path.join(_BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(_BACKEND_DIR, "alembic"))
+    return set(ScriptDirectory.from_config(config).get_heads())
+
+async def check_schema_version(engine: AsyncEngine) -> None:
+    """Make sure migrations ran; the schema is owned by Alembic, never created here"""
+    if SCHEMA_VERSION_CHECK == "off":
+        return
+    expected = await asyncio.to_thread(expected_schema_heads)
+    async with engine.connect() as conn:
+        exists = (await conn.execute(text("SELECT to_regclass('alembic_version')"))).scalar()
+        current = set((await conn.execute(text("SELECT version_num FROM alembic_version"))).scalars()) if exists else set()
+
+    if current == expected:
+        logger.info(f"Database schema at {', '.join(sorted(current))}")
+        return
+    message = (
+        f"Database schema is at {', '.join(sorted(current)) or 'no revision'}, "
+        f"this build expects {', '.join(sorted(expected))}; run 'alembic upgrade head'"
+    )
+    if SCHEMA_VERSION_CHECK == "strict":
+        raise SchemaVersionError(message)
+    logger.warning(message)
+
+async def warm_up(engine: AsyncEngine, pool_size: int) -> None:
+    """Fill the connection pool and the compiled statement cache"""
+    if not STARTUP_WARMUP:
+        return
+    # Held at the same time so the pool really opens pool_size connections
+    connections = await asyncio.gather(*(engine.connect().start() for _ in range(pool_size)), return_exceptions=True)
+    try:
+        for conn in connections:
+            if isinstance(conn, BaseException):
+                raise conn
+        await asyncio.gather(*(conn.execute(text("SELECT 1")) for conn in connections))
+    finally:
+        await asyncio.gather(*(conn.close() for conn in connections if not isinstance(conn, BaseException)))
+
+    # Every authenticated request and the transaction list start with these
+    async with engine.connect() as conn:
+        await conn.execute(USER_BY_ID, {"user_id": uuid.uuid4()})
+        await conn.execute(transaction_list_statement(uuid.uuid4()))
+
+async def preload_lazy_modules() -> None:
+    """Import the lazily loaded libraries off the event loop, then build their clients"""
+    started = asyncio.get_running_loop().time()
+    for name in LAZY_MODULES:
+        await asyncio.to_thread(importlib.import_module, name)
+    get_pwd_context()
+    get_client()
+    logger.info(f"Preloaded {', '.join(LAZY_MODULES)} in {(asyncio.get_running_loop().time() - started) * 1000:.0f}ms")
@@ -0,0 +1,414 @@
+"""
+Shared cache with versioned invalidation.
+
+A Cache is a named namespace whose entries are grouped into scopes,
+usually a user id. Every scope has a version number stored in the
+backend and part of each entry's key. Invalidating a scope is a single
+INCR: the old entries become unreachable and expire with their TTL. A
+loader that read the database before an invalidation stores its result
+under the old version, so a racing write can never be cached over.
+
+Workers keep the scope versions they have seen in memory for up to
+CACHE_VERSION_TTL seconds. Every invalidation is published on a pub/sub
+channel, and every worker that subscribed drops the version right away.
+A write on one node is therefore seen on all others without a version
+lookup per read. If the subscription drops, the version TTL bounds how
+long a worker can miss an invalidation.
+
+Backends:
+
+- MemoryBackend: process-local, the default. Entries are per worker
+  process, so with several workers a write only reaches the other
+  workers' entries when their TTL runs out;
+- RedisBackend: any server that speaks the Redis protocol, selected with
+  CACHE_URL=redis://host:6379/0 and shared by all workers and nodes.
+  benchmarks.redis_stub is a local stand-in and benchmarks.cache_check
+  runs both backends through the same checks.
+
+Invalidation follows the writes: a cache declares the models that affect
+it with invalidated_by(), and sessions from data.database invalidate the
+matching scopes after each commit. Bulk UPDATE/DELETE statements bypass
+the session's object tracking and must call invalidate() themselves.
+Listeners added with on_invalidate() run on the worker that invalidated
+a scope, so it can be rebuilt in the background (services.dashboard_snapshot).
+
+Values go through JSON, with tags for datetimes, dates, UUIDs and
+Decimals. Pydantic models are stored as their dict.
+"""
+import os
+import json
+import math
+import time
+import uuid
+import asyncio
+import logging
+import itertools
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple, Type
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from utils.metrics import CACHE_REQUESTS, CACHE_INVALIDATIONS, CACHE_ERRORS
+
+logger = logging.getLogger(__name__)
+
+# redis://host:port/db shares the cache between workers and nodes; in-process when unset
+CACHE_URL = os.getenv("CACHE_URL", "")
+# Prefix of every key and channel, so several deployments can share one server
+CACHE_PREFIX = os.getenv("CACHE_PREFIX", "fc")
+# Longest a worker trusts a scope version without hearing about an invalidation
+CACHE_VERSION_TTL = float(os.getenv("CACHE_VERSION_TTL", "5"))
+# Kill switch: every lookup becomes a miss and nothing is stored
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+
+INVALIDATION_CHANNEL = f"{CACHE_PREFIX}:invalidate"
+# Published after (re)subscribing: versions seen while not listening may be outdated
+FORGET_ALL = "*"
+
+def _encode_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$datetime": value.isoformat()}
+    if isinstance(value, date):
+        return {"$date": value.isoformat()}
+    if isinstance(value, uuid.UUID):
+        return {"$uuid": str(value)}
+    if isinstance(value, Decimal):
+        return {"$decimal": str(value)}
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    raise TypeError(f"{type(value).__name__} is not cacheable")
+
+def _decode_object(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1:
+        tag, value = next(iter(obj.items()))
+        if tag == "$datetime":
+            return datetime.fromisoformat(value)
+        if tag == "$date":
+            return date.fromisoformat(value)
+        if tag == "$uuid":
+            return uuid.UUID(value)
+        if tag == "$decimal":
+            return Decimal(value)
+    return obj
+
+def encode_value(value: Any) -> bytes:
+    return json.dumps(value, default=_encode_default, separators=(",", ":")).encode()
+
+def decode_value(raw: bytes) -> Any:
+    return json.loads(raw, object_hook=_decode_object)
+
+class CacheBackend:
+    """Storage and pub/sub operations a cache needs"""
+
+    async def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        raise NotImplementedError
+
+    async def incr(self, key: str) -> int:
+        raise NotImplementedError
+
+    async def publish(self, channel: str, message: str) -> None:
+        raise NotImplementedError
+
+    async def subscribe(self, channel: str, handler: Callable[[str], None]) -> None:
+        """Call handler with every message published on channel, in the background"""
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+class MemoryBackend(CacheBackend):
+    """Process-local backend; pub/sub only reaches this process"""
+
+    # Expired entries are swept once the store grows past this
+    SWEEP_SIZE = 10000
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[bytes, float]] = {}
+        self._handlers: Dict[str, List[Callable[[str], None]]] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            del self._entries[key]
+            return None
+        return entry[0]
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        now = time.monotonic()
+        self._entries[key] = (value, now + ttl)
+        if len(self._entries) > self.SWEEP_SIZE:
+            for stale in [k for k, (_, expires) in self._entries.items() if expires <= now]:
+                del self._entries[stale]
+
+    async def incr(self, key: str) -> int:
+        # Counters never expire, like INCR on a key without TTL
+        value = int(await self.get(key) or 0) + 1
+        self._entries[key] = (str(value).encode(), math.inf)
+        return value
+
+    async def publish(self, channel: str, message: str) -> None:
+        for handler in self._handlers.get(channel, []):
+            handler(message)
+
+    async def subscribe(self, channel: str, handler: Callable[[str], None]) -> None:
+        self._handlers.setdefault(channel, []).append(handler)
+
+class RedisBackend(CacheBackend):
+    """Backend on a Redis-protocol server, shared by every worker and node using it"""
+
+    # Pause before re-subscribing after the connection was lost
+    RESUBSCRIBE_DELAY = 1.0
+
+    def __init__(self, url: str):
+        # Only imported when a Redis cache is configured
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(url)
+        self._listener: Optional[asyncio.Task] = None
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self.client.set(key, value, px=max(int(ttl * 1000), 1))
+
+    async def incr(self, key: str) -> int:
+        return await self.client.incr(key)
+
+    async def publish(self, channel: str, message: str) -> None:
+        await self.client.publish(channel, message)
+
+    async def subscribe(self, channel: str, handler: Callable[[str], None]) -> None:
+        self._listener = asyncio.create_task(self._listen(channel, handler))
+
+    async def _listen(self, channel: str, handler: Callable[[str], None]) -> None:
+        while True:
+            pubsub = self.client.pubsub()
+            try:
+                await pubsub.subscribe(channel)
+                # Invalidations published while we were not listening are lost
+                handler(FORGET_ALL)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        handler(message["data"].decode())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                CACHE_ERRORS.labels("pubsub").inc()
+                logger.warning(f"Cache invalidation channel lost ({e!r}), resubscribing in {self.RESUBSCRIBE_DELAY:g}s")
+                await asyncio.sleep(self.RESUBSCRIBE_DELAY)
+            finally:
+                await pubsub.aclose()
+
+    async def close(self) -> None:
+        if self._listener:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+        await self.client.aclose()
+
+_backend: Optional[CacheBackend] = None
+_caches: Dict[str, "Cache"] = {}
+# Model class -> caches it invalidates, with the function giving the scope of an instance
+_invalidation_rules: Dict[type, List[Tuple["Cache", Callable[[Any], Any]]]] = {}
+
+def get_backend() -> CacheBackend:
+    """The configured backend, created on first use"""
+    global _backend
+    if _backend is None:
+        _backend = RedisBackend(CACHE_URL) if CACHE_URL else MemoryBackend()
+    return _backend
+
+def _on_invalidation(message: str) -> None:
+    if message == FORGET_ALL:
+        for cache in _caches.values():
+            cache.forget_versions()
+        return
+    name, _, scope = message.partition("\t")
+    cache = _caches.get(name)
+    if cache is not None:
+        cache.forget_versions(scope)
+
+async def start_cache() -> None:
+    """Subscribe to invalidations from other workers and nodes"""
+    backend = get_backend()
+    await backend.subscribe(INVALIDATION_CHANNEL, _on_invalidation)
+    logger.info(f"Cache backend: {type(backend).__name__}")
+
+def use_backend(backend: CacheBackend) -> None:
+    """Replace the configured backend, for scripts and checks"""
+    global _backend
+    _backend = backend
+    for cache in _caches.values():
+        cache.forget_versions()
+
+async def close_cache() -> None:
+    global _backend
+    if _backend is not None:
+        await _backend.close()
+        _backend = None
+
+class Cache:
+    """A named cache whose entries are grouped into independently invalidated scopes"""
+
+    def __init__(self, name: str, ttl: float):
+        if name in _caches:
+            raise ValueError(f"Cache {name!r} already exists")
+        self.name = name
+        self.ttl = ttl
+        # scope -> (version, trusted until)
+        self._versions: Dict[str, Tuple[int, float]] = {}
+        self._listeners: List[Callable[[str], None]] = []
+        _caches[name] = self
+
+    def _version_key(self, scope: str) -> str:
+        return f"{CACHE_PREFIX}:{self.name}:{scope}:version"
+
+    def _entry_key(self, scope: str, version: int, key: Hashable) -> str:
+        return f"{CACHE_PREFIX}:{self.name}:{scope}:v{version}:{key}"
+
+    def forget_versions(self, scope: Optional[str] = None) -> None:
+        if scope is None:
+            self._versions.clear()
+        else:
+            self._versions.pop(scope, None)
+
+    async def _version(self, scope: str) -> int:
+        now = time.monotonic()
+        known = self._versions.get(scope)
+        if known is not None and known[1] > now:
+            return known[0]
+        raw = await get_backend().get(self._version_key(scope))
+        version = int(raw) if raw is not None else 0
+        if len(self._versions) > MemoryBackend.SWEEP_SIZE:
+            self._versions = {s: v for s, v in self._versions.items() if v[1] > now}
+        self._versions[scope] = (version, now + CACHE_VERSION_TTL)
+        return version
+
+    async def version(self, scope: Any) -> Optional[int]:
+        """Current version of scope, which changes with every invalidation; None while the cache is off or unreachable"""
+        if not CACHE_ENABLED:
+            return None
+        try:
+            return await self._version(str(scope))
+        except Exception as e:
+            CACHE_ERRORS.labels(self.name).inc()
+            logger.warning(f"Cache {self.name} unavailable: {e!r}")
+            return None
+
+    async def _lookup(self, scope: str, key: Hashable) -> Tuple[int, Optional[bytes]]:
+        version = await self._version(scope)
+        raw = await get_backend().get(self._entry_key(scope, version, key))
+        CACHE_REQUESTS.labels(self.name, "hit" if raw is not None else "miss").inc()
+        return version, raw
+
+    async def _store(self, scope: str, version: int, key: Hashable, value: Any, ttl: Optional[float]) -> None:
+        try:
+            await get_backend().set(self._entry_key(scope, version, key), encode_value(value), ttl or self.ttl)
+        except Exception as e:
+            CACHE_ERRORS.labels(self.name).inc()
+            logger.warning(f"Could not store in cache {self.name}: {e!r}")
+
+    async def get(self, scope: Any, key: Hashable) -> Optional[Any]:
+        """Cached value of key in scope, or None"""
+        if not CACHE_ENABLED:
+            return None
+        try:
+            _, raw = await self._lookup(str(scope), key)
+        except Exception as e:
+            CACHE_ERRORS.labels(self.name).inc()
+            logger.warning(f"Cache {self.name} unavailable: {e!r}")
+            return None
+        return decode_value(raw) if raw is not None else None
+
+    async def get_or_load(self, scope: Any, key: Hashable, loader: Callable[[], Awaitable[Any]], ttl: Optional[float] = None) -> Any:
+        """Cached value of key in scope, or loader's result, which is stored unless it is None"""
+        if not CACHE_ENABLED:
+            return await loader()
+        scope = str(scope)
+        try:
+            version, raw = await self._lookup(scope, key)
+        except Exception as e:
+            CACHE_ERRORS.labels(self.name).inc()
+            logger.warning(f"Cache {self.name} unavailable, loading directly: {e!r}")
+            return await loader()
+
+        if raw is not None:
+            return decode_value(raw)
+        value = await loader()
+        if value is not None:
+            # Stored under the version read before loading, so a concurrent invalidation wins
+            await self._store(scope, version, key, value, ttl)
+        return value
+
+    async def refresh(self, scope: Any, key: Hashable, loader: Callable[[], Awaitable[Any]], ttl: Optional[float] = None) -> Any:
+        """Run loader and store its result over whatever key holds, cached or not"""
+        if not CACHE_ENABLED:
+            return await loader()
+        scope = str(scope)
+        try:
+            version = await self._version(scope)
+        except Exception as e:
+            CACHE_ERRORS.labels(self.name).inc()
+            logger.warning(f"Cache {self.name} unavailable, loading directly: {e!r}")
+            return await loader()
+        value = await loader()
+        if value is not None:
+            await self._store(scope, version, key, value, ttl)
+        return value
+
+    async def invalidate(self, scope: Any) -> None:
+        """Make every entry of scope unreachable, on all workers and nodes"""
+        scope = str(scope)
+        self.forget_versions(scope)
+        CACHE_INVALIDATIONS.labels(self.name).inc()
+        try:
+            await get_backend().incr(self._version_key(scope))
+            # A read while the increment was in flight may have remembered the old version
+            self.forget_versions(scope)
+            await get_backend().publish(INVALIDATION_CHANNEL, f"{self.name}\t{scope}")
+        except Exception as e:
+            # Other nodes keep serving the old entries until their TTL runs out
+            CACHE_ERRORS.labels(self.name).inc()
+            logger.error(f"Could not invalidate {self.name}/{scope}: {e!r}")
+        for listener in self._listeners:
+            listener(scope)
+
+    def on_invalidate(self, listener: Callable[[str], None]) -> None:
+        """Call listener(scope) after this worker invalidated a scope, e.g. to rebuild it in the background"""
+        self._listeners.append(listener)
+
+    def invalidated_by(self, model: Type, scope_of: Callable[[Any], Any]) -> None:
+        """Invalidate scope_of(instance) whenever an instance of model is added, changed or deleted"""
+        _invalidation_rules.setdefault(model, []).append((self, scope_of))
+
+_PENDING_KEY = "cache_invalidations"
+
+@event.listens_for(Session, "before_flush")
+def _collect_invalidations(session, flush_context, instances) -> None:
+    pending = session.info.setdefault(_PENDING_KEY, set())
+    for instance in itertools.chain(session.new, session.dirty, session.deleted):
+        for cache, scope_of in _invalidation_rules.get(type(instance), ()):
+            scope = scope_of(instance)
+            if scope is not None:
+                pending.add((cache.name, str(scope)))
+
+@event.listens_for(Session, "after_rollback")
+def _discard_invalidations(session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+class CacheInvalidatingSession(AsyncSession):
+    """AsyncSession that invalidates the cache scopes touched by a commit once it succeeded"""
+
+    async def commit(self) -> None:
+        await super().commit()
+        pending = self.sync_session.info.pop(_PENDING_KEY, None)
+        for name, scope in pending or ():
+            await _caches[name].invalidate(scope)
@@ -0,0 +1,172 @@
+"""
+Connection lifetimes: which routes hold pooled connections, and how long.
+
+A connection goes back to the pool when its session commits, rolls back
+or closes. get_db closes a request's session only after the response is
+sent, so a handler that returns a streaming response keeps its
+connection until the stream ends unless it closes the session first.
+With coach answers taking tens of seconds, a handful of them can starve
+every other route of connections.
+
+Every checkout from the application's engines is recorded with the
+route it was made for ("background" outside requests):
+
+- db_connection_hold_seconds has the hold time per engine and route, and
+  /api/diagnostics/connections has the same totals per route plus every
+  connection checked out right now, longest held first;
+- a connection checked out before its request started streaming and
+  returned only after that is counted in
+  db_connections_held_streaming_total and logged;
+- a connection held longer than DB_CONNECTION_HOLD_WARN_MS is logged
+  once and counted in db_connections_held_long_total. That happens at
+  check-in or, for a connection that is never returned (a leak), in the
+  periodic check while it is still out.
+
+Streaming is detected by RequestTimingMiddleware, which marks the scope
+when the first partial body is sent.
+"""
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from utils.metrics import DB_CONNECTION_HOLD, DB_CONNECTIONS_HELD_LONG, DB_CONNECTIONS_HELD_STREAMING
+from utils.request_timing import current_request_scope, route_template
+
+logger = logging.getLogger(__name__)
+
+# Connections held longer than this are logged
+DB_CONNECTION_HOLD_WARN_MS = float(os.getenv("DB_CONNECTION_HOLD_WARN_MS", "5000"))
+
+# Seconds between checks for connections still out past the threshold
+CONNECTION_CHECK_INTERVAL = 1.0
+
+class _Checkout:
+    __slots__ = ("engine", "route", "scope", "started", "warned")
+
+    def __init__(self, engine: str, route: str, scope: Optional[Dict[str, Any]]):
+        self.engine = engine
+        self.route = route
+        self.scope = scope
+        self.started = time.perf_counter()
+        self.warned = False
+
+    def streaming_since(self) -> Optional[float]:
+        """When the request's streaming response started, if it started after this checkout"""
+        since = self.scope.get("streaming_since") if self.scope is not None else None
+        return since if since is not None and since > self.started else None
+
+class ConnectionTracker:
+    """Connections checked out on this worker, and hold times per route"""
+
+    def __init__(self, warn_ms: float = DB_CONNECTION_HOLD_WARN_MS):
+        self.threshold = warn_ms / 1000
+        # id of the pool's connection record -> its current checkout
+        self._held: Dict[int, _Checkout] = {}
+        # route -> checkouts, seconds held in total and at most, and how many were held too long or into a stream
+        self.routes: Dict[str, Dict[str, float]] = {}
+
+    def checkout(self, engine_name: str, connection_record) -> None:
+        scope = current_request_scope.get()
+        route = "background" if scope is None else route_template(scope) or "unmatched"
+        self._held[id(connection_record)] = _Checkout(engine_name, route, scope)
+
+    def checkin(self, connection_record) -> None:
+        checkout = self._held.pop(id(connection_record), None)
+        if checkout is None:
+            return
+        held = time.perf_counter() - checkout.started
+        DB_CONNECTION_HOLD.labels(checkout.engine, checkout.route).observe(held)
+        stats = self._route_stats(checkout.route)
+        stats["checkouts"] += 1
+        stats["total_s"] += held
+        stats["max_s"] = max(stats["max_s"], held)
+        if held >= self.threshold and not checkout.warned:
+            self._warn(checkout, held, "was held")
+        streaming_since = checkout.streaming_since()
+        if streaming_since is not None:
+            stats["held_streaming"] += 1
+            DB_CONNECTIONS_HELD_STREAMING.labels(checkout.route).inc()
+            logger.warning(
+                f"{checkout.route} held a database connection for {time.perf_counter() - streaming_since:.1f}s "
+                f"of its streaming response; close the session before streaming"
+            )
+
+    def forget(self, connection_record) -> None:
+        """Drop a connection that left the pool without being checked in"""
+        self._held.pop(id(connection_record), None)
+
+    def _route_stats(self, route: str) -> Dict[str, float]:
+        return self.routes.setdefault(route, {"checkouts": 0, "total_s": 0.0, "max_s": 0.0, "held_long": 0, "held_streaming": 0})
+
+    def _warn(self, checkout: _Checkout, held: float, state: str) -> None:
+        checkout.warned = True
+        DB_CONNECTIONS_HELD_LONG.labels(checkout.route).inc()
+        self._route_stats(checkout.route)["held_long"] += 1
+        logger.warning(f"Database connection ({checkout.engine}) checked out by {checkout.route} {state} for {held:.1f}s")
+
+    def check_held(self) -> None:
+        """Warn about connections that are still out past the threshold"""
+        now = time.perf_counter()
+        for checkout in list(self._held.values()):
+            if not checkout.warned and now - checkout.started >= self.threshold:
+                self._warn(checkout, now - checkout.started, "is still held")
+
+    async def run(self) -> None:
+        """Background loop looking for connections that are not coming back"""
+        while True:
+            await asyncio.sleep(CONNECTION_CHECK_INTERVAL)
+            self.check_held()
+
+    def held(self) -> List[Dict[str, Any]]:
+        now = time.perf_counter()
+        held = [
+            {
+                "engine": checkout.engine,
+                "route": checkout.route,
+                "held_ms": round((now - checkout.started) * 1000, 1),
+                "streaming": checkout.streaming_since() is not None,
+            }
+            for checkout in list(self._held.values())
+        ]
+        return sorted(held, key=lambda c: c["held_ms"], reverse=True)
+
+    def status(self) -> Dict[str, Any]:
+        routes = {
+            route: {
+                "checkouts": stats["checkouts"],
+                "avg_ms": round(stats["total_s"] / stats["checkouts"] * 1000, 1) if stats["checkouts"] else None,
+                "max_ms": round(stats["max_s"] * 1000, 1),
+                "held_long": stats["held_long"],
+                "held_streaming": stats["held_streaming"],
+            }
+            for route, stats in sorted(self.routes.items(), key=lambda item: -item[1]["total_s"])
+        }
+        return {
+            "pid": os.getpid(),
+            "warn_threshold_ms": self.threshold * 1000,
+            "held": self.held(),
+            "routes": routes,
+        }
+
+# Per worker process, like the other diagnostics (see serve.py)
+connection_tracker = ConnectionTracker()
+
+def track_connection_lifetimes(name: str, engine: AsyncEngine) -> None:
+    """Record how long each checkout from an engine's pool is held, and by which route"""
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_tracker.checkout(name, connection_record)
+
+    def on_checkin(dbapi_connection, connection_record):
+        connection_tracker.checkin(connection_record)
+
+    def on_detach(dbapi_connection, connection_record):
+        connection_tracker.forget(connection_record)
+
+    event.listen(engine.sync_engine, "checkout", on_checkout)
+    event.listen(engine.sync_engine, "checkin", on_checkin)
+    event.listen(engine.sync_engine, "detach", on_detach)
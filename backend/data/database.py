@@ -1,32 +1,45 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy import MetaData, create_engine
+from sqlalchemy import MetaData
+from sqlalchemy.exc import DBAPIError
+from starlette.requests import Request
 import os
 from dotenv import load_dotenv
 
+from data.engine_profiles import get_engine_profile, async_engine_kwargs
+from data.replicas import replica_pool, wrote_recently
+from data.statement_cache import track_statement_cache
+from data.query_stats import track_request_queries
+from data.pool_metrics import register_pool_metrics
+from data.connection_lifetimes import track_connection_lifetimes
+from data.slow_queries import slow_query_log
+from data.cache import CacheInvalidatingSession
+
 load_dotenv()
 
 # Convert PostgreSQL URL to async
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://finance_user:securepassword123@db:5432/finance_db")
 ASYNC_DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://")
 
+# Pool, caching and timeout settings come from the APP_ENV profile
+engine_profile = get_engine_profile()
+
 # Create async engine
 engine = create_async_engine(
     ASYNC_DATABASE_URL,
-    echo=True,
-    future=True
+    future=True,
+    **async_engine_kwargs(engine_profile)
 )
+track_statement_cache(engine.sync_engine)
+track_request_queries(engine.sync_engine)
+register_pool_metrics("primary", engine)
+track_connection_lifetimes("primary", engine)
+slow_query_log.track(engine)
 
-# Create sync engine for migrations
-sync_engine = create_engine(
-    DATABASE_URL,
-    echo=True
-)
-
-# Create async session factory
+# Create async session factory; commits invalidate the cache scopes they touched
 AsyncSessionLocal = sessionmaker(
     engine,
-    class_=AsyncSession,
+    class_=CacheInvalidatingSession,
     expire_on_commit=False
 )
 
@@ -39,4 +52,23 @@ async def get_db():
         try:
             yield session
         finally:
-            await session.close() 
\ No newline at end of file
+            await session.close()
+
+# Dependency for read-only handlers: a healthy replica when one is available
+async def get_read_db(request: Request):
+    replica = None
+    if not wrote_recently(request.headers.get("authorization")):
+        replica = replica_pool.pick()
+    if replica is None:
+        async with AsyncSessionLocal() as session:
+            yield session
+        return
+
+    async with replica.session_factory() as session:
+        try:
+            yield session
+        except DBAPIError as e:
+            # Lost connection to the replica: stop routing to it until the next health check
+            if e.connection_invalidated:
+                replica.mark_failed(e)
+            raise
@@ -0,0 +1,87 @@
+import os
+from typing import Dict, Any, Optional
+
+from data.pool_metrics import TimedAsyncQueuePool
+
+# Named settings for the SQLAlchemy engines; select one with APP_ENV
+APP_ENV = os.getenv("APP_ENV") or "development"
+
+ENGINE_PROFILES: Dict[str, Dict[str, Any]] = {
+    "development": {
+        "pool_size": 5,
+        "max_overflow": 5,
+        "pool_timeout": 30,
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+        "pool_use_lifo": False,
+        "echo": True,
+        "statement_cache_size": 100,
+        "query_cache_size": 500,
+        "statement_timeout_ms": 0,
+    },
+    "production": {
+        "pool_size": 10,
+        "max_overflow": 10,
+        "pool_timeout": 10,
+        # Recycle before typical proxy/firewall idle cutoffs
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+        # Reuse hot connections so idle ones can age out and get recycled
+        "pool_use_lifo": True,
+        "echo": False,
+        "statement_cache_size": 512,
+        "query_cache_size": 1200,
+        "statement_timeout_ms": 15000,
+    },
+}
+
+# Environment overrides, applied on top of the selected profile
+_ENV_OVERRIDES = {
+    "pool_size": ("DB_POOL_SIZE", int),
+    "max_overflow": ("DB_MAX_OVERFLOW", int),
+    "pool_timeout": ("DB_POOL_TIMEOUT", float),
+    "pool_recycle": ("DB_POOL_RECYCLE", int),
+    "pool_pre_ping": ("DB_POOL_PRE_PING", lambda value: value.lower() == "true"),
+    "echo": ("DB_ECHO", lambda value: value.lower() == "true"),
+    "statement_cache_size": ("DB_STATEMENT_CACHE_SIZE", int),
+    "query_cache_size": ("DB_QUERY_CACHE_SIZE", int),
+    "statement_timeout_ms": ("DB_STATEMENT_TIMEOUT_MS", int),
+}
+
+def get_engine_profile(name: Optional[str] = None) -> Dict[str, Any]:
+    """Settings of a named profile (APP_ENV by default) with DB_* overrides applied"""
+    name = name or APP_ENV
+    if name not in ENGINE_PROFILES:
+        raise ValueError(f"Unknown engine profile '{name}', expected one of {list(ENGINE_PROFILES)}")
+
+    profile = dict(ENGINE_PROFILES[name])
+    for key, (env_name, cast) in _ENV_OVERRIDES.items():
+        value = os.getenv(env_name)
+        if value:
+            profile[key] = cast(value)
+    return profile
+
+def async_engine_kwargs(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """Keyword arguments for create_async_engine (asyncpg driver)"""
+    server_settings = {"application_name": "financial-coach-api"}
+    if profile["statement_timeout_ms"]:
+        # Enforced by Postgres itself, so runaway queries are cut off even if the client hangs
+        server_settings["statement_timeout"] = str(profile["statement_timeout_ms"])
+
+    return {
+        "poolclass": TimedAsyncQueuePool,
+        "echo": profile["echo"],
+        "pool_size": profile["pool_size"],
+        "max_overflow": profile["max_overflow"],
+        "pool_timeout": profile["pool_timeout"],
+        "pool_recycle": profile["pool_recycle"],
+        "pool_pre_ping": profile["pool_pre_ping"],
+        "pool_use_lifo": profile["pool_use_lifo"],
+        # SQLAlchemy's cache of compiled SQL, keyed by statement shape
+        "query_cache_size": profile["query_cache_size"],
+        "connect_args": {
+            # Prepared statements kept per asyncpg connection (0 disables, e.g. behind pgbouncer)
+            "prepared_statement_cache_size": profile["statement_cache_size"],
+            "server_settings": server_settings,
+        },
+    }
@@ -0,0 +1,42 @@
+import time
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from utils.metrics import DB_POOL_WAIT, DB_POOL_SIZE, DB_POOL_CHECKED_OUT, DB_POOL_OVERFLOW, register_collector
+from utils.load_shedding import load_monitor
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited (including connecting)"""
+
+    # Engine label of the wait metric, set by register_pool_metrics
+    engine_name = "unknown"
+
+    def recreate(self):
+        # engine.dispose() replaces the pool; the new one keeps reporting under the same name
+        pool = super().recreate()
+        pool.engine_name = self.engine_name
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - started
+            DB_POOL_WAIT.labels(self.engine_name).observe(waited)
+            # Feeds the overload check behind load shedding
+            load_monitor.record_pool_wait(waited)
+
+def register_pool_metrics(name: str, engine: AsyncEngine) -> None:
+    """Export pool occupancy gauges for an engine on every scrape, and label its checkout waits"""
+    if isinstance(engine.sync_engine.pool, TimedAsyncQueuePool):
+        engine.sync_engine.pool.engine_name = name
+
+    def collect():
+        pool = engine.sync_engine.pool
+        if isinstance(pool, AsyncAdaptedQueuePool):
+            DB_POOL_SIZE.labels(name).set(pool.size())
+            DB_POOL_CHECKED_OUT.labels(name).set(pool.checkedout())
+            DB_POOL_OVERFLOW.labels(name).set(max(pool.overflow(), 0))
+
+    register_collector(collect)
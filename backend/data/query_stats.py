@@ -0,0 +1,59 @@
+import time
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from utils.metrics import DB_QUERIES, DB_QUERY_DURATION
+from data.slow_queries import slow_query_log, SLOW_QUERY_THRESHOLD_MS
+
+SLOW_QUERY_THRESHOLD = SLOW_QUERY_THRESHOLD_MS / 1000
+
+# Longest SQL text kept for the slowest statement of a request
+MAX_STATEMENT_CHARS = 300
+
+class RequestQueryStats:
+    """Statements issued while handling one request"""
+
+    __slots__ = ("count", "db_time", "slowest_time", "slowest_statement")
+
+    def __init__(self):
+        self.count = 0
+        self.db_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_statement: Optional[str] = None
+
+    def record(self, statement: str, elapsed: float) -> None:
+        self.count += 1
+        self.db_time += elapsed
+        if elapsed > self.slowest_time:
+            self.slowest_time = elapsed
+            self.slowest_statement = statement
+
+# Set by the request timing middleware; statements outside a request are not counted
+current_query_stats: ContextVar[Optional[RequestQueryStats]] = ContextVar("current_query_stats", default=None)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    DB_QUERIES.inc()
+    DB_QUERY_DURATION.observe(elapsed)
+    if elapsed >= SLOW_QUERY_THRESHOLD:
+        slow_query_log.record(conn.engine, statement, parameters, elapsed)
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.record(statement[:MAX_STATEMENT_CHARS], elapsed)
+
+def _handle_error(exception_context):
+    # Keep the start-time stack balanced when a statement fails
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_started"):
+        conn.info["query_started"].pop()
+
+def track_request_queries(engine: Engine) -> None:
+    """Attach per-request statement counting and timing to a (sync) engine"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
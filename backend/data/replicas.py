@@ -0,0 +1,173 @@
+import os
+import time
+import asyncio
+import hashlib
+import logging
+import itertools
+from typing import Dict, List, Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from data.engine_profiles import get_engine_profile, async_engine_kwargs
+from data.statement_cache import track_statement_cache
+from data.query_stats import track_request_queries
+from data.pool_metrics import register_pool_metrics
+from data.connection_lifetimes import track_connection_lifetimes
+from data.slow_queries import slow_query_log
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated replica URLs; without them every read goes to the primary
+REPLICA_DATABASE_URLS = [url.strip() for url in os.getenv("REPLICA_DATABASE_URLS", "").split(",") if url.strip()]
+# Replicas lagging further behind than this are skipped
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "10"))
+REPLICA_CHECK_TIMEOUT = float(os.getenv("REPLICA_CHECK_TIMEOUT", "2"))
+# After a write the same client reads from the primary for this long
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "10"))
+
+# Zero when the replica has replayed everything it received, otherwise seconds since the last replayed commit
+LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+class Replica:
+    def __init__(self, url: str):
+        self.url = url
+        self.engine: AsyncEngine = create_async_engine(
+            url.replace("postgresql://", "postgresql+asyncpg://"),
+            **async_engine_kwargs(get_engine_profile())
+        )
+        track_statement_cache(self.engine.sync_engine)
+        track_request_queries(self.engine.sync_engine)
+        register_pool_metrics(self.name, self.engine)
+        track_connection_lifetimes(self.name, self.engine)
+        slow_query_log.track(self.engine)
+        self.session_factory = sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+        # Unknown until the first check succeeds
+        self.healthy = False
+        self.lag: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def name(self) -> str:
+        return self.engine.url.render_as_string(hide_password=True)
+
+    @property
+    def usable(self) -> bool:
+        return self.healthy and self.lag is not None and self.lag <= REPLICA_MAX_LAG_SECONDS
+
+    async def _measure_lag(self) -> float:
+        async with self.engine.connect() as conn:
+            return float(await conn.scalar(LAG_QUERY))
+
+    async def check(self) -> None:
+        try:
+            self.lag = await asyncio.wait_for(self._measure_lag(), timeout=REPLICA_CHECK_TIMEOUT)
+            self.healthy = True
+            self.last_error = None
+        except Exception as e:
+            if self.healthy:
+                logger.warning(f"Replica {self.name} is unhealthy: {e!r}")
+            self.mark_failed(e)
+
+    def mark_failed(self, error: Exception) -> None:
+        self.healthy = False
+        self.last_error = repr(error)
+
+class ReplicaPool:
+    """Round-robin over replicas that are healthy and within the lag limit"""
+
+    def __init__(self, urls: List[str]):
+        self.replicas = [Replica(url) for url in urls]
+        self._cycle = itertools.count()
+
+    def pick(self) -> Optional[Replica]:
+        usable = [replica for replica in self.replicas if replica.usable]
+        if not usable:
+            return None
+        return usable[next(self._cycle) % len(usable)]
+
+    async def check_all(self) -> None:
+        await asyncio.gather(*(replica.check() for replica in self.replicas))
+
+    async def run_health_checks(self) -> None:
+        """Background loop refreshing replica health and lag"""
+        while True:
+            await self.check_all()
+            await asyncio.sleep(REPLICA_CHECK_INTERVAL)
+
+    def status(self) -> List[Dict]:
+        return [
+            {
+                "replica": replica.name,
+                "healthy": replica.healthy,
+                "lag_seconds": replica.lag,
+                "usable": replica.usable,
+                "last_error": replica.last_error,
+            }
+            for replica in self.replicas
+        ]
+
+    async def dispose(self) -> None:
+        await asyncio.gather(*(replica.engine.dispose() for replica in self.replicas))
+
+replica_pool = ReplicaPool(REPLICA_DATABASE_URLS)
+
+# Recent writers, keyed by a digest of their Authorization header.
+# Kept per worker process: with several workers a client may still hit a
+# replica right after writing through another worker, bounded by REPLICA_MAX_LAG_SECONDS.
+# Cached reads (analytics, categories) are filled from the primary instead, since a stale
+# result stored in data.cache would outlive the lag bound until its TTL.
+_recent_writes: Dict[str, float] = {}
+
+def _client_key(authorization: Optional[str]) -> Optional[str]:
+    if not authorization:
+        return None
+    return hashlib.sha256(authorization.encode()).hexdigest()[:32]
+
+def mark_write(authorization: Optional[str]) -> None:
+    key = _client_key(authorization)
+    if key is None:
+        return
+    now = time.monotonic()
+    _recent_writes[key] = now + READ_YOUR_WRITES_SECONDS
+    # Drop expired entries once the map grows
+    if len(_recent_writes) > 10000:
+        for stale in [k for k, until in _recent_writes.items() if until < now]:
+            del _recent_writes[stale]
+
+def wrote_recently(authorization: Optional[str]) -> bool:
+    key = _client_key(authorization)
+    return key is not None and _recent_writes.get(key, 0) > time.monotonic()
+
+class ReadYourWritesMiddleware:
+    """Remember clients that just sent a write so their next reads stay on the primary"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS or not replica_pool.replicas:
+            await self.app(scope, receive, send)
+            return
+
+        authorization = None
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                authorization = value.decode("latin-1")
+                break
+        # Mark before the handler runs so parallel reads are covered too,
+        # and again afterwards so the window starts once the write is done
+        mark_write(authorization)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            mark_write(authorization)
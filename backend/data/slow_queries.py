@@ -0,0 +1,164 @@
+import os
+import re
+import time
+import random
+import asyncio
+import hashlib
+import logging
+import contextvars
+import json
+from typing import Dict, Any, List, Optional, Set
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+# Statements at least this slow are recorded
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "300"))
+# Share of slow statements that get recorded (1.0 = all)
+SLOW_QUERY_SAMPLE_RATE = float(os.getenv("SLOW_QUERY_SAMPLE_RATE", "1.0"))
+# Distinct fingerprints kept; the ones with the least total time are evicted first
+SLOW_QUERY_MAX_ENTRIES = int(os.getenv("SLOW_QUERY_MAX_ENTRIES", "200"))
+# Capture EXPLAIN (ANALYZE, BUFFERS) for slow SELECTs, at most once per fingerprint per interval
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "true").lower() == "true"
+SLOW_QUERY_EXPLAIN_INTERVAL = float(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL", "600"))
+SLOW_QUERY_EXPLAIN_TIMEOUT_MS = int(os.getenv("SLOW_QUERY_EXPLAIN_TIMEOUT_MS", "10000"))
+
+_WHITESPACE = re.compile(r"\s+")
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+# $1 (asyncpg), %(name)s / %s (psycopg2), :name (text()); "::type" casts are kept
+_POSITIONAL_PARAM = re.compile(r"\$\d+|%\(\w+\)s|%s|(?<!:):(?!:)\w+\b")
+_VALUE_LIST = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)")
+
+def normalize_sql(statement: str) -> str:
+    """Statement text with literals and parameters replaced, so equal shapes compare equal"""
+    sql = _STRING_LITERAL.sub("?", statement)
+    sql = _POSITIONAL_PARAM.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    sql = _VALUE_LIST.sub("(?, ...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip().lower()
+
+def fingerprint_sql(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode()).hexdigest()[:16]
+
+def _is_explainable(statement: str) -> bool:
+    # EXPLAIN ANALYZE executes the statement, so only plain reads qualify
+    head = statement.lstrip().lower()
+    if not head.startswith("select"):
+        return False
+    return not re.search(r"\b(insert|update|delete|for share)\b", head)
+
+class SlowQueryLog:
+    """Bounded store of the slowest statement shapes, keyed by fingerprint"""
+
+    def __init__(self):
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._explain_engines: Dict[Engine, AsyncEngine] = {}
+        self._explaining: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def track(self, engine: AsyncEngine) -> None:
+        """Allow EXPLAIN capture for statements run on this engine"""
+        self._explain_engines[engine.sync_engine] = engine
+
+    def record(self, engine: Engine, statement: str, parameters, elapsed: float) -> None:
+        if SLOW_QUERY_SAMPLE_RATE < 1.0 and random.random() >= SLOW_QUERY_SAMPLE_RATE:
+            return
+        if statement.lstrip()[:7].lower() == "explain":
+            return
+
+        normalized = normalize_sql(statement)
+        fingerprint = fingerprint_sql(normalized)
+        elapsed_ms = elapsed * 1000
+        entry = self.entries.get(fingerprint)
+        if entry is None:
+            self._make_room()
+            entry = self.entries[fingerprint] = {
+                "fingerprint": fingerprint,
+                "query": normalized,
+                "count": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "first_seen": time.time(),
+                "last_seen": None,
+                "plan": None,
+                "plan_captured_at": None,
+            }
+        entry["count"] += 1
+        entry["total_ms"] += elapsed_ms
+        entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+        entry["last_seen"] = time.time()
+        logger.warning(f"Slow query {fingerprint} took {elapsed_ms:.1f}ms: {normalized[:200]}")
+
+        if SLOW_QUERY_EXPLAIN and _is_explainable(statement):
+            self._maybe_explain(engine, entry, statement, parameters)
+
+    def _make_room(self) -> None:
+        if len(self.entries) < SLOW_QUERY_MAX_ENTRIES:
+            return
+        cheapest = min(self.entries.values(), key=lambda entry: entry["total_ms"])
+        del self.entries[cheapest["fingerprint"]]
+
+    def _maybe_explain(self, engine: Engine, entry: Dict[str, Any], statement: str, parameters) -> None:
+        async_engine = self._explain_engines.get(engine)
+        fingerprint = entry["fingerprint"]
+        if async_engine is None or fingerprint in self._explaining:
+            return
+        captured_at = entry["plan_captured_at"]
+        if captured_at is not None and time.time() - captured_at < SLOW_QUERY_EXPLAIN_INTERVAL:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        self._explaining.add(fingerprint)
+        # Fresh context: the EXPLAIN must not count towards the request that triggered it
+        task = loop.create_task(
+            self._explain(async_engine, fingerprint, statement, parameters),
+            context=contextvars.Context()
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _explain(self, engine: AsyncEngine, fingerprint: str, statement: str, parameters) -> None:
+        try:
+            async with engine.connect() as conn:
+                # Rolled back on exit; the timeout keeps a pathological plan from running forever
+                await conn.exec_driver_sql(f"SET LOCAL statement_timeout = {SLOW_QUERY_EXPLAIN_TIMEOUT_MS}")
+                result = await conn.exec_driver_sql(
+                    f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}",
+                    parameters
+                )
+                plan = result.scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            entry = self.entries.get(fingerprint)
+            if entry is not None:
+                entry["plan"] = plan
+                entry["plan_captured_at"] = time.time()
+        except Exception as e:
+            logger.warning(f"EXPLAIN for slow query {fingerprint} failed: {e!r}")
+        finally:
+            self._explaining.discard(fingerprint)
+
+    def top(self, limit: int = 20, include_plans: bool = True) -> List[Dict[str, Any]]:
+        """Worst offenders by total time spent"""
+        ranked = sorted(self.entries.values(), key=lambda entry: entry["total_ms"], reverse=True)[:limit]
+        result = []
+        for entry in ranked:
+            item = dict(entry)
+            item["avg_ms"] = round(entry["total_ms"] / entry["count"], 2)
+            item["total_ms"] = round(entry["total_ms"], 2)
+            item["max_ms"] = round(entry["max_ms"], 2)
+            if not include_plans:
+                item.pop("plan")
+            result.append(item)
+        return result
+
+    def reset(self) -> None:
+        self.entries.clear()
+
+# Per worker process; /diagnostics shows the worker that answered (see serve.py)
+slow_query_log = SlowQueryLog()
@@ -0,0 +1,101 @@
+"""
+Per-route statement timeouts.
+
+The engine profile sets one statement_timeout for every connection
+(statement_timeout_ms, 15s in production). That is too generous for the
+heavy read endpoints: one analytics query over a huge account holds its
+pooled connection for the whole time, and every request behind it waits
+for a connection. Routes listed in ROUTE_STATEMENT_TIMEOUTS get a tighter
+limit. Their transactions start with SET LOCAL statement_timeout, so
+Postgres cancels the query itself and the connection goes back to the
+pool in a usable state. The setting ends with the transaction. Other
+routes, and work outside requests, keep the engine's default.
+
+A cancelled statement becomes a 503 with Retry-After instead of a 500,
+counted in statement_timeouts_total by route.
+
+Override the table with STATEMENT_TIMEOUTS="/api/analytics=3000,/api/summary=2000";
+the longest matching path prefix wins.
+"""
+import os
+import logging
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from fastapi.responses import JSONResponse
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+from starlette.requests import Request
+
+from utils.metrics import STATEMENT_TIMEOUTS
+
+logger = logging.getLogger(__name__)
+
+# Postgres SQLSTATE of a statement cancelled by statement_timeout
+QUERY_CANCELED = "57014"
+
+def _parse_timeouts(value: str) -> Dict[str, int]:
+    timeouts = {}
+    for item in value.split(","):
+        prefix, _, milliseconds = item.strip().partition("=")
+        if prefix and milliseconds:
+            timeouts[prefix.strip()] = int(milliseconds)
+    return timeouts
+
+# Path prefix -> statement timeout in milliseconds
+ROUTE_STATEMENT_TIMEOUTS: Dict[str, int] = _parse_timeouts(
+    os.getenv("STATEMENT_TIMEOUTS", "/api/analytics=5000,/api/summary=5000,/api/coach=3000")
+)
+# Seconds a client is asked to wait after its query was cut off
+STATEMENT_TIMEOUT_RETRY_AFTER = int(os.getenv("STATEMENT_TIMEOUT_RETRY_AFTER", "5"))
+
+# Set per request by StatementTimeoutMiddleware; None keeps the engine default
+current_statement_timeout: ContextVar[Optional[int]] = ContextVar("current_statement_timeout", default=None)
+
+def statement_timeout_for(path: str) -> Optional[int]:
+    """Timeout in milliseconds of the longest prefix matching path, if any"""
+    matches = [prefix for prefix in ROUTE_STATEMENT_TIMEOUTS if path.startswith(prefix)]
+    if not matches:
+        return None
+    return ROUTE_STATEMENT_TIMEOUTS[max(matches, key=len)]
+
+@event.listens_for(Session, "after_begin")
+def _apply_statement_timeout(session, transaction, connection) -> None:
+    timeout = current_statement_timeout.get()
+    if timeout is not None:
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout)}")
+
+class StatementTimeoutMiddleware:
+    """Give the database transactions of each request the timeout of its route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        timeout = statement_timeout_for(scope["path"]) if scope["type"] == "http" else None
+        if timeout is None:
+            await self.app(scope, receive, send)
+            return
+
+        token = current_statement_timeout.set(timeout)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_statement_timeout.reset(token)
+
+def is_statement_timeout(error: DBAPIError) -> bool:
+    return getattr(error.orig, "sqlstate", None) == QUERY_CANCELED
+
+async def statement_timeout_handler(request: Request, exc: DBAPIError):
+    """503 for statements cut off by their timeout; every other database error stays a 500"""
+    if not is_statement_timeout(exc):
+        raise exc
+    route = getattr(request.scope.get("route"), "path", request.url.path)
+    STATEMENT_TIMEOUTS.labels(route).inc()
+    logger.warning(f"Statement timeout on {request.method} {route}")
+    return JSONResponse(
+        {"detail": "The request took too long to compute. Please try again later or narrow the date range."},
+        status_code=503,
+        headers={"Retry-After": str(STATEMENT_TIMEOUT_RETRY_AFTER)},
+    )
@@ -1,13 +1,18 @@
 #!/bin/bash
+set -e
 
-# Wait for the database to be ready
+# Wait for the database to be ready (exponential backoff, gives up after DB_WAIT_TIMEOUT)
 echo "Waiting for database..."
-sleep 10
+python -m utils.wait_for_postgres
 
 # Run database migrations
 echo "Running Alembic migrations..."
 alembic upgrade head
 
-# Start the application
+# Start the application; exec so the server gets SIGTERM directly and shuts down gracefully
 echo "Starting FastAPI server..."
-uvicorn main:app --host 0.0.0.0 --port 8000 --reload 
\ No newline at end of file
+if [ "${UVICORN_RELOAD:-false}" = "true" ]; then
+    exec uvicorn main:app --host 0.0.0.0 --port 8000 --reload
+fi
+# WEB_CONCURRENCY workers (default: CPU cores), recycled after MAX_REQUESTS
+exec python serve.py --host 0.0.0.0 --port 8000
@@ -1,4 +1,11 @@
 from fastapi import FastAPI, Depends
+from fastapi.responses import PlainTextResponse, JSONResponse
+from contextlib import asynccontextmanager
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+import asyncio
+import logging
+import time
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.routing import APIRouter
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -6,22 +13,90 @@ import os
 from dotenv import load_dotenv
 from fastapi.staticfiles import StaticFiles
 
-from data.database import get_db, engine
-from models import Base
-from routes import transactions, summary, categories, users, budgets, goals, analytics, auth, coach, user_stats, gamification, user_profile, onboarding
+from data.database import get_db, engine, engine_profile
+from data.boot import check_schema_version, warm_up, preload_lazy_modules
+from data.cache import start_cache, close_cache
+from data.replicas import replica_pool, ReadYourWritesMiddleware
+from data.statement_timeouts import StatementTimeoutMiddleware, statement_timeout_handler
+from data.connection_lifetimes import connection_tracker
+from utils.request_timing import RequestTimingMiddleware
+from utils.profiler import ProfilingMiddleware
+from utils.drain import is_draining
+from utils.load_shedding import LoadSheddingMiddleware, load_monitor
+from utils.loop_watchdog import loop_watchdog, LOOP_WATCHDOG
+from utils.metrics import render_metrics
+from utils.wait_for_postgres import wait_for_database
+from routes import transactions, summary, categories, users, budgets, goals, analytics, auth, coach, user_stats, gamification, user_profile, onboarding, diagnostics
 from routes.accounts import router as accounts_router
+from services.coach_insights import run_insights_scheduler, COACH_INSIGHTS_SCHEDULER
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Readiness probe gives up on the database after this long
+READINESS_DB_TIMEOUT = float(os.getenv("READINESS_DB_TIMEOUT", "1"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Boot sequence: wait for the database, verify the schema, warm up, start background jobs"""
+    started = time.perf_counter()
+    app.state.ready = False
+    await wait_for_database(engine)
+    # The schema is managed by Alembic (entrypoint.sh runs the migrations)
+    await check_schema_version(engine)
+    await warm_up(engine, engine_profile["pool_size"])
+    # Hear about cache invalidations from the other workers and nodes
+    await start_cache()
+    # Event-loop lag sampling for load shedding
+    app.state.load_monitor_task = asyncio.create_task(load_monitor.run())
+    # Warnings about connections held too long or never returned
+    app.state.connection_tracker_task = asyncio.create_task(connection_tracker.run())
+    # Stack traces of callbacks that block the loop
+    if LOOP_WATCHDOG:
+        loop_watchdog.start()
+
+    # Replica health and lag, used to route read-only endpoints
+    if replica_pool.replicas:
+        await replica_pool.check_all()
+        app.state.replica_task = asyncio.create_task(replica_pool.run_health_checks())
+
+    # Nightly pre-generation of coach insight cards
+    if COACH_INSIGHTS_SCHEDULER:
+        app.state.insights_task = asyncio.create_task(run_insights_scheduler())
+
+    app.state.ready = True
+    logger.info(f"Startup completed in {(time.perf_counter() - started) * 1000:.0f}ms")
+    # Auth and coach libraries load while the first requests are already served
+    app.state.preload_task = asyncio.create_task(preload_lazy_modules())
+    yield
+
+    # Stop taking traffic before the background jobs go away
+    app.state.ready = False
+    for name in ("preload_task", "insights_task", "replica_task", "load_monitor_task", "connection_tracker_task"):
+        task = getattr(app.state, name, None)
+        if task:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+    await loop_watchdog.stop()
+    await close_cache()
+    await replica_pool.dispose()
+    await engine.dispose()
+
 app = FastAPI(
     title="Financial Coach AI",
     description="A comprehensive personal finance tracker API with user management, budgeting, goal tracking, authentication, and AI coaching",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Create API router with /api prefix
 api_router = APIRouter()
 
+# Fast 503s for analytics and coach while this worker is overloaded.
+# Added first, so it sits inside CORS and the timing middleware and its 503s are counted
+app.add_middleware(LoadSheddingMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -31,6 +106,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Keep clients that just wrote on the primary for their following reads
+app.add_middleware(ReadYourWritesMiddleware)
+
+# Tighter statement timeouts for the heavy read routes
+app.add_middleware(StatementTimeoutMiddleware)
+# Statements cut off by those timeouts answer 503 instead of 500
+app.add_exception_handler(DBAPIError, statement_timeout_handler)
+
+# Per-request SQL statement count and database time (Server-Timing header)
+app.add_middleware(RequestTimingMiddleware)
+
+# Sampling profiler for requests an admin flags with X-Profile: 1
+app.add_middleware(ProfilingMiddleware)
+
 # Include routers in api_router
 api_router.include_router(auth.router)
 api_router.include_router(users.router)
@@ -46,6 +135,7 @@ api_router.include_router(gamification.router)
 api_router.include_router(user_profile.router)
 api_router.include_router(onboarding.router)
 api_router.include_router(accounts_router)
+api_router.include_router(diagnostics.router)
 
 # Include api_router with /api prefix
 app.include_router(api_router, prefix="/api")
@@ -53,15 +143,6 @@ app.include_router(api_router, prefix="/api")
 os.makedirs("backend/uploads/avatars", exist_ok=True)
 app.mount("/uploads", StaticFiles(directory="backend/uploads"), name="uploads")
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize database and default categories on startup"""
-    # Create tables
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    
-    print("Database tables created successfully")
-
 @app.get("/")
 async def root():
     """Root endpoint with API information"""
@@ -82,15 +163,36 @@ async def root():
             "user-stats": "/api/user-stats/",
             "gamification": "/api/gamification/",
             "user-profile": "/api/user-profile/",
-            "accounts": "/api/accounts/"
+            "accounts": "/api/accounts/",
+            "diagnostics": "/api/diagnostics/"
         }
     }
 
 @app.get("/health")
+@app.get("/health/live")
 async def health_check():
-    """Health check endpoint"""
+    """Liveness: the process is up and its event loop is serving requests"""
     return {"status": "healthy", "service": "financial-coach-api"}
 
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness: boot finished and the database answers; 503 while starting, draining or cut off"""
+    if is_draining():
+        return JSONResponse({"status": "draining"}, status_code=503)
+    if not getattr(app.state, "ready", False):
+        return JSONResponse({"status": "starting"}, status_code=503)
+    try:
+        async with engine.connect() as conn:
+            await asyncio.wait_for(conn.execute(text("SELECT 1")), READINESS_DB_TIMEOUT)
+    except Exception as e:
+        return JSONResponse({"status": "database unavailable", "error": e.__class__.__name__}, status_code=503)
+    return {"status": "ready", "service": "financial-coach-api"}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics for this worker process"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, DateTime, Text, Boolean, ForeignKey, Integer, Date
+from sqlalchemy import Column, String, Float, DateTime, Text, Boolean, ForeignKey, Integer, Date, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -158,4 +158,46 @@ class Account(Base):
     user = relationship("User", backref="accounts")
 
     def __repr__(self):
-        return f"<Account(id={self.id}, name={self.name}, balance={self.balance}, icon={self.icon})>" 
\ No newline at end of file
+        return f"<Account(id={self.id}, name={self.name}, balance={self.balance}, icon={self.icon})>" 
+class CoachConversation(Base):
+    __tablename__ = "coach_conversations"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
+    # Running summary of the turns that no longer go into the prompt verbatim
+    summary = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<CoachConversation(id={self.id}, user_id={self.user_id})>"
+
+class CoachMessage(Base):
+    __tablename__ = "coach_messages"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    conversation_id = Column(UUID(as_uuid=True), ForeignKey("coach_conversations.id", ondelete="CASCADE"), nullable=False)
+    role = Column(String(20), nullable=False)  # "user" or "assistant"
+    content = Column(Text, nullable=False)
+    is_summarized = Column(Boolean, default=False, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("ix_coach_messages_conversation_created", "conversation_id", "created_at"),
+    )
+
+    def __repr__(self):
+        return f"<CoachMessage(id={self.id}, role={self.role}, is_summarized={self.is_summarized})>"
+
+class CoachInsight(Base):
+    __tablename__ = "coach_insights"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
+    content = Column(Text, nullable=False)
+    source = Column(String(20), nullable=False)  # "llm" or "local"
+    generated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    valid_until = Column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f"<CoachInsight(id={self.id}, user_id={self.user_id}, source={self.source}, valid_until={self.valid_until})>"
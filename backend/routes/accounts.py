@@ -5,7 +5,7 @@ from typing import List
 from pydantic import BaseModel, Field
 import uuid
 
-from data.database import get_db
+from data.database import get_db, get_read_db
 from models import Account, User
 from auth.security import get_current_active_user
 
@@ -36,7 +36,7 @@ class AccountOut(BaseModel):
 
 @router.get("/", response_model=List[AccountOut])
 async def get_accounts(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     result = await db.execute(select(Account).where(Account.user_id == current_user.id))
@@ -92,7 +92,7 @@ async def delete_account(
     return {"message": "Account deleted"}
 
 @router.get("/summary")
-async def get_accounts_summary(current_user: User = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
+async def get_accounts_summary(current_user: User = Depends(get_current_active_user), db: AsyncSession = Depends(get_read_db)):
     result = await db.execute(select(Account).where(Account.user_id == current_user.id))
     accounts = result.scalars().all()
     total_balance = sum(acc.balance for acc in accounts)
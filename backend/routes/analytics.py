@@ -4,15 +4,38 @@ from sqlalchemy import select, func, and_, or_, extract
 from typing import List, Optional, Dict, Any
 from datetime import datetime, date, timedelta
 from pydantic import BaseModel
+import functools
 import uuid
+import os
 
 from data.database import get_db
+from data.cache import Cache
 from models import Transaction, User
 from utils.filters import get_summary_filters
+from utils.spending import calculate_spending_volatility
+from utils.single_flight import coalesce_per_user
 from auth.security import get_current_active_user
+from services.dashboard_snapshot import load_dashboard_snapshot
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
+# Per-user analytics results; any committed change to the user's transactions drops them.
+# Misses are filled from the primary: a result read from a lagging replica right after
+# another worker's write would be stored under the new version and served until the TTL.
+ANALYTICS_CACHE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL", "300"))
+analytics_cache = Cache("analytics", ttl=ANALYTICS_CACHE_TTL)
+analytics_cache.invalidated_by(Transaction, lambda transaction: transaction.user_id)
+
+def cached_per_user(endpoint):
+    """Serve an endpoint from analytics_cache, keyed by its name and query parameters"""
+    @functools.wraps(endpoint)
+    async def wrapper(**kwargs):
+        params = "&".join(f"{name}={value}" for name, value in sorted(kwargs.items()) if name not in ("current_user", "db"))
+        return await analytics_cache.get_or_load(
+            kwargs["current_user"].id, f"{endpoint.__name__}?{params}", lambda: endpoint(**kwargs)
+        )
+    return wrapper
+
 # Pydantic models
 class SpendingTrend(BaseModel):
     period: str
@@ -50,6 +73,7 @@ class FinancialHealth(BaseModel):
     spending_volatility: float
 
 @router.get("/trends", response_model=List[SpendingTrend])
+@cached_per_user
 async def get_spending_trends(
     period: str = Query("monthly", description="Period: daily, weekly, monthly, yearly"),
     start_date: Optional[date] = Query(None, description="Filter from date (YYYY-MM-DD)"),
@@ -112,6 +136,7 @@ async def get_spending_trends(
     return trends
 
 @router.get("/categories/insights", response_model=List[CategoryInsight])
+@cached_per_user
 async def get_category_insights(
     start_date: Optional[date] = Query(None, description="Filter from date (YYYY-MM-DD)"),
     end_date: Optional[date] = Query(None, description="Filter until date (YYYY-MM-DD)"),
@@ -173,6 +198,7 @@ async def get_category_insights(
     return insights
 
 @router.get("/monthly-comparison", response_model=List[MonthlyComparison])
+@cached_per_user
 async def get_monthly_comparison(
     year: int = Query(..., description="Year to analyze"),
     current_user: User = Depends(get_current_active_user),
@@ -239,6 +265,7 @@ async def get_monthly_comparison(
     return comparisons
 
 @router.get("/spending-patterns", response_model=List[SpendingPattern])
+@cached_per_user
 async def get_spending_patterns(
     start_date: Optional[date] = Query(None, description="Filter from date (YYYY-MM-DD)"),
     end_date: Optional[date] = Query(None, description="Filter until date (YYYY-MM-DD)"),
@@ -287,6 +314,8 @@ async def get_spending_patterns(
     return patterns
 
 @router.get("/financial-health", response_model=FinancialHealth)
+@coalesce_per_user
+@cached_per_user
 async def get_financial_health(
     start_date: Optional[date] = Query(None, description="Filter from date (YYYY-MM-DD)"),
     end_date: Optional[date] = Query(None, description="Filter until date (YYYY-MM-DD)"),
@@ -379,12 +408,7 @@ async def get_financial_health(
     daily_result = await db.execute(daily_spending_query)
     daily_amounts = [row.daily_total for row in daily_result]
     
-    # Simple volatility calculation (in a real app, you'd use proper statistical methods)
-    spending_volatility = 0.0
-    if len(daily_amounts) > 1:
-        mean = sum(daily_amounts) / len(daily_amounts)
-        variance = sum((x - mean) ** 2 for x in daily_amounts) / len(daily_amounts)
-        spending_volatility = variance ** 0.5
+    spending_volatility = calculate_spending_volatility(daily_amounts)
     
     return FinancialHealth(
         savings_rate=savings_rate,
@@ -398,97 +422,13 @@ async def get_financial_health(
 @router.get("/user/{user_id}/dashboard")
 async def get_user_dashboard(
     user_id: uuid.UUID,
-    current_user: User = Depends(get_current_active_user),
-    db: AsyncSession = Depends(get_db)
+    current_user: User = Depends(get_current_active_user)
 ):
     """Get comprehensive dashboard data for a user (own dashboard only)"""
     # Users can only access their own dashboard
     if str(current_user.id) != str(user_id):
         raise HTTPException(status_code=403, detail="Not authorized to access this user's dashboard")
     
-    # Check if user exists
-    user_query = select(User).where(User.id == user_id)
-    user_result = await db.execute(user_query)
-    if not user_result.scalar_one_or_none():
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    # Get current month data
-    now = datetime.now()
-    start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    
-    # Get monthly summary
-    monthly_income_query = select(func.sum(Transaction.amount)).where(
-        and_(
-            Transaction.user_id == user_id,
-            Transaction.type == "income",
-            Transaction.date >= start_of_month
-        )
-    )
-    monthly_expense_query = select(func.sum(Transaction.amount)).where(
-        and_(
-            Transaction.user_id == user_id,
-            Transaction.type == "expense",
-            Transaction.date >= start_of_month
-        )
-    )
-    
-    monthly_income_result = await db.execute(monthly_income_query)
-    monthly_expense_result = await db.execute(monthly_expense_query)
-    
-    monthly_income = monthly_income_result.scalar() or 0.0
-    monthly_expenses = monthly_expense_result.scalar() or 0.0
-    
-    # Get top spending categories this month
-    top_categories_query = select(
-        Transaction.category,
-        func.sum(Transaction.amount).label("total")
-    ).where(
-        and_(
-            Transaction.user_id == user_id,
-            Transaction.type == "expense",
-            Transaction.date >= start_of_month
-        )
-    ).group_by(
-        Transaction.category
-    ).order_by(
-        func.sum(Transaction.amount).desc()
-    ).limit(5)
-    
-    top_categories_result = await db.execute(top_categories_query)
-    top_categories = [
-        {"category": row.category, "amount": row.total}
-        for row in top_categories_result
-    ]
-    
-    # Get recent transactions
-    recent_transactions_query = select(Transaction).where(
-        Transaction.user_id == user_id
-    ).order_by(
-        Transaction.date.desc()
-    ).limit(10)
-    
-    recent_result = await db.execute(recent_transactions_query)
-    recent_transactions = []
-    
-    for transaction in recent_result.scalars().all():
-        recent_transactions.append({
-            "id": str(transaction.id),
-            "amount": transaction.amount,
-            "type": transaction.type,
-            "category": transaction.category,
-            "description": transaction.description,
-            "date": transaction.date.isoformat()
-        })
-    
-    return {
-        "user_id": str(user_id),
-        "current_month": {
-            "income": monthly_income,
-            "expenses": monthly_expenses,
-            "net_balance": monthly_income - monthly_expenses,
-            "savings_rate": ((monthly_income - monthly_expenses) / monthly_income) * 100 if monthly_income > 0 else 0
-        },
-        "top_spending_categories": top_categories,
-        "recent_transactions": recent_transactions,
-        "last_updated": now.isoformat()
-    } 
\ No newline at end of file
+    # Precomputed at login and after writes; see services.dashboard_snapshot
+    snapshot = await load_dashboard_snapshot(user_id)
+    return snapshot["dashboard"]
@@ -8,6 +8,7 @@ from pydantic import BaseModel, EmailStr
 import uuid
 
 from data.database import get_db
+from services.dashboard_snapshot import warm_dashboard_snapshot
 from models import User, UserProfile, UserStats
 from auth.security import (
     verify_password, 
@@ -87,7 +88,7 @@ async def register(
         )
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash(user_data.password)
     db_user = User(
         email=user_data.email,
         username=user_data.username,
@@ -138,7 +139,7 @@ async def login(
         )
     
     # Verify password
-    if not verify_password(user_credentials.password, user.password_hash):
+    if not await verify_password(user_credentials.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -159,6 +160,9 @@ async def login(
         expires_delta=access_token_expires
     )
     
+    # Start building the dashboard so it is ready by the time the client asks for it
+    await warm_dashboard_snapshot(user.id)
+    
     return Token(
         access_token=access_token,
         token_type="bearer",
@@ -188,7 +192,7 @@ async def login_form(
         )
     
     # Verify password
-    if not verify_password(form_data.password, user.password_hash):
+    if not await verify_password(form_data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username/email or password",
@@ -209,6 +213,9 @@ async def login_form(
         expires_delta=access_token_expires
     )
     
+    # Start building the dashboard so it is ready by the time the client asks for it
+    await warm_dashboard_snapshot(user.id)
+    
     return Token(
         access_token=access_token,
         token_type="bearer",
@@ -237,8 +244,10 @@ async def change_password(
     db: AsyncSession = Depends(get_db)
 ):
     """Change user password"""
+    # Not part of the cached user row
+    await db.refresh(current_user, ["password_hash"])
     # Verify current password
-    if not verify_password(password_data.current_password, current_user.password_hash):
+    if not await verify_password(password_data.current_password, current_user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Current password is incorrect"
@@ -252,7 +261,7 @@ async def change_password(
         )
     
     # Update password
-    current_user.password_hash = get_password_hash(password_data.new_password)
+    current_user.password_hash = await get_password_hash(password_data.new_password)
     await db.commit()
     
     return {"message": "Password changed successfully"}
@@ -1,18 +1,25 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, or_
+from sqlalchemy import select, bindparam, func, and_, or_
 from typing import List, Optional
 from datetime import datetime, date, timedelta
 from pydantic import BaseModel
 import uuid
 
-from data.database import get_db
+from data.database import get_db, get_read_db
 from models import Budget, Transaction, User
 from utils.filters import get_summary_filters
 from auth.security import get_current_active_user
+from services.dashboard_snapshot import load_dashboard_snapshot
 
 router = APIRouter(prefix="/budgets", tags=["budgets"])
 
+# Ownership-checked lookup shared by the per-budget endpoints; built and compiled once
+BUDGET_BY_ID = select(Budget).where(
+    Budget.id == bindparam("budget_id"),
+    Budget.user_id == bindparam("user_id")
+)
+
 # Pydantic models
 class BudgetCreate(BaseModel):
     user_id: uuid.UUID
@@ -105,7 +112,7 @@ async def get_budgets(
     category: Optional[str] = Query(None, description="Filter by category"),
     is_active: Optional[bool] = Query(None, description="Filter by active status"),
     current_user: User = Depends(get_current_active_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get budgets for the authenticated user with optional filtering"""
     query = select(Budget).where(Budget.user_id == current_user.id)
@@ -130,11 +137,7 @@ async def get_budget(
     db: AsyncSession = Depends(get_db)
 ):
     """Get a specific budget by ID (only if owned by current user)"""
-    query = select(Budget).where(
-        Budget.id == budget_id,
-        Budget.user_id == current_user.id
-    )
-    result = await db.execute(query)
+    result = await db.execute(BUDGET_BY_ID, {"budget_id": budget_id, "user_id": current_user.id})
     budget = result.scalar_one_or_none()
     
     if not budget:
@@ -150,11 +153,7 @@ async def update_budget(
     db: AsyncSession = Depends(get_db)
 ):
     """Update a budget (only if owned by current user)"""
-    query = select(Budget).where(
-        Budget.id == budget_id,
-        Budget.user_id == current_user.id
-    )
-    result = await db.execute(query)
+    result = await db.execute(BUDGET_BY_ID, {"budget_id": budget_id, "user_id": current_user.id})
     budget = result.scalar_one_or_none()
     
     if not budget:
@@ -181,11 +180,7 @@ async def delete_budget(
     db: AsyncSession = Depends(get_db)
 ):
     """Delete a budget (only if owned by current user)"""
-    query = select(Budget).where(
-        Budget.id == budget_id,
-        Budget.user_id == current_user.id
-    )
-    result = await db.execute(query)
+    result = await db.execute(BUDGET_BY_ID, {"budget_id": budget_id, "user_id": current_user.id})
     budget = result.scalar_one_or_none()
     
     if not budget:
@@ -204,11 +199,7 @@ async def get_budget_status(
 ):
     """Get budget status with spending information (only if owned by current user)"""
     # Get budget
-    budget_query = select(Budget).where(
-        Budget.id == budget_id,
-        Budget.user_id == current_user.id
-    )
-    budget_result = await db.execute(budget_query)
+    budget_result = await db.execute(BUDGET_BY_ID, {"budget_id": budget_id, "user_id": current_user.id})
     budget = budget_result.scalar_one_or_none()
     
     if not budget:
@@ -260,68 +251,13 @@ async def get_budget_status(
 @router.get("/user/{user_id}/overview", response_model=List[BudgetStatus])
 async def get_user_budgets_overview(
     user_id: uuid.UUID,
-    current_user: User = Depends(get_current_active_user),
-    db: AsyncSession = Depends(get_db)
+    current_user: User = Depends(get_current_active_user)
 ):
     """Get overview of all active budgets for a user (own budgets only)"""
     # Users can only access their own budget overview
     if str(current_user.id) != str(user_id):
         raise HTTPException(status_code=403, detail="Not authorized to access this user's budget overview")
     
-    # Check if user exists
-    user_query = select(User).where(User.id == user_id)
-    user_result = await db.execute(user_query)
-    if not user_result.scalar_one_or_none():
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    # Get all active budgets for the user
-    budgets_query = select(Budget).where(
-        and_(Budget.user_id == user_id, Budget.is_active == True)
-    )
-    budgets_result = await db.execute(budgets_query)
-    budgets = budgets_result.scalars().all()
-    
-    budget_statuses = []
-    for budget in budgets:
-        # Calculate status for each budget
-        now = datetime.now()
-        start_date = budget.start_date
-        
-        if budget.period == "monthly":
-            end_date = start_date + timedelta(days=30)
-        elif budget.period == "weekly":
-            end_date = start_date + timedelta(days=7)
-        else:  # yearly
-            end_date = start_date + timedelta(days=365)
-        
-        spent_query = select(func.sum(Transaction.amount)).where(
-            and_(
-                Transaction.user_id == user_id,  # Add user_id filter
-                Transaction.category == budget.category,
-                Transaction.type == "expense",
-                Transaction.date >= start_date,
-                Transaction.date <= end_date
-            )
-        )
-        
-        spent_result = await db.execute(spent_query)
-        spent_amount = spent_result.scalar() or 0.0
-        
-        remaining_amount = budget.amount - spent_amount
-        percentage_used = (spent_amount / budget.amount) * 100 if budget.amount > 0 else 0
-        is_over_budget = spent_amount > budget.amount
-        
-        days_remaining = None
-        if end_date > now:
-            days_remaining = (end_date - now).days
-        
-        budget_statuses.append(BudgetStatus(
-            budget=budget,
-            spent_amount=spent_amount,
-            remaining_amount=remaining_amount,
-            percentage_used=percentage_used,
-            is_over_budget=is_over_budget,
-            days_remaining=days_remaining
-        ))
-    
-    return budget_statuses 
\ No newline at end of file
+    # Part of the dashboard snapshot; see services.dashboard_snapshot
+    snapshot = await load_dashboard_snapshot(user_id)
+    return snapshot["budgets"]
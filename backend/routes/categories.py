@@ -3,13 +3,20 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from typing import List
 from pydantic import BaseModel
+import os
 
 from data.database import get_db
+from data.cache import Cache
 from models import Category
 from categories import ALL_DEFAULT_CATEGORIES
 
 router = APIRouter(prefix="/categories", tags=["categories"])
 
+# The category list is global, so it is cached as a single scope
+CATEGORIES_CACHE_TTL = float(os.getenv("CATEGORIES_CACHE_TTL", "3600"))
+categories_cache = Cache("categories", ttl=CATEGORIES_CACHE_TTL)
+categories_cache.invalidated_by(Category, lambda category: "all")
+
 # Pydantic models
 class CategoryCreate(BaseModel):
     name: str
@@ -24,11 +31,13 @@ class CategoryResponse(BaseModel):
 @router.get("/", response_model=List[CategoryResponse])
 async def get_categories(db: AsyncSession = Depends(get_db)):
     """Get all categories (default and custom)"""
-    query = select(Category).order_by(Category.name)
-    result = await db.execute(query)
-    categories = result.scalars().all()
-    
-    return categories
+    # Filled from the primary, like every cached read, so the cache never stores replica lag
+    async def load_categories():
+        query = select(Category).order_by(Category.name)
+        result = await db.execute(query)
+        return [CategoryResponse.model_validate(category) for category in result.scalars().all()]
+
+    return await categories_cache.get_or_load("all", "list", load_categories)
 
 @router.post("/", response_model=CategoryResponse)
 async def create_category(
@@ -1,59 +1,172 @@
-from fastapi import APIRouter, HTTPException, Depends
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, HTTPException, Depends, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from typing import List, Optional
+from datetime import datetime, timezone
 from pydantic import BaseModel
-from data.database import get_db
-from models import User, Transaction, Goal, UserProfile
+import uuid
+from data.database import get_db, AsyncSessionLocal
+from models import User, CoachConversation, CoachMessage
 from services.ai_coach import get_financial_advice
+from services.financial_snapshot import load_financial_snapshot
+from services.coach_tools import run_tool_call
+from services.coach_memory import get_conversation, load_memory, save_reply
+from services.coach_insights import get_valid_insight, build_insight
 from auth.security import get_current_user
+from utils.sse import EventSourceResponse, coalesce_events
 
 router = APIRouter(prefix="/coach", tags=["coach"])
 
 class CoachRequest(BaseModel):
     message: str
+    conversation_id: Optional[uuid.UUID] = None
+
+class ConversationResponse(BaseModel):
+    id: uuid.UUID
+    summary: Optional[str]
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class CoachMessageResponse(BaseModel):
+    id: uuid.UUID
+    role: str
+    content: str
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class CoachInsightResponse(BaseModel):
+    content: str
+    source: str
+    generated_at: datetime
+    valid_until: datetime
+
+    class Config:
+        from_attributes = True
 
 @router.post("/ask")
 async def ask_coach(
     req: CoachRequest,
+    request: Request,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    # Get recent transactions
-    tx_query = (
-        select(Transaction)
-        .where(Transaction.user_id == current_user.id)
-        .order_by(Transaction.date.desc())
-        .limit(10)
-    )
-    tx_result = await db.execute(tx_query)
-    transactions = tx_result.scalars().all()
-    
-    # Get user goals
-    goals_query = select(Goal).where(Goal.user_id == current_user.id, Goal.is_active == True)
-    goals_result = await db.execute(goals_query)
-    goals = goals_result.scalars().all()
-    
-    # Явно загружаем профиль пользователя
-    profile_query = select(UserProfile).where(UserProfile.user_id == current_user.id)
-    profile_result = await db.execute(profile_query)
-    profile = profile_result.scalar_one_or_none()
-    
+    # Continue an existing conversation or start a new one
+    if req.conversation_id:
+        conversation = await get_conversation(db, req.conversation_id, current_user.id)
+        if not conversation:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+        history = await load_memory(db, conversation)
+    else:
+        conversation = CoachConversation(user_id=current_user.id)
+        db.add(conversation)
+        await db.flush()
+        history = []
+
+    # The question is stored with its answer once the stream completes (see save_reply)
+    await db.commit()
+    conversation_id = conversation.id
+    asked_at = datetime.now(timezone.utc)
+
+    # Compact aggregates for the prompt and for the local fallback coach;
+    # anything else the model asks for through tools
+    snapshot = await load_financial_snapshot(db, current_user.id)
+    profile = snapshot["profile"]
+
     # Convert to dict for AI context
     user_dict = {
         "id": str(current_user.id),
         "username": current_user.username,
         "email": current_user.email
     }
-    
-    if profile:
+
+    if profile["name"] or profile["age"]:
         user_dict.update({
-            "name": profile.name,
-            "age": profile.age,
+            "name": profile["name"],
+            "age": profile["age"],
             # Add other profile fields if needed by the prompt
         })
-    
-    # Get AI advice stream
-    advice_stream = get_financial_advice(user_dict, req.message, transactions, goals)
-    
-    return StreamingResponse(advice_stream, media_type="text/event-stream") 
\ No newline at end of file
+
+    # The stream outlives this handler; give the connection back now instead of holding it
+    # until the answer is complete. Tool calls open short sessions of their own.
+    await db.close()
+
+    async def run_tool(name: str, arguments: str) -> str:
+        async with AsyncSessionLocal() as tool_db:
+            return await run_tool_call(name, arguments, tool_db, current_user)
+
+    async def advice_stream():
+        parts = []
+        async for part in get_financial_advice(user_dict, req.message, snapshot, run_tool, history):
+            parts.append(part)
+            yield part
+        # Only completed answers become part of the conversation memory
+        await save_reply(conversation_id, req.message, asked_at, "".join(parts))
+
+    return EventSourceResponse(
+        coalesce_events(request, advice_stream()),
+        headers={"X-Conversation-Id": str(conversation_id)}
+    )
+
+@router.get("/insights", response_model=CoachInsightResponse)
+async def get_insights(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get the pre-generated insight card of the authenticated user"""
+    insight = await get_valid_insight(db, current_user.id)
+    if insight:
+        return insight
+
+    # Not covered by the nightly batch yet: compute locally, never call the provider here
+    snapshot = await load_financial_snapshot(db, current_user.id)
+    return await build_insight(snapshot, current_user.id, current_user.username, use_llm=False)
+
+@router.get("/conversations", response_model=List[ConversationResponse])
+async def get_conversations(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get the coach conversations of the authenticated user, newest first"""
+    query = select(CoachConversation).where(
+        CoachConversation.user_id == current_user.id
+    ).order_by(CoachConversation.updated_at.desc())
+    result = await db.execute(query)
+    return result.scalars().all()
+
+@router.get("/conversations/{conversation_id}/messages", response_model=List[CoachMessageResponse])
+async def get_conversation_messages(
+    conversation_id: uuid.UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get the full message history of a conversation (only if owned by current user)"""
+    conversation = await get_conversation(db, conversation_id, current_user.id)
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+
+    query = select(CoachMessage).where(
+        CoachMessage.conversation_id == conversation_id
+    ).order_by(CoachMessage.created_at)
+    result = await db.execute(query)
+    return result.scalars().all()
+
+@router.delete("/conversations/{conversation_id}")
+async def delete_conversation(
+    conversation_id: uuid.UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Delete a conversation and its messages (only if owned by current user)"""
+    conversation = await get_conversation(db, conversation_id, current_user.id)
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+
+    await db.delete(conversation)
+    await db.commit()
+
+    return {"message": "Conversation deleted successfully"}
@@ -0,0 +1,122 @@
+import os
+from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from data.database import engine_profile
+from data.replicas import replica_pool
+from data.statement_cache import statement_cache_stats
+from data.slow_queries import slow_query_log
+from data.connection_lifetimes import connection_tracker
+from auth.security import require_admin
+from utils.request_timing import get_recent_requests
+from utils.profiler import list_profiles, collapsed_stacks
+from utils.single_flight import single_flight_stats
+from utils.load_shedding import load_monitor
+from utils.loop_watchdog import loop_watchdog
+from utils.memory_profiler import memory_profiler, MEMORY_TRACE_FRAMES, MEMORY_TRACE_MAX_FRAMES
+
+# Operational endpoints, only reachable with the X-Admin-Token header
+router = APIRouter(prefix="/diagnostics", tags=["diagnostics"], dependencies=[Depends(require_admin)])
+
+@router.get("/statement-cache")
+async def get_statement_cache_stats():
+    """Compiled statement cache hit rate and estimated compile time saved"""
+    return statement_cache_stats.snapshot(engine_profile["query_cache_size"])
+
+@router.get("/single-flight")
+async def get_single_flight_stats():
+    """Coalesced endpoints: calls run, calls shared and SQL statements saved"""
+    return single_flight_stats()
+
+@router.get("/load")
+async def get_load_status():
+    """Event-loop lag, recent pool wait and whether low-priority routes are being shed"""
+    return load_monitor.status()
+
+@router.get("/blocking")
+async def get_blocking_calls(limit: int = Query(50, ge=1, le=1000)):
+    """Recent callbacks that blocked the event loop, with their stacks, newest first"""
+    return loop_watchdog.get_recent(limit)
+
+@router.post("/memory/start")
+async def start_memory_tracing(frames: int = Query(MEMORY_TRACE_FRAMES, ge=1, le=MEMORY_TRACE_MAX_FRAMES)):
+    """Trace allocations on this worker and take the baseline; when already tracing, take a new baseline"""
+    return await memory_profiler.start(frames)
+
+@router.post("/memory/stop")
+async def stop_memory_tracing():
+    """Stop tracing allocations and free the traces"""
+    return await memory_profiler.stop()
+
+def _not_tracing():
+    return HTTPException(status_code=409, detail=f"Memory tracing is not running on this worker (pid {os.getpid()})")
+
+@router.get("/memory/diff")
+async def get_memory_diff(
+    group_by: str = Query("module", pattern="^(module|site)$"),
+    limit: int = Query(20, ge=1, le=200),
+    reset: bool = Query(False, description="Make this snapshot the new baseline")
+):
+    """Modules or code sites whose traced memory grew the most since the baseline"""
+    report = await memory_profiler.diff(group_by, limit, reset)
+    if report is None:
+        raise _not_tracing()
+    return report
+
+@router.get("/memory/top")
+async def get_memory_top(
+    group_by: str = Query("module", pattern="^(module|site)$"),
+    limit: int = Query(20, ge=1, le=200)
+):
+    """Modules or code sites holding the most traced memory right now"""
+    report = await memory_profiler.top(group_by, limit)
+    if report is None:
+        raise _not_tracing()
+    return report
+
+@router.get("/memory/sessions")
+async def get_session_identity_maps(limit: int = Query(50, ge=1, le=500)):
+    """ORM objects held by each open database session, and the largest identity map per route while tracing"""
+    return memory_profiler.sessions(limit)
+
+@router.get("/connections")
+async def get_connection_lifetimes():
+    """Connections checked out right now and how long each route holds its connections"""
+    return connection_tracker.status()
+
+@router.get("/replicas")
+async def get_replica_status():
+    """Health and replication lag of the configured read replicas"""
+    return replica_pool.status()
+
+@router.get("/requests")
+async def get_request_log(limit: int = Query(50, ge=1, le=1000)):
+    """Most recent requests with their statement count and database time, newest first"""
+    return get_recent_requests(limit)
+
+@router.get("/slow-queries")
+async def get_slow_queries(
+    limit: int = Query(20, ge=1, le=200),
+    include_plans: bool = Query(True, description="Include captured EXPLAIN (ANALYZE, BUFFERS) plans")
+):
+    """Slowest statement shapes by total time, with their latest captured plan"""
+    return slow_query_log.top(limit, include_plans)
+
+@router.delete("/slow-queries")
+async def reset_slow_queries():
+    """Forget all recorded slow queries"""
+    slow_query_log.reset()
+    return {"message": "Slow query log cleared"}
+
+@router.get("/profiles")
+async def get_profiles():
+    """Request profiles taken with X-Profile: 1, newest first"""
+    return list_profiles()
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(profile_id: str):
+    """One profile as collapsed stacks, for flamegraph.pl, inferno or speedscope"""
+    stacks = collapsed_stacks(profile_id)
+    if stacks is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(stacks)
@@ -1,18 +1,25 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, or_
+from sqlalchemy import select, bindparam, func, and_, or_
 from typing import List, Optional
 from datetime import datetime, date, timedelta
 from pydantic import BaseModel
 import uuid
 
-from data.database import get_db
+from data.database import get_db, get_read_db
 from models import Goal, Transaction, User
 from utils.filters import get_summary_filters
 from auth.security import get_current_active_user
+from services.dashboard_snapshot import load_dashboard_snapshot
 
 router = APIRouter(prefix="/goals", tags=["goals"])
 
+# Ownership-checked lookup shared by the per-goal endpoints; built and compiled once
+GOAL_BY_ID = select(Goal).where(
+    Goal.id == bindparam("goal_id"),
+    Goal.user_id == bindparam("user_id")
+)
+
 # Pydantic models
 class GoalCreate(BaseModel):
     user_id: uuid.UUID
@@ -101,7 +108,7 @@ async def get_goals(
     is_active: Optional[bool] = Query(None, description="Filter by active status"),
     is_completed: Optional[bool] = Query(None, description="Filter by completion status"),
     current_user: User = Depends(get_current_active_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get goals for the authenticated user with optional filtering"""
     query = select(Goal).where(Goal.user_id == current_user.id)
@@ -132,11 +139,7 @@ async def get_goal(
     db: AsyncSession = Depends(get_db)
 ):
     """Get a specific goal by ID (only if owned by current user)"""
-    query = select(Goal).where(
-        Goal.id == goal_id,
-        Goal.user_id == current_user.id
-    )
-    result = await db.execute(query)
+    result = await db.execute(GOAL_BY_ID, {"goal_id": goal_id, "user_id": current_user.id})
     goal = result.scalar_one_or_none()
     
     if not goal:
@@ -152,11 +155,7 @@ async def update_goal(
     db: AsyncSession = Depends(get_db)
 ):
     """Update a goal (only if owned by current user)"""
-    query = select(Goal).where(
-        Goal.id == goal_id,
-        Goal.user_id == current_user.id
-    )
-    result = await db.execute(query)
+    result = await db.execute(GOAL_BY_ID, {"goal_id": goal_id, "user_id": current_user.id})
     goal = result.scalar_one_or_none()
     
     if not goal:
@@ -191,11 +190,7 @@ async def delete_goal(
     db: AsyncSession = Depends(get_db)
 ):
     """Delete a goal (only if owned by current user)"""
-    query = select(Goal).where(
-        Goal.id == goal_id,
-        Goal.user_id == current_user.id
-    )
-    result = await db.execute(query)
+    result = await db.execute(GOAL_BY_ID, {"goal_id": goal_id, "user_id": current_user.id})
     goal = result.scalar_one_or_none()
     
     if not goal:
@@ -214,11 +209,7 @@ async def get_goal_progress(
 ):
     """Get goal progress with detailed information (only if owned by current user)"""
     # Get goal
-    goal_query = select(Goal).where(
-        Goal.id == goal_id,
-        Goal.user_id == current_user.id
-    )
-    goal_result = await db.execute(goal_query)
+    goal_result = await db.execute(GOAL_BY_ID, {"goal_id": goal_id, "user_id": current_user.id})
     goal = goal_result.scalar_one_or_none()
     
     if not goal:
@@ -270,11 +261,7 @@ async def contribute_to_goal(
         raise HTTPException(status_code=400, detail="Contribution amount must be greater than 0")
     
     # Get goal
-    goal_query = select(Goal).where(
-        Goal.id == goal_id,
-        Goal.user_id == current_user.id
-    )
-    goal_result = await db.execute(goal_query)
+    goal_result = await db.execute(GOAL_BY_ID, {"goal_id": goal_id, "user_id": current_user.id})
     goal = goal_result.scalar_one_or_none()
     
     if not goal:
@@ -298,58 +285,13 @@ async def contribute_to_goal(
 @router.get("/user/{user_id}/overview", response_model=List[GoalProgress])
 async def get_user_goals_overview(
     user_id: uuid.UUID,
-    current_user: User = Depends(get_current_active_user),
-    db: AsyncSession = Depends(get_db)
+    current_user: User = Depends(get_current_active_user)
 ):
     """Get overview of all active goals for a user (own goals only)"""
     # Users can only access their own goal overview
     if str(current_user.id) != str(user_id):
         raise HTTPException(status_code=403, detail="Not authorized to access this user's goal overview")
     
-    # Check if user exists
-    user_query = select(User).where(User.id == user_id)
-    user_result = await db.execute(user_query)
-    if not user_result.scalar_one_or_none():
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    # Get all active goals for the user
-    goals_query = select(Goal).where(
-        and_(Goal.user_id == user_id, Goal.is_active == True)
-    )
-    goals_result = await db.execute(goals_query)
-    goals = goals_result.scalars().all()
-    
-    goal_progresses = []
-    for goal in goals:
-        # Calculate progress for each goal
-        progress_percentage = (goal.current_amount / goal.target_amount) * 100 if goal.target_amount > 0 else 0
-        remaining_amount = goal.target_amount - goal.current_amount
-        is_completed = goal.current_amount >= goal.target_amount
-        is_overdue = False
-        days_remaining = None
-        estimated_completion_date = None
-        
-        if goal.target_date:
-            now = datetime.now()
-            days_remaining = (goal.target_date - now).days
-            is_overdue = days_remaining < 0 and not is_completed
-        
-        if not is_completed and goal.current_amount > 0:
-            days_since_creation = (datetime.now() - goal.created_at).days
-            if days_since_creation > 0:
-                daily_rate = goal.current_amount / days_since_creation
-                if daily_rate > 0:
-                    days_to_complete = remaining_amount / daily_rate
-                    estimated_completion_date = datetime.now() + timedelta(days=days_to_complete)
-        
-        goal_progresses.append(GoalProgress(
-            goal=goal,
-            progress_percentage=progress_percentage,
-            remaining_amount=remaining_amount,
-            days_remaining=days_remaining,
-            is_completed=is_completed,
-            is_overdue=is_overdue,
-            estimated_completion_date=estimated_completion_date
-        ))
-    
-    return goal_progresses 
\ No newline at end of file
+    # Part of the dashboard snapshot; see services.dashboard_snapshot
+    snapshot = await load_dashboard_snapshot(user_id)
+    return snapshot["goals"]
@@ -1,13 +1,14 @@
 from fastapi import APIRouter, Depends, Query, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_
+from sqlalchemy import select, func, and_, lambda_stmt
 from typing import List, Optional
 from datetime import date, datetime
 from pydantic import BaseModel
 
-from data.database import get_db
+from data.database import get_read_db
 from models import Transaction, User
-from utils.filters import get_summary_filters
+from utils.filters import get_summary_filters, add_date_range
+from utils.single_flight import coalesce_per_user
 from auth.security import get_current_active_user
 
 router = APIRouter(prefix="/summary", tags=["summary"])
@@ -32,29 +33,22 @@ class DailySummary(BaseModel):
     transaction_count: int
 
 @router.get("/", response_model=SummaryResponse)
+@coalesce_per_user
 async def get_summary(
     start_date: Optional[date] = Query(None, description="Filter from date (YYYY-MM-DD)"),
     end_date: Optional[date] = Query(None, description="Filter until date (YYYY-MM-DD)"),
     current_user: User = Depends(get_current_active_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get total income, expenses, and net balance for the authenticated user"""
-    # Build base filters including user_id
-    base_filters = [Transaction.user_id == current_user.id]
-    
-    # Add date filters if provided
-    if start_date:
-        base_filters.append(Transaction.date >= start_date)
-    
-    if end_date:
-        end_date_plus_one = datetime.combine(end_date, datetime.max.time())
-        base_filters.append(Transaction.date <= end_date_plus_one)
+    # Lambda statements: built and compiled once per filter combination
+    user_id = current_user.id
     
     # Get income summary
-    income_query = select(
+    income_query = add_date_range(lambda_stmt(lambda: select(
         func.sum(Transaction.amount).label("total_income"),
         func.count(Transaction.id).label("income_count")
-    ).where(and_(Transaction.type == "income", *base_filters))
+    ).where(Transaction.type == "income", Transaction.user_id == user_id)), start_date, end_date)
     
     income_result = await db.execute(income_query)
     income_data = income_result.first()
@@ -62,10 +56,10 @@ async def get_summary(
     income_count = income_data.income_count or 0
     
     # Get expense summary
-    expense_query = select(
+    expense_query = add_date_range(lambda_stmt(lambda: select(
         func.sum(Transaction.amount).label("total_expenses"),
         func.count(Transaction.id).label("expense_count")
-    ).where(and_(Transaction.type == "expense", *base_filters))
+    ).where(Transaction.type == "expense", Transaction.user_id == user_id)), start_date, end_date)
     
     expense_result = await db.execute(expense_query)
     expense_data = expense_result.first()
@@ -84,31 +78,21 @@ async def get_summary_by_category(
     start_date: Optional[date] = Query(None, description="Filter from date (YYYY-MM-DD)"),
     end_date: Optional[date] = Query(None, description="Filter until date (YYYY-MM-DD)"),
     current_user: User = Depends(get_current_active_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get expense breakdown by category for the authenticated user"""
-    # Build base filters including user_id
-    base_filters = [Transaction.user_id == current_user.id]
-    
-    # Add date filters if provided
-    if start_date:
-        base_filters.append(Transaction.date >= start_date)
-    
-    if end_date:
-        end_date_plus_one = datetime.combine(end_date, datetime.max.time())
-        base_filters.append(Transaction.date <= end_date_plus_one)
-    
-    query = select(
+    user_id = current_user.id
+    query = add_date_range(lambda_stmt(lambda: select(
         Transaction.category,
         func.sum(Transaction.amount).label("total_amount"),
         func.count(Transaction.id).label("transaction_count")
     ).where(
-        and_(Transaction.type == "expense", *base_filters)
+        Transaction.type == "expense", Transaction.user_id == user_id
     ).group_by(
         Transaction.category
     ).order_by(
         func.sum(Transaction.amount).desc()
-    )
+    )), start_date, end_date)
     
     result = await db.execute(query)
     categories = []
@@ -127,44 +111,35 @@ async def get_summary_by_day(
     start_date: Optional[date] = Query(None, description="Filter from date (YYYY-MM-DD)"),
     end_date: Optional[date] = Query(None, description="Filter until date (YYYY-MM-DD)"),
     current_user: User = Depends(get_current_active_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get totals grouped by date for the authenticated user"""
-    # Build base filters including user_id
-    base_filters = [Transaction.user_id == current_user.id]
-    
-    # Add date filters if provided
-    if start_date:
-        base_filters.append(Transaction.date >= start_date)
-    
-    if end_date:
-        end_date_plus_one = datetime.combine(end_date, datetime.max.time())
-        base_filters.append(Transaction.date <= end_date_plus_one)
+    user_id = current_user.id
     
     # Get daily income
-    income_query = select(
+    income_query = add_date_range(lambda_stmt(lambda: select(
         func.date(Transaction.date).label("date"),
         func.sum(Transaction.amount).label("total_income"),
         func.count(Transaction.id).label("income_count")
     ).where(
-        and_(Transaction.type == "income", *base_filters)
+        Transaction.type == "income", Transaction.user_id == user_id
     ).group_by(
         func.date(Transaction.date)
-    )
+    )), start_date, end_date)
     
     income_result = await db.execute(income_query)
     income_by_date = {row.date: {"income": row.total_income, "income_count": row.income_count} for row in income_result}
     
     # Get daily expenses
-    expense_query = select(
+    expense_query = add_date_range(lambda_stmt(lambda: select(
         func.date(Transaction.date).label("date"),
         func.sum(Transaction.amount).label("total_expenses"),
         func.count(Transaction.id).label("expense_count")
     ).where(
-        and_(Transaction.type == "expense", *base_filters)
+        Transaction.type == "expense", Transaction.user_id == user_id
     ).group_by(
         func.date(Transaction.date)
-    )
+    )), start_date, end_date)
     
     expense_result = await db.execute(expense_query)
     expense_by_date = {row.date: {"expenses": row.total_expenses, "expense_count": row.expense_count} for row in expense_result}
@@ -7,10 +7,10 @@ from datetime import datetime, date
 from pydantic import BaseModel, Field
 import uuid
 
-from data.database import get_db
+from data.database import get_db, get_read_db
 from models import Transaction, User, UserProfile, UserStats, Account
 from auth.security import get_current_active_user
-from utils.filters import apply_transaction_filters
+from utils.filters import transaction_list_statement
 from utils.gamification import update_user_stats
 
 router = APIRouter(prefix="/transactions", tags=["transactions"])
@@ -163,14 +163,11 @@ async def get_transactions(
     end_date: Optional[date] = Query(None, description="Filter until date (YYYY-MM-DD)"),
     search: Optional[str] = Query(None, description="Search in description and category"),
     current_user: User = Depends(get_current_active_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get all transactions for the current user with optional filtering"""
-    query = select(Transaction).where(Transaction.user_id == current_user.id).order_by(Transaction.date.desc())
-    
-    # Apply filters
-    query = apply_transaction_filters(
-        query,
+    query = transaction_list_statement(
+        current_user.id,
         transaction_type=type,
         category=category,
         start_date=start_date,
@@ -7,6 +7,7 @@ import uuid
 import json
 import os
 import shutil
+import asyncio
 
 from data.database import get_db
 from models import User, UserProfile
@@ -18,6 +19,24 @@ router = APIRouter(prefix="/user-profile", tags=["user-profile"])
 UPLOAD_DIRECTORY = "./uploads/avatars"
 os.makedirs(UPLOAD_DIRECTORY, exist_ok=True)
 
+# File system calls block the event loop, so the helpers below run in a worker thread
+async def get_photo_url(user_id) -> Optional[str]:
+    """URL of the user's uploaded photo, if there is one"""
+    exists = await asyncio.to_thread(os.path.exists, f"{UPLOAD_DIRECTORY}/{user_id}.jpg")
+    return f"/uploads/avatars/{user_id}.jpg" if exists else None
+
+def _save_file(source, file_path: str) -> None:
+    with open(file_path, "wb") as buffer:
+        shutil.copyfileobj(source, buffer)
+
+def _remove_files(file_paths: List[str]) -> bool:
+    removed = False
+    for file_path in file_paths:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+            removed = True
+    return removed
+
 class UserProfileCreate(BaseModel):
     monthly_income: float = Field(..., gt=0, description="Monthly income in currency units", example=5000.0)
     weekly_hours: int = Field(..., gt=0, le=168, description="Weekly working hours (1-168)", example=40)
@@ -177,7 +196,7 @@ async def update_user_profile(
     await db.refresh(profile)
 
     profile_data = {c.name: getattr(profile, c.name) for c in profile.__table__.columns}
-    profile_data['profile_photo_url'] = f"/uploads/avatars/{profile.user_id}.jpg" if os.path.exists(f"{UPLOAD_DIRECTORY}/{profile.user_id}.jpg") else None
+    profile_data['profile_photo_url'] = await get_photo_url(profile.user_id)
     profile_data['user'] = {
         'email': current_user.email,
         'username': current_user.username,
@@ -208,7 +227,7 @@ async def get_user_profile(
     profile_data = {c.name: getattr(profile, c.name) for c in profile.__table__.columns}
     
     # Добавляем URL фото профиля
-    profile_data['profile_photo_url'] = f"/uploads/avatars/{profile.user_id}.jpg" if os.path.exists(f"{UPLOAD_DIRECTORY}/{profile.user_id}.jpg") else None
+    profile_data['profile_photo_url'] = await get_photo_url(profile.user_id)
 
     # Добавляем данные пользователя
     profile_data['user'] = {
@@ -269,8 +288,7 @@ async def upload_profile_photo(
     file_extension = ".jpg" if file.content_type == "image/jpeg" else ".png"
     file_path = os.path.join(UPLOAD_DIRECTORY, f"{profile.user_id}{file_extension}")
     
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    await asyncio.to_thread(_save_file, file.file, file_path)
 
     # Обновляем URL в базе (опционально, если храним)
     # setattr(profile, 'profile_photo_url', file_path) # Пример
@@ -302,12 +320,9 @@ async def delete_profile_photo(
         raise HTTPException(status_code=404, detail="Профиль не найден.")
 
     # Удаляем оба возможных файла (jpg и png)
-    removed = False
-    for ext in [".jpg", ".png"]:
-        file_path = os.path.join(UPLOAD_DIRECTORY, f"{profile.user_id}{ext}")
-        if os.path.exists(file_path):
-            os.remove(file_path)
-            removed = True
+    removed = await asyncio.to_thread(
+        _remove_files, [os.path.join(UPLOAD_DIRECTORY, f"{profile.user_id}{ext}") for ext in [".jpg", ".png"]]
+    )
     if not removed:
         # Если файлов не было, не считаем это ошибкой
         pass
@@ -9,6 +9,7 @@ import uuid
 from data.database import get_db
 from models import Transaction, User
 from utils.filters import get_summary_filters
+from utils.spending import find_most_active_month
 from auth.security import get_current_active_user
 
 router = APIRouter(prefix="/users", tags=["users"])
@@ -261,23 +262,7 @@ async def get_user_stats(
     all_transactions_result = await db.execute(all_transactions_query)
     all_transactions = all_transactions_result.scalars().all()
     
-    most_active_month = None
-    if all_transactions:
-        # Group transactions by month manually
-        month_counts = {}
-        for transaction_date in all_transactions:
-            month_key = transaction_date.strftime("%Y-%m")
-            month_counts[month_key] = month_counts.get(month_key, 0) + 1
-        
-        # Find the month with the most transactions
-        if month_counts:
-            most_active_month_key = max(month_counts, key=month_counts.get)
-            # Convert to readable format
-            try:
-                month_date = datetime.strptime(most_active_month_key, "%Y-%m")
-                most_active_month = month_date.strftime("%B %Y")
-            except ValueError:
-                most_active_month = None
+    most_active_month = find_most_active_month(all_transactions)
     
     # Calculate average transaction amount
     avg_query = select(func.avg(Transaction.amount)).where(*base_filters)
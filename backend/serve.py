@@ -0,0 +1,204 @@
+"""
+Production launcher: several uvicorn worker processes behind one socket.
+
+    python serve.py
+    python serve.py --workers 4 --port 8000
+
+The supervisor binds the listening socket once and starts the workers,
+which share it and let the kernel spread connections between them. Each
+worker runs the app on uvloop and httptools with its own event loop,
+connection pool and in-process state. The supervisor:
+
+- restarts workers that exit. A worker leaves on its own after
+  MAX_REQUESTS requests plus a random jitter, so slow growth (fragmented
+  heap, caches) is reset regularly and workers do not all recycle at once;
+- on SIGTERM or SIGINT, stops every worker gracefully. A worker stops
+  accepting, lets in-flight requests and coach streams finish for up to
+  GRACEFUL_TIMEOUT seconds (see utils.drain), then runs the lifespan
+  shutdown. Workers still alive after that are killed;
+- exits if a worker fails to boot (import error, database unreachable,
+  schema check), since restarting it would fail the same way.
+
+Per-worker state
+----------------
+Nothing in memory is shared between workers. Everything below is per
+process and starts empty whenever a worker is recycled:
+
+- metrics (utils.metrics): samples carry a worker label;
+- read-your-writes marks (data.replicas): a read served by another worker
+  right after a write may still go to a replica, bounded by
+  REPLICA_MAX_LAG_SECONDS. That bound holds because cached endpoints
+  (analytics, categories) fill their cache from the primary, never from
+  a replica. Replica health is also checked per worker;
+- slow-query log (data.slow_queries) and recent-request ring buffer
+  (utils.request_timing), so /api/diagnostics shows the worker that
+  answered;
+- stored profiles and the profiling rate limit (utils.profiler);
+- the coach circuit breaker (services.circuit_breaker), which opens per
+  worker;
+- the load monitor (utils.load_shedding): each worker sheds requests
+  based on its own event-loop lag and pool wait;
+- the loop watchdog (utils.loop_watchdog) and its recent stalls;
+- connection hold times per route and the connections checked out
+  right now (data.connection_lifetimes);
+- memory tracing and its baseline (utils.memory_profiler): start, diff
+  and stop it on the same worker;
+- SQLAlchemy's compiled-statement cache and asyncpg's prepared statements;
+- the application caches (data.cache), unless CACHE_URL points them at a
+  shared Redis. Left in memory, a write only reaches the other workers'
+  entries when their TTL runs out.
+
+State that must be consistent across workers lives in PostgreSQL or in
+the shared cache, which fans invalidations out over pub/sub. Coach
+insight cards are stored in the database. Every worker wakes for the
+nightly batch; an advisory lock keeps the runs from overlapping, and a
+run skips users whose card was generated since the scheduled hour, so
+later workers find nothing left to do. Every worker opens its own
+pool, so the server may hold workers x (pool_size + max_overflow)
+connections (data.engine_profiles). Keep that below max_connections.
+"""
+import os
+import sys
+import time
+import random
+import signal
+import logging
+import argparse
+import threading
+import multiprocessing
+from typing import Dict, Any, List, Optional
+
+import uvicorn
+
+logger = logging.getLogger("uvicorn.error")
+
+def _default_workers() -> int:
+    # Respects CPU affinity and cpusets, unlike os.cpu_count()
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+# Worker processes; defaults to the CPU cores this process may run on
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY") or 0) or _default_workers()
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+# Recycle a worker after this many requests (0 disables), plus up to the jitter
+MAX_REQUESTS = int(os.getenv("MAX_REQUESTS", "10000"))
+MAX_REQUESTS_JITTER = int(os.getenv("MAX_REQUESTS_JITTER", "1000"))
+# How long a stopping worker may take to finish in-flight requests and streams
+GRACEFUL_TIMEOUT = float(os.getenv("GRACEFUL_TIMEOUT", "60"))
+
+# Exit code of a worker that never finished starting up
+WORKER_BOOT_ERROR = 3
+HANDLED_SIGNALS = (signal.SIGINT, signal.SIGTERM)
+
+_spawn = multiprocessing.get_context("spawn")
+
+class DrainingServer(uvicorn.Server):
+    """uvicorn server that tells the app it is draining before waiting for open requests"""
+
+    async def shutdown(self, sockets=None) -> None:
+        # Imported here: the app's modules must only load in the worker, after WORKER_ID is set
+        from utils.drain import begin_drain
+
+        begin_drain(self.config.timeout_graceful_shutdown)
+        await super().shutdown(sockets=sockets)
+
+def run_worker(index: int, options: Dict[str, Any], sockets: List, max_requests: Optional[int]) -> None:
+    """Worker process entry point"""
+    os.environ["WORKER_ID"] = str(index)
+    config = uvicorn.Config(
+        options["app"],
+        loop="uvloop",
+        http="httptools",
+        lifespan="on",
+        limit_max_requests=max_requests,
+        timeout_graceful_shutdown=options["graceful_timeout"],
+    )
+    server = DrainingServer(config)
+    try:
+        server.run(sockets=sockets)
+    except SystemExit:
+        # uvicorn exits this way when the app fails to import
+        pass
+    if not server.started:
+        sys.exit(WORKER_BOOT_ERROR)
+
+class Supervisor:
+    """Keeps `workers` worker processes running until told to stop"""
+
+    def __init__(self, options: Dict[str, Any]):
+        self.options = options
+        self.processes: Dict[int, multiprocessing.process.BaseProcess] = {}
+        self.should_exit = threading.Event()
+        self.exit_code = 0
+        self.sockets: List = []
+
+    def handle_exit(self, sig, frame) -> None:
+        self.should_exit.set()
+
+    def spawn(self, index: int) -> None:
+        max_requests = None
+        if self.options["max_requests"]:
+            max_requests = self.options["max_requests"] + random.randint(0, self.options["max_requests_jitter"])
+        process = _spawn.Process(
+            target=run_worker, args=(index, self.options, self.sockets, max_requests), name=f"worker-{index}"
+        )
+        process.start()
+        self.processes[index] = process
+        logger.info(f"Started worker {index} [{process.pid}], recycled after {max_requests or 'no limit'} requests")
+
+    def run(self) -> int:
+        # Only used to bind the shared socket; workers build their own config
+        config = uvicorn.Config(self.options["app"], host=self.options["host"], port=self.options["port"])
+        self.sockets = [config.bind_socket()]
+        for sig in HANDLED_SIGNALS:
+            signal.signal(sig, self.handle_exit)
+
+        logger.info(f"Starting {self.options['workers']} workers [supervisor {os.getpid()}]")
+        for index in range(self.options["workers"]):
+            self.spawn(index)
+
+        while not self.should_exit.wait(0.5):
+            for index, process in list(self.processes.items()):
+                if process.is_alive():
+                    continue
+                if process.exitcode == WORKER_BOOT_ERROR:
+                    logger.error(f"Worker {index} [{process.pid}] failed to boot, shutting down")
+                    self.exit_code = WORKER_BOOT_ERROR
+                    self.should_exit.set()
+                    break
+                logger.info(f"Worker {index} [{process.pid}] exited with code {process.exitcode}, restarting")
+                self.spawn(index)
+
+        self.shutdown()
+        return self.exit_code
+
+    def shutdown(self) -> None:
+        logger.info(f"Stopping workers, waiting up to {self.options['graceful_timeout']:g}s for open requests")
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+        # A little over the workers' own timeout, for the lifespan shutdown
+        deadline = time.monotonic() + self.options["graceful_timeout"] + 5
+        for process in self.processes.values():
+            process.join(max(deadline - time.monotonic(), 0))
+        for index, process in self.processes.items():
+            if process.is_alive():
+                logger.warning(f"Worker {index} [{process.pid}] did not stop in time, killing it")
+                process.kill()
+                process.join()
+        for sock in self.sockets:
+            sock.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the API with several worker processes")
+    parser.add_argument("--app", default="main:app")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY)
+    parser.add_argument("--max-requests", type=int, default=MAX_REQUESTS, help="Recycle a worker after this many requests, 0 = never")
+    parser.add_argument("--max-requests-jitter", type=int, default=MAX_REQUESTS_JITTER)
+    parser.add_argument("--graceful-timeout", type=float, default=GRACEFUL_TIMEOUT)
+    sys.exit(Supervisor(vars(parser.parse_args())).run())
@@ -1,10 +1,25 @@
 import os
-from typing import List, Dict, Any, AsyncGenerator
-from openai import AsyncOpenAI
-import httpx
+import json
+import time
+import asyncio
+import logging
+from typing import List, Dict, Any, AsyncGenerator, Optional, Callable, Awaitable
+
+from services.circuit_breaker import coach_breaker
+from services.local_coach import build_local_advice
+from services.coach_tools import COACH_TOOLS
+from utils.metrics import COACH_STREAM_DURATION, COACH_FIRST_TOKEN, COACH_TOKENS
+
+logger = logging.getLogger(__name__)
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o")
+# Hard limit for the provider to start streaming before we fall back
+COACH_FIRST_TOKEN_TIMEOUT = float(os.getenv("COACH_FIRST_TOKEN_TIMEOUT", "15"))
+# How many rounds of tool calls the model may make before it must answer
+COACH_MAX_TOOL_ROUNDS = int(os.getenv("COACH_MAX_TOOL_ROUNDS", "3"))
+
+FALLBACK_NOTICE = "_ИИ-коуч сейчас перегружен, поэтому ниже — быстрый разбор по твоим данным._\n\n"
 
 SYSTEM_PROMPT = (
     "Ты — BaiAI, твой личный финансовый коуч из Казахстана. Ты анализируешь данные пользователя и даешь КОНКРЕТНЫЕ, персонализированные советы.\n\n"
@@ -15,7 +30,8 @@ SYSTEM_PROMPT = (
     "4. **Адаптируй под Казахстан** — учитывай местные цены, банки, финансовые продукты, налоги\n"
     "5. **Используй данные** — анализируй паттерны трат, сравнивай с целями, находи аномалии\n"
     "6. **Форматируй ответы** — используй Markdown для структурирования (списки, заголовки, выделения)\n"
-    "7. **Не повторяй приветствия** — начинай сразу с анализа или совета\n\n"
+    "7. **Не повторяй приветствия** — начинай сразу с анализа или совета\n"
+    "8. **Запрашивай данные инструментами** — в контексте только сводка за месяц; суммы по категориям, бюджеты, цели, историю и сравнение по месяцам получай через доступные функции\n\n"
     "Примеры хороших ответов:\n"
     "- 'Алия, анализируя твои траты за месяц, вижу что на кафе уходит 45,000₸. Это 15% от дохода. Предлагаю сократить до 30,000₸ и сэкономить 15,000₸ на цель \"Отпуск\"'\n"
     "- 'Руслан, твоя цель на машину — 2,000,000₸. При текущем темпе накоплений (50,000₸/мес) достигнешь через 40 месяцев. Увеличь до 80,000₸/мес — достигнешь за 25 месяцев'\n"
@@ -23,41 +39,256 @@ SYSTEM_PROMPT = (
     "Всегда анализируй контекст и давай конкретные, измеримые рекомендации."
 )
 
-# ✅ create OpenAI async client (fixes 'proxies' error)
-client = AsyncOpenAI(
-    api_key=OPENAI_API_KEY,
-    http_client=httpx.AsyncClient()
+SUMMARY_PROMPT = (
+    "Ты ведёшь память финансового коуча BaiAI. Сожми диалог в краткое резюме на русском: "
+    "факты о пользователе, названные суммы и цели, данные советы и договорённости, открытые вопросы. "
+    "Дополни предыдущее резюме, не теряя из него важного. Не более 150 слов, без приветствий."
+)
+
+INSIGHT_PROMPT = (
+    "На чём мне сосредоточиться на этой неделе? Дай карточку из 2–3 пунктов с конкретными суммами, "
+    "не более 80 слов, без приветствия."
 )
 
-def build_user_context(user: Dict[str, Any], transactions: List[Dict[str, Any]], goals: List[Dict[str, Any]]) -> str:
-    context = f"User: {user.get('username', 'Unknown')}\n"
-    context += f"Goals: {goals}\n"
-    context += f"Recent transactions: {transactions}\n"
+# OpenAI async client, created on first use by get_client
+client = None
+
+def get_client():
+    """The shared OpenAI client; openai and httpx are only imported when the coach is first used"""
+    global client
+    if client is None:
+        from openai import AsyncOpenAI
+        import httpx
+
+        # ✅ explicit httpx client (fixes 'proxies' error)
+        client = AsyncOpenAI(
+            api_key=OPENAI_API_KEY,
+            http_client=httpx.AsyncClient()
+        )
+    return client
+
+ToolRunner = Callable[[str, str], Awaitable[str]]
+
+def _money(amount: float) -> str:
+    return f"{amount:,.0f}₸"
+
+def build_user_context(user: Dict[str, Any], snapshot: Dict[str, Any]) -> str:
+    """Compact context: who the user is and this month's headline numbers"""
+    name = user.get("name") or user.get("username", "Unknown")
+    context = f"User: {name}"
+    if user.get("age"):
+        context += f", age {user['age']}"
+    context += "\n"
+
+    context += f"This month: income {_money(snapshot.get('month_income', 0.0))}, expenses {_money(snapshot.get('month_expenses', 0.0))}\n"
+    categories = snapshot.get("categories") or []
+    if categories:
+        top = ", ".join(f"{c['category']} {_money(c['amount'])}" for c in categories[:5])
+        context += f"Top categories this month: {top}\n"
+
+    over_budget = [b["category"] for b in snapshot.get("budgets") or [] if b["spent"] > b["amount"]]
+    context += f"Active budgets: {len(snapshot.get('budgets') or [])}"
+    if over_budget:
+        context += f" (over budget: {', '.join(over_budget)})"
+    context += "\n"
+
+    goals = snapshot.get("goals") or []
+    if goals:
+        context += "Active goals: " + ", ".join(
+            f"{g['name']} {_money(g['current_amount'])}/{_money(g['target_amount'])}" for g in goals
+        ) + "\n"
     return context
 
-async def get_financial_advice(user: Dict[str, Any], message: str, transactions: List[Dict[str, Any]], goals: List[Dict[str, Any]]) -> AsyncGenerator[str, None]:
-    if not OPENAI_API_KEY:
-        yield "Извините, ИИ-сервис временно недоступен. Пожалуйста, попробуйте позже или обратитесь в службу поддержки."
-        return
+async def _local_advice(user: Dict[str, Any], snapshot: Optional[Dict[str, Any]]) -> AsyncGenerator[str, None]:
+    yield FALLBACK_NOTICE + build_local_advice(user, snapshot or {})
+
+async def _run_tool(run_tool: Callable[[str, str], Awaitable[str]], call: Dict[str, str]) -> str:
+    """Result of one tool call for the model; a failing tool is reported to it, not to the circuit breaker"""
+    try:
+        return await run_tool(call["name"], call["arguments"])
+    except Exception as e:
+        logger.warning(f"Coach tool {call['name']} failed: {e!r}")
+        return json.dumps({"error": "the tool could not be run, answer without it"})
 
+async def _complete(messages: List[Dict[str, str]], max_tokens: int, temperature: float) -> Optional[str]:
+    """Non-streaming completion behind the circuit breaker; None when the provider is unavailable"""
+    if not OPENAI_API_KEY or not coach_breaker.allow_request():
+        return None
+
+    started = time.monotonic()
     try:
-        user_context = build_user_context(user, transactions, goals)
-        stream = await client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": user_context},
-                {"role": "user", "content": message}
-            ],
-            stream=True,
-            temperature=0.7,
-            max_tokens=1000
+        completion = await asyncio.wait_for(
+            get_client().chat.completions.create(
+                model=OPENAI_MODEL,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens
+            ),
+            timeout=COACH_FIRST_TOKEN_TIMEOUT
         )
-        
-        async for chunk in stream:
-            if chunk.choices[0].delta.content:
-                yield chunk.choices[0].delta.content
-            
+    except asyncio.CancelledError:
+        coach_breaker.record_cancelled()
+        raise
+    except Exception as e:
+        logger.warning(f"LLM provider call failed: {e!r}")
+        coach_breaker.record_failure()
+        return None
+
+    coach_breaker.record_success(time.monotonic() - started)
+    if completion.usage:
+        COACH_TOKENS.labels("prompt").inc(completion.usage.prompt_tokens)
+        COACH_TOKENS.labels("completion").inc(completion.usage.completion_tokens)
+    return completion.choices[0].message.content
+
+async def summarize_conversation(previous_summary: Optional[str], turns: List[Dict[str, str]]) -> Optional[str]:
+    """Fold older turns into the running summary; None when the provider is unavailable"""
+    transcript = "\n".join(f"{turn['role']}: {turn['content']}" for turn in turns)
+    return await _complete(
+        [
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": f"Предыдущее резюме:\n{previous_summary or '—'}\n\nНовые реплики:\n{transcript}"}
+        ],
+        max_tokens=400,
+        temperature=0.2
+    )
+
+async def generate_insight(user: Dict[str, Any], snapshot: Dict[str, Any]) -> Optional[str]:
+    """Short weekly focus card for the dashboard; None when the provider is unavailable"""
+    return await _complete(
+        [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": build_user_context(user, snapshot)},
+            {"role": "user", "content": INSIGHT_PROMPT}
+        ],
+        max_tokens=300,
+        temperature=0.5
+    )
+
+async def get_financial_advice(
+    user: Dict[str, Any],
+    message: str,
+    snapshot: Dict[str, Any],
+    run_tool: Optional[ToolRunner] = None,
+    history: Optional[List[Dict[str, str]]] = None
+) -> AsyncGenerator[str, None]:
+    if not OPENAI_API_KEY or not coach_breaker.allow_request():
+        local_started = time.monotonic()
+        async for part in _local_advice(user, snapshot):
+            yield part
+        COACH_STREAM_DURATION.labels("local").observe(time.monotonic() - local_started)
+        return
+
+    messages: List[Dict[str, Any]] = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": build_user_context(user, snapshot)},
+        *(history or []),
+        {"role": "user", "content": message}
+    ]
+
+    started = time.monotonic()
+    first_chunk_latency = None
+    streamed_text = False
+    outcome_recorded = False
+    outcome = "cancelled"
+    try:
+        for tool_round in range(COACH_MAX_TOOL_ROUNDS + 1):
+            request = {
+                "model": OPENAI_MODEL,
+                "messages": messages,
+                "stream": True,
+                # The last chunk then carries token usage for the whole round
+                "stream_options": {"include_usage": True},
+                "temperature": 0.7,
+                "max_tokens": 1000
+            }
+            if run_tool is not None and tool_round < COACH_MAX_TOOL_ROUNDS:
+                request["tools"] = COACH_TOOLS
+                request["tool_choice"] = "auto"
+
+            round_started = time.monotonic()
+            stream = await asyncio.wait_for(
+                get_client().chat.completions.create(**request),
+                timeout=COACH_FIRST_TOKEN_TIMEOUT
+            )
+
+            tool_calls: Dict[int, Dict[str, str]] = {}
+            chunks = stream.__aiter__()
+            round_first_chunk = True
+            try:
+                while True:
+                    try:
+                        if round_first_chunk:
+                            remaining = COACH_FIRST_TOKEN_TIMEOUT - (time.monotonic() - round_started)
+                            chunk = await asyncio.wait_for(chunks.__anext__(), timeout=max(remaining, 0.001))
+                        else:
+                            chunk = await chunks.__anext__()
+                    except StopAsyncIteration:
+                        break
+                    round_first_chunk = False
+                    if first_chunk_latency is None:
+                        first_chunk_latency = time.monotonic() - started
+                        COACH_FIRST_TOKEN.observe(first_chunk_latency)
+                    if chunk.usage:
+                        COACH_TOKENS.labels("prompt").inc(chunk.usage.prompt_tokens)
+                        COACH_TOKENS.labels("completion").inc(chunk.usage.completion_tokens)
+                    if not chunk.choices:
+                        continue
+
+                    delta = chunk.choices[0].delta
+                    if delta.content:
+                        streamed_text = True
+                        yield delta.content
+                    # Tool call arguments arrive in fragments keyed by index
+                    for call in delta.tool_calls or []:
+                        entry = tool_calls.setdefault(call.index, {"id": "", "name": "", "arguments": ""})
+                        if call.id:
+                            entry["id"] = call.id
+                        if call.function and call.function.name:
+                            entry["name"] += call.function.name
+                        if call.function and call.function.arguments:
+                            entry["arguments"] += call.function.arguments
+            finally:
+                # Closing the HTTP response stops generation upstream when the client has gone
+                response = getattr(stream, "response", None)
+                if response is not None:
+                    await response.aclose()
+
+            if not tool_calls:
+                break
+
+            ordered = [tool_calls[index] for index in sorted(tool_calls)]
+            messages.append({
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [
+                    {"id": c["id"], "type": "function", "function": {"name": c["name"], "arguments": c["arguments"]}}
+                    for c in ordered
+                ]
+            })
+            for call in ordered:
+                messages.append({
+                    "role": "tool",
+                    "tool_call_id": call["id"],
+                    "content": await _run_tool(run_tool, call)
+                })
+
+        outcome_recorded = True
+        outcome = "llm"
+        coach_breaker.record_success(first_chunk_latency if first_chunk_latency is not None else time.monotonic() - started)
+
     except Exception as e:
-        error_msg = f"Ошибка при получении совета: {str(e)}"
-        yield error_msg
+        logger.warning(f"LLM provider call failed: {e!r}")
+        outcome_recorded = True
+        outcome = "fallback"
+        coach_breaker.record_failure()
+        if streamed_text:
+            # Часть ответа уже отправлена — дополняем её локальным разбором
+            yield "\n\n---\n\n"
+        async for part in _local_advice(user, snapshot):
+            yield part
+
+    finally:
+        COACH_STREAM_DURATION.labels(outcome).observe(time.monotonic() - started)
+        if not outcome_recorded:
+            # Client went away mid-stream: the call proved nothing either way
+            coach_breaker.record_cancelled()
@@ -0,0 +1,116 @@
+import os
+import time
+import logging
+from collections import deque
+from typing import Dict, Any
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """
+    Rolling-window circuit breaker for calls to an external provider.
+
+    A call counts as failed when it raises or when its latency exceeds
+    `latency_threshold`. Once the failure ratio over the last `window_size`
+    calls reaches `failure_ratio` the breaker opens and rejects calls for
+    `recovery_timeout` seconds, then lets a single probe call through.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_ratio: float = 0.5,
+        min_calls: int = 4,
+        window_size: int = 20,
+        latency_threshold: float = 8.0,
+        recovery_timeout: float = 30.0
+    ):
+        self.name = name
+        self.failure_ratio = failure_ratio
+        self.min_calls = min_calls
+        self.latency_threshold = latency_threshold
+        self.recovery_timeout = recovery_timeout
+        self._outcomes = deque(maxlen=window_size)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.rejected_calls = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def allow_request(self) -> bool:
+        """Return True if a call may be sent to the provider right now"""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        self.rejected_calls += 1
+        return False
+
+    def record_success(self, latency: float) -> None:
+        """Record a finished call; slow calls count as failures"""
+        if latency > self.latency_threshold:
+            logger.warning(f"{self.name}: slow provider call ({latency:.2f}s)")
+            self.record_failure()
+            return
+
+        if self._state == HALF_OPEN:
+            logger.info(f"{self.name}: probe succeeded, closing circuit")
+            self._outcomes.clear()
+            self._state = CLOSED
+            self._probe_in_flight = False
+        self._outcomes.append(False)
+
+    def record_failure(self) -> None:
+        """Record a failed call and open the circuit if the threshold is reached"""
+        if self._state == HALF_OPEN:
+            self._open()
+            return
+
+        self._outcomes.append(True)
+        if len(self._outcomes) >= self.min_calls:
+            failures = sum(self._outcomes)
+            if failures / len(self._outcomes) >= self.failure_ratio:
+                self._open()
+
+    def record_cancelled(self) -> None:
+        """Forget a call that was abandoned before it finished"""
+        if self._state == HALF_OPEN:
+            self._probe_in_flight = False
+
+    def _open(self) -> None:
+        logger.warning(f"{self.name}: opening circuit for {self.recovery_timeout:.0f}s")
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current breaker state for diagnostics"""
+        return {
+            "name": self.name,
+            "state": self.state,
+            "window_calls": len(self._outcomes),
+            "window_failures": sum(self._outcomes),
+            "rejected_calls": self.rejected_calls
+        }
+
+# Breaker shared by every call to the LLM provider in this worker process
+coach_breaker = CircuitBreaker(
+    "llm-provider",
+    failure_ratio=float(os.getenv("COACH_BREAKER_FAILURE_RATIO", "0.5")),
+    min_calls=int(os.getenv("COACH_BREAKER_MIN_CALLS", "4")),
+    window_size=int(os.getenv("COACH_BREAKER_WINDOW", "20")),
+    latency_threshold=float(os.getenv("COACH_BREAKER_LATENCY_THRESHOLD", "8")),
+    recovery_timeout=float(os.getenv("COACH_BREAKER_RECOVERY_TIMEOUT", "30"))
+)
@@ -0,0 +1,152 @@
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, exists, text
+
+from data.database import AsyncSessionLocal, engine
+from models import User, Transaction, CoachInsight
+from services.ai_coach import generate_insight
+from services.financial_snapshot import load_financial_snapshot
+from services.local_coach import build_local_advice
+
+logger = logging.getLogger(__name__)
+
+# How long a pre-generated card is served before it counts as stale
+COACH_INSIGHTS_TTL_HOURS = int(os.getenv("COACH_INSIGHTS_TTL_HOURS", "30"))
+# Parallel provider calls during the batch run
+COACH_INSIGHTS_CONCURRENCY = int(os.getenv("COACH_INSIGHTS_CONCURRENCY", "4"))
+# Local hour at which the nightly batch starts
+COACH_INSIGHTS_HOUR = int(os.getenv("COACH_INSIGHTS_HOUR", "3"))
+# Users without transactions in this many days are skipped
+COACH_INSIGHTS_ACTIVE_DAYS = int(os.getenv("COACH_INSIGHTS_ACTIVE_DAYS", "30"))
+# Disable when the batch is run from an external cron instead
+COACH_INSIGHTS_SCHEDULER = os.getenv("COACH_INSIGHTS_SCHEDULER", "true").lower() == "true"
+
+# Advisory lock key so batches of different workers do not overlap
+_BATCH_LOCK_KEY = 730_301
+
+def _user_context(username: str, snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    profile = snapshot["profile"]
+    return {"username": username, "name": profile["name"], "age": profile["age"]}
+
+async def build_insight(snapshot: Dict[str, Any], user_id, username: str, use_llm: bool = True) -> CoachInsight:
+    """Generate (but do not store) an insight card for one user from their financial snapshot"""
+    user = _user_context(username, snapshot)
+
+    content = await generate_insight(user, snapshot) if use_llm else None
+    source = "llm"
+    if content is None:
+        content = build_local_advice(user, snapshot)
+        source = "local"
+
+    now = datetime.now(timezone.utc)
+    return CoachInsight(
+        user_id=user_id,
+        content=content,
+        source=source,
+        generated_at=now,
+        valid_until=now + timedelta(hours=COACH_INSIGHTS_TTL_HOURS)
+    )
+
+async def get_valid_insight(db: AsyncSession, user_id) -> Optional[CoachInsight]:
+    """Latest insight for the user that is still inside its validity window"""
+    query = select(CoachInsight).where(
+        CoachInsight.user_id == user_id,
+        CoachInsight.valid_until > datetime.now(timezone.utc)
+    ).order_by(CoachInsight.generated_at.desc()).limit(1)
+    result = await db.execute(query)
+    return result.scalar_one_or_none()
+
+async def _refresh_user(user_id, username: str, semaphore: asyncio.Semaphore, stats: Dict[str, int]) -> None:
+    async with semaphore:
+        try:
+            # No session is open during the provider call, so the batch holds no
+            # pooled connections while it waits on the LLM
+            async with AsyncSessionLocal() as db:
+                snapshot = await load_financial_snapshot(db, user_id)
+            insight = await build_insight(snapshot, user_id, username)
+            async with AsyncSessionLocal() as db:
+                # Keep one card per user: the new one replaces the old ones
+                await db.execute(delete(CoachInsight).where(CoachInsight.user_id == user_id))
+                db.add(insight)
+                await db.commit()
+            stats[insight.source] += 1
+        except Exception as e:
+            logger.warning(f"Insight generation failed for user {user_id}: {e!r}")
+            stats["failed"] += 1
+
+def _last_scheduled_run(now: datetime) -> datetime:
+    """Most recent COACH_INSIGHTS_HOUR, local time, at or before now"""
+    last_run = now.replace(hour=COACH_INSIGHTS_HOUR, minute=0, second=0, microsecond=0)
+    if last_run > now:
+        last_run -= timedelta(days=1)
+    return last_run
+
+async def generate_insights_batch(concurrency: int = COACH_INSIGHTS_CONCURRENCY) -> Dict[str, int]:
+    """Pre-generate insight cards for every recently active user without one since the last scheduled run"""
+    stats = {"llm": 0, "local": 0, "failed": 0, "skipped": 0, "up_to_date": 0}
+
+    async with engine.connect() as lock_conn:
+        locked = await lock_conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": _BATCH_LOCK_KEY})
+        if not locked:
+            logger.info("Insight batch already running elsewhere, skipping")
+            stats["skipped"] = 1
+            return stats
+
+        try:
+            # The lock only keeps batches from overlapping. Every worker wakes at
+            # COACH_INSIGHTS_HOUR, and one whose timer fires after the first batch
+            # finished must not run it again: users whose card was generated since
+            # the scheduled run are done.
+            run_since = _last_scheduled_run(datetime.now().astimezone())
+            active_since = datetime.now(timezone.utc) - timedelta(days=COACH_INSIGHTS_ACTIVE_DAYS)
+            users_query = select(
+                User.id,
+                User.username,
+                exists().where(
+                    CoachInsight.user_id == User.id,
+                    CoachInsight.generated_at >= run_since
+                ).label("up_to_date")
+            ).where(
+                User.is_active == True,
+                exists().where(
+                    Transaction.user_id == User.id,
+                    Transaction.date >= active_since
+                )
+            )
+            async with AsyncSessionLocal() as db:
+                users = (await db.execute(users_query)).all()
+            stats["up_to_date"] = sum(1 for row in users if row.up_to_date)
+
+            semaphore = asyncio.Semaphore(concurrency)
+            await asyncio.gather(*(
+                _refresh_user(row.id, row.username, semaphore, stats) for row in users if not row.up_to_date
+            ))
+        finally:
+            await lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _BATCH_LOCK_KEY})
+
+    logger.info(f"Insight batch finished: {stats}")
+    return stats
+
+def _seconds_until_next_run(now: datetime) -> float:
+    next_run = now.replace(hour=COACH_INSIGHTS_HOUR, minute=0, second=0, microsecond=0)
+    if next_run <= now:
+        next_run += timedelta(days=1)
+    return (next_run - now).total_seconds()
+
+async def run_insights_scheduler() -> None:
+    """Background loop that runs the batch once a night"""
+    while True:
+        await asyncio.sleep(_seconds_until_next_run(datetime.now()))
+        try:
+            await generate_insights_batch()
+        except Exception as e:
+            logger.error(f"Insight batch failed: {e!r}")
+
+if __name__ == "__main__":
+    # Allows running the batch from cron: python -m services.coach_insights
+    logging.basicConfig(level=logging.INFO)
+    print(asyncio.run(generate_insights_batch()))
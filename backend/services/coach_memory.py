@@ -0,0 +1,154 @@
+import os
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, func
+
+from data.database import AsyncSessionLocal
+from models import CoachConversation, CoachMessage
+from services.ai_coach import summarize_conversation
+
+logger = logging.getLogger(__name__)
+
+# Number of most recent turns (user + assistant pairs) kept verbatim in the prompt
+COACH_MEMORY_TURNS = int(os.getenv("COACH_MEMORY_TURNS", "6"))
+# Older messages are only folded into the summary once this many have piled up
+COACH_SUMMARY_BATCH = int(os.getenv("COACH_SUMMARY_BATCH", "4"))
+# Upper bound for the running summary when it has to be built locally
+MAX_LOCAL_SUMMARY_CHARS = 2000
+
+_compacting: Set = set()
+_background_tasks: Set[asyncio.Task] = set()
+
+async def get_conversation(db: AsyncSession, conversation_id, user_id) -> Optional[CoachConversation]:
+    """Conversation owned by the user, or None"""
+    query = select(CoachConversation).where(
+        CoachConversation.id == conversation_id,
+        CoachConversation.user_id == user_id
+    )
+    result = await db.execute(query)
+    return result.scalar_one_or_none()
+
+async def load_memory(db: AsyncSession, conversation: CoachConversation) -> List[Dict[str, str]]:
+    """Prompt messages for a conversation: running summary plus the last N turns"""
+    recent_query = select(
+        CoachMessage.role,
+        CoachMessage.content
+    ).where(
+        CoachMessage.conversation_id == conversation.id,
+        CoachMessage.is_summarized == False
+    ).order_by(
+        CoachMessage.created_at.desc()
+    ).limit(COACH_MEMORY_TURNS * 2)
+    recent_result = await db.execute(recent_query)
+    recent = [{"role": row.role, "content": row.content} for row in recent_result]
+    recent.reverse()
+
+    memory = []
+    if conversation.summary:
+        memory.append({"role": "system", "content": f"Краткое содержание предыдущего разговора:\n{conversation.summary}"})
+    return memory + recent
+
+def _local_summary(previous_summary: Optional[str], turns: List[Dict[str, str]]) -> str:
+    """Bounded extractive summary used while the LLM provider is unavailable"""
+    lines = [previous_summary] if previous_summary else []
+    for turn in turns:
+        content = " ".join(turn["content"].split())
+        lines.append(f"{turn['role']}: {content[:200]}")
+    summary = "\n".join(lines)
+    return summary[-MAX_LOCAL_SUMMARY_CHARS:]
+
+async def compact_conversation(conversation_id) -> None:
+    """Fold turns older than the verbatim window into the running summary"""
+    if conversation_id in _compacting:
+        return
+    _compacting.add(conversation_id)
+    try:
+        # The summary is written by the LLM, so the rows are read and written in two
+        # short sessions and no connection is held while the provider answers
+        async with AsyncSessionLocal() as db:
+            conversation = await db.get(CoachConversation, conversation_id)
+            if not conversation:
+                return
+            previous_summary = conversation.summary
+
+            pending_query = select(
+                CoachMessage.id,
+                CoachMessage.role,
+                CoachMessage.content
+            ).where(
+                CoachMessage.conversation_id == conversation_id,
+                CoachMessage.is_summarized == False
+            ).order_by(CoachMessage.created_at)
+            pending = (await db.execute(pending_query)).all()
+
+        keep = COACH_MEMORY_TURNS * 2
+        if len(pending) < keep + COACH_SUMMARY_BATCH:
+            return
+
+        older = pending[:-keep]
+        turns = [{"role": row.role, "content": row.content} for row in older]
+        summary = await summarize_conversation(previous_summary, turns)
+        if summary is None:
+            summary = _local_summary(previous_summary, turns)
+
+        async with AsyncSessionLocal() as db:
+            # Apply only if nothing changed in between: the conversation still has the
+            # summary we extended and none of the folded messages went away or were folded
+            marked = await db.execute(
+                update(CoachMessage)
+                .where(
+                    CoachMessage.id.in_([row.id for row in older]),
+                    CoachMessage.is_summarized == False
+                )
+                .values(is_summarized=True)
+            )
+            updated = await db.execute(
+                update(CoachConversation)
+                .where(
+                    CoachConversation.id == conversation_id,
+                    CoachConversation.summary.is_not_distinct_from(previous_summary)
+                )
+                .values(summary=summary)
+            )
+            if marked.rowcount != len(older) or updated.rowcount != 1:
+                await db.rollback()
+                logger.info(f"Conversation {conversation_id} changed while it was summarized, skipping")
+                return
+            await db.commit()
+    except Exception as e:
+        logger.warning(f"Compacting conversation {conversation_id} failed: {e!r}")
+    finally:
+        _compacting.discard(conversation_id)
+
+def schedule_compaction(conversation_id) -> None:
+    """Run compaction in the background without holding up the response"""
+    task = asyncio.create_task(compact_conversation(conversation_id))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+async def save_reply(conversation_id, question: str, asked_at: datetime, content: str) -> None:
+    """Store a completed turn, question and reply together, and compact the conversation if it grew too long
+
+    A question is only stored once it has an answer, so turns cut short by a
+    provider error or a disconnect never reach the memory or the summary.
+    """
+    async with AsyncSessionLocal() as db:
+        # Both rows are inserted in one transaction, where now() is the same for
+        # each; explicit timestamps keep the question ordered before the reply
+        db.add(CoachMessage(conversation_id=conversation_id, role="user", content=question, created_at=asked_at))
+        db.add(CoachMessage(
+            conversation_id=conversation_id,
+            role="assistant",
+            content=content,
+            created_at=datetime.now(timezone.utc)
+        ))
+        await db.execute(
+            update(CoachConversation)
+            .where(CoachConversation.id == conversation_id)
+            .values(updated_at=func.now())
+        )
+        await db.commit()
+    schedule_compaction(conversation_id)
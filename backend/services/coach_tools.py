@@ -0,0 +1,171 @@
+import json
+import logging
+from datetime import date
+from typing import Dict, Any, List, Optional
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import Transaction, User
+from routes import analytics
+from services.dashboard_snapshot import query_budget_overview, query_goal_overview
+
+logger = logging.getLogger(__name__)
+
+MAX_RECENT_TRANSACTIONS = 20
+
+_DATE_RANGE = {
+    "start_date": {"type": "string", "description": "Start of the period, YYYY-MM-DD (optional)"},
+    "end_date": {"type": "string", "description": "End of the period, YYYY-MM-DD (optional)"}
+}
+
+# Read-only tools exposed to the model through function calling
+COACH_TOOLS: List[Dict[str, Any]] = [
+    {
+        "type": "function",
+        "function": {
+            "name": "get_category_totals",
+            "description": "Expense totals, counts and share of total per category for a period. Without dates covers the whole history.",
+            "parameters": {"type": "object", "properties": _DATE_RANGE}
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_spending_trends",
+            "description": "Total expenses grouped by day, week, month or year.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "period": {"type": "string", "enum": ["daily", "weekly", "monthly", "yearly"]},
+                    **_DATE_RANGE
+                },
+                "required": ["period"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_monthly_comparison",
+            "description": "Income, expenses, net balance and savings rate for each month of a year.",
+            "parameters": {
+                "type": "object",
+                "properties": {"year": {"type": "integer"}},
+                "required": ["year"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_financial_health",
+            "description": "Savings rate, expense-to-income ratio, largest and most frequent category, average daily spending and volatility.",
+            "parameters": {"type": "object", "properties": _DATE_RANGE}
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_budget_status",
+            "description": "Every active budget with spent and remaining amount and whether it is over budget.",
+            "parameters": {"type": "object", "properties": {}}
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_goal_projection",
+            "description": "Every active goal with progress, remaining amount, days left and estimated completion date.",
+            "parameters": {"type": "object", "properties": {}}
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_recent_transactions",
+            "description": f"Latest transactions, newest first (at most {MAX_RECENT_TRANSACTIONS}).",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "limit": {"type": "integer"},
+                    "category": {"type": "string"}
+                }
+            }
+        }
+    }
+]
+
+def _parse_date(value: Optional[str]) -> Optional[date]:
+    return date.fromisoformat(value) if value else None
+
+async def _recent_transactions(db: AsyncSession, user: User, limit: int, category: Optional[str]):
+    query = select(
+        Transaction.date,
+        Transaction.amount,
+        Transaction.type,
+        Transaction.category,
+        Transaction.description
+    ).where(Transaction.user_id == user.id)
+    if category:
+        query = query.where(Transaction.category == category)
+    query = query.order_by(Transaction.date.desc()).limit(limit)
+
+    result = await db.execute(query)
+    return [dict(row._mapping) for row in result]
+
+async def execute_tool(name: str, arguments: Dict[str, Any], db: AsyncSession, user: User) -> Any:
+    """Run a coach tool by reusing the analytics handlers and the dashboard snapshot queries"""
+    if name == "get_category_totals":
+        return await analytics.get_category_insights(
+            start_date=_parse_date(arguments.get("start_date")),
+            end_date=_parse_date(arguments.get("end_date")),
+            current_user=user,
+            db=db
+        )
+    if name == "get_spending_trends":
+        return await analytics.get_spending_trends(
+            period=arguments.get("period", "monthly"),
+            start_date=_parse_date(arguments.get("start_date")),
+            end_date=_parse_date(arguments.get("end_date")),
+            current_user=user,
+            db=db
+        )
+    if name == "get_monthly_comparison":
+        return await analytics.get_monthly_comparison(
+            year=int(arguments.get("year") or date.today().year),
+            current_user=user,
+            db=db
+        )
+    if name == "get_financial_health":
+        return await analytics.get_financial_health(
+            start_date=_parse_date(arguments.get("start_date")),
+            end_date=_parse_date(arguments.get("end_date")),
+            current_user=user,
+            db=db
+        )
+    if name == "get_budget_status":
+        return await query_budget_overview(db, user.id)
+    if name == "get_goal_projection":
+        return await query_goal_overview(db, user.id)
+    if name == "get_recent_transactions":
+        limit = min(int(arguments.get("limit") or 10), MAX_RECENT_TRANSACTIONS)
+        return await _recent_transactions(db, user, limit, arguments.get("category"))
+    raise ValueError(f"Unknown tool: {name}")
+
+async def run_tool_call(name: str, raw_arguments: str, db: AsyncSession, user: User) -> str:
+    """Execute a tool call from the model and return its JSON result"""
+    try:
+        arguments = json.loads(raw_arguments) if raw_arguments else {}
+        result = await execute_tool(name, arguments, db, user)
+        return json.dumps(jsonable_encoder(result), ensure_ascii=False)
+    except SQLAlchemyError as e:
+        # Keep the session usable for the next tool call
+        await db.rollback()
+        logger.warning(f"Coach tool {name} failed: {e!r}")
+        return json.dumps({"error": "query failed"})
+    except Exception as e:
+        # The model gets the error back and can retry with other arguments
+        logger.warning(f"Coach tool {name} failed: {e!r}")
+        return json.dumps({"error": str(getattr(e, "detail", e))}, ensure_ascii=False)
@@ -0,0 +1,283 @@
+"""
+Precomputed dashboard payload, served stale-while-revalidate.
+
+One snapshot per user holds everything the first screen after login
+needs: the dashboard summary and the budget and goal overviews. The
+three endpoints serve their part of it, so a warm dashboard costs one
+cache read.
+
+- Login schedules a build in the background, so the snapshot is usually
+  ready by the time the client asks for it.
+- A snapshot younger than DASHBOARD_FRESH_SECONDS is served as is. Up to
+  DASHBOARD_MAX_STALENESS it is still served, and a rebuild starts in
+  the background. Older snapshots expire, and the next request builds
+  one inline.
+- A committed change to the user's transactions, budgets or goals
+  invalidates the snapshot (data.cache), so nobody is served data from
+  before their own write. The worker that committed starts the rebuild
+  right away. A request that arrives meanwhile waits for that build
+  rather than starting its own. Builds are shared per snapshot version,
+  so a build that started before the write is never joined after it.
+
+Background builds read from the primary and at most
+DASHBOARD_REFRESH_CONCURRENCY of them run at a time, so a burst of
+logins cannot take over the connection pool.
+"""
+import os
+import time
+import uuid
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Set
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, and_
+
+from data.cache import Cache, CACHE_ENABLED
+from data.database import AsyncSessionLocal
+from models import Transaction, Budget, Goal
+from services.financial_snapshot import budget_spend_subquery, budget_period_end
+from utils.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Served without a rebuild while younger than this
+DASHBOARD_FRESH_SECONDS = float(os.getenv("DASHBOARD_FRESH_SECONDS", "30"))
+# Served while a rebuild runs in the background until this old, then built inline
+DASHBOARD_MAX_STALENESS = float(os.getenv("DASHBOARD_MAX_STALENESS", "300"))
+# Background builds running at the same time, per worker process
+DASHBOARD_REFRESH_CONCURRENCY = int(os.getenv("DASHBOARD_REFRESH_CONCURRENCY", "4"))
+
+dashboard_cache = Cache("dashboard", ttl=DASHBOARD_MAX_STALENESS)
+for source in (Transaction, Budget, Goal):
+    dashboard_cache.invalidated_by(source, lambda instance: instance.user_id)
+
+# Background and inline builds for the same user and snapshot version share one run
+_builds = SingleFlight("dashboard_snapshot")
+_refresh_slots = asyncio.Semaphore(DASHBOARD_REFRESH_CONCURRENCY)
+# Users with a background build waiting for a slot
+_queued: Set[str] = set()
+_background_tasks: Set[asyncio.Task] = set()
+
+def _columns(instance) -> Dict[str, Any]:
+    return {column.key: getattr(instance, column.key) for column in instance.__table__.columns}
+
+async def query_dashboard(db: AsyncSession, user_id) -> Dict[str, Any]:
+    """Current month totals, top spending categories and recent transactions"""
+    now = datetime.now()
+    start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    # Get monthly summary
+    monthly_income_query = select(func.sum(Transaction.amount)).where(
+        and_(
+            Transaction.user_id == user_id,
+            Transaction.type == "income",
+            Transaction.date >= start_of_month
+        )
+    )
+    monthly_expense_query = select(func.sum(Transaction.amount)).where(
+        and_(
+            Transaction.user_id == user_id,
+            Transaction.type == "expense",
+            Transaction.date >= start_of_month
+        )
+    )
+
+    monthly_income_result = await db.execute(monthly_income_query)
+    monthly_expense_result = await db.execute(monthly_expense_query)
+
+    monthly_income = monthly_income_result.scalar() or 0.0
+    monthly_expenses = monthly_expense_result.scalar() or 0.0
+
+    # Get top spending categories this month
+    top_categories_query = select(
+        Transaction.category,
+        func.sum(Transaction.amount).label("total")
+    ).where(
+        and_(
+            Transaction.user_id == user_id,
+            Transaction.type == "expense",
+            Transaction.date >= start_of_month
+        )
+    ).group_by(
+        Transaction.category
+    ).order_by(
+        func.sum(Transaction.amount).desc()
+    ).limit(5)
+
+    top_categories_result = await db.execute(top_categories_query)
+    top_categories = [
+        {"category": row.category, "amount": row.total}
+        for row in top_categories_result
+    ]
+
+    # Get recent transactions
+    recent_transactions_query = select(Transaction).where(
+        Transaction.user_id == user_id
+    ).order_by(
+        Transaction.date.desc()
+    ).limit(10)
+
+    recent_result = await db.execute(recent_transactions_query)
+    recent_transactions = []
+
+    for transaction in recent_result.scalars().all():
+        recent_transactions.append({
+            "id": str(transaction.id),
+            "amount": transaction.amount,
+            "type": transaction.type,
+            "category": transaction.category,
+            "description": transaction.description,
+            "date": transaction.date.isoformat()
+        })
+
+    return {
+        "user_id": str(user_id),
+        "current_month": {
+            "income": monthly_income,
+            "expenses": monthly_expenses,
+            "net_balance": monthly_income - monthly_expenses,
+            "savings_rate": ((monthly_income - monthly_expenses) / monthly_income) * 100 if monthly_income > 0 else 0
+        },
+        "top_spending_categories": top_categories,
+        "recent_transactions": recent_transactions,
+        "last_updated": now.isoformat()
+    }
+
+async def query_budget_overview(db: AsyncSession, user_id) -> List[Dict[str, Any]]:
+    """Spending against each active budget, shaped like BudgetStatus"""
+    # Active budgets with the amount spent within each one's period, in one statement
+    spent = budget_spend_subquery(user_id)
+    budgets_query = select(Budget, spent.c.spent).join(spent, spent.c.budget_id == Budget.id)
+    budgets_result = await db.execute(budgets_query)
+
+    budget_statuses = []
+    now = datetime.now()
+    for budget, spent_amount in budgets_result:
+        # Calculate status for each budget
+        end_date = budget_period_end(budget.start_date, budget.period)
+
+        remaining_amount = budget.amount - spent_amount
+        percentage_used = (spent_amount / budget.amount) * 100 if budget.amount > 0 else 0
+        is_over_budget = spent_amount > budget.amount
+
+        days_remaining = None
+        if end_date > now:
+            days_remaining = (end_date - now).days
+
+        budget_statuses.append({
+            "budget": _columns(budget),
+            "spent_amount": spent_amount,
+            "remaining_amount": remaining_amount,
+            "percentage_used": percentage_used,
+            "is_over_budget": is_over_budget,
+            "days_remaining": days_remaining
+        })
+
+    return budget_statuses
+
+async def query_goal_overview(db: AsyncSession, user_id) -> List[Dict[str, Any]]:
+    """Progress of each active goal, shaped like GoalProgress"""
+    # Get all active goals for the user
+    goals_query = select(Goal).where(
+        and_(Goal.user_id == user_id, Goal.is_active == True)
+    )
+    goals_result = await db.execute(goals_query)
+    goals = goals_result.scalars().all()
+
+    goal_progresses = []
+    for goal in goals:
+        # Calculate progress for each goal
+        progress_percentage = (goal.current_amount / goal.target_amount) * 100 if goal.target_amount > 0 else 0
+        remaining_amount = goal.target_amount - goal.current_amount
+        is_completed = goal.current_amount >= goal.target_amount
+        is_overdue = False
+        days_remaining = None
+        estimated_completion_date = None
+
+        if goal.target_date:
+            now = datetime.now()
+            days_remaining = (goal.target_date - now).days
+            is_overdue = days_remaining < 0 and not is_completed
+
+        if not is_completed and goal.current_amount > 0:
+            days_since_creation = (datetime.now() - goal.created_at).days
+            if days_since_creation > 0:
+                daily_rate = goal.current_amount / days_since_creation
+                if daily_rate > 0:
+                    days_to_complete = remaining_amount / daily_rate
+                    estimated_completion_date = datetime.now() + timedelta(days=days_to_complete)
+
+        goal_progresses.append({
+            "goal": _columns(goal),
+            "progress_percentage": progress_percentage,
+            "remaining_amount": remaining_amount,
+            "days_remaining": days_remaining,
+            "is_completed": is_completed,
+            "is_overdue": is_overdue,
+            "estimated_completion_date": estimated_completion_date
+        })
+
+    return goal_progresses
+
+async def query_dashboard_snapshot(user_id) -> Dict[str, Any]:
+    async with AsyncSessionLocal() as db:
+        return {
+            "built_at": time.time(),
+            "dashboard": await query_dashboard(db, user_id),
+            "budgets": await query_budget_overview(db, user_id),
+            "goals": await query_goal_overview(db, user_id),
+        }
+
+async def build_dashboard_snapshot(user_id) -> Dict[str, Any]:
+    """Build and store the user's snapshot, or wait for the build already running"""
+    key = (str(user_id), await dashboard_cache.version(user_id))
+    return await _builds.do(
+        key, lambda: dashboard_cache.refresh(user_id, "snapshot", lambda: query_dashboard_snapshot(user_id))
+    )
+
+def _is_fresh(snapshot: Dict[str, Any]) -> bool:
+    return time.time() - snapshot["built_at"] <= DASHBOARD_FRESH_SECONDS
+
+async def load_dashboard_snapshot(user_id) -> Dict[str, Any]:
+    """The user's snapshot: cached if recent enough, rebuilt in the background when getting old"""
+    snapshot = await dashboard_cache.get(user_id, "snapshot")
+    if snapshot is None:
+        return await build_dashboard_snapshot(user_id)
+    if not _is_fresh(snapshot):
+        schedule_refresh(user_id)
+    return snapshot
+
+async def _refresh(user_id) -> None:
+    try:
+        async with _refresh_slots:
+            # From here on a write needs a build of its own, this one may read from before it
+            _queued.discard(str(user_id))
+            # A request may have built it while this one waited for a slot
+            snapshot = await dashboard_cache.get(user_id, "snapshot")
+            if snapshot is None or not _is_fresh(snapshot):
+                await build_dashboard_snapshot(user_id)
+    except Exception as e:
+        logger.warning(f"Refreshing the dashboard snapshot of {user_id} failed: {e!r}")
+
+def schedule_refresh(user_id) -> None:
+    """Rebuild the user's snapshot in the background without holding up the response"""
+    # With the cache off every request builds its own; nothing to prepare
+    if not CACHE_ENABLED or str(user_id) in _queued:
+        return
+    _queued.add(str(user_id))
+    task = asyncio.create_task(_refresh(user_id))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+async def warm_dashboard_snapshot(user_id) -> None:
+    """Start building the snapshot of a user who just logged in, unless a fresh one exists"""
+    snapshot = await dashboard_cache.get(user_id, "snapshot")
+    if snapshot is None or not _is_fresh(snapshot):
+        schedule_refresh(user_id)
+
+def _rebuild_after_write(scope: str) -> None:
+    schedule_refresh(uuid.UUID(scope))
+
+# Writes drop the snapshot; start the rebuild right away
+dashboard_cache.on_invalidate(_rebuild_after_write)
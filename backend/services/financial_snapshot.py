@@ -0,0 +1,144 @@
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Any
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, and_, case
+
+from data.cache import Cache
+from models import Transaction, Budget, Goal, UserProfile
+
+# Snapshots are cached per user until one of their sources changes
+COACH_SNAPSHOT_CACHE_TTL = float(os.getenv("COACH_SNAPSHOT_CACHE_TTL", "300"))
+snapshot_cache = Cache("coach_snapshot", ttl=COACH_SNAPSHOT_CACHE_TTL)
+for source in (Transaction, Budget, Goal, UserProfile):
+    snapshot_cache.invalidated_by(source, lambda instance: instance.user_id)
+
+# Length of each budget period; routes.budgets accepts only these
+BUDGET_PERIOD_DAYS = {"weekly": 7, "monthly": 30, "yearly": 365}
+
+def budget_period_end(start_date: datetime, period: str) -> datetime:
+    """Last moment a budget that started at start_date counts spending"""
+    return start_date + timedelta(days=BUDGET_PERIOD_DAYS.get(period, 30))
+
+def budget_spend_subquery(user_id):
+    """(budget_id, spent) for each active budget of a user, spent being its expenses within the period"""
+    period_days = case(BUDGET_PERIOD_DAYS, value=Budget.period, else_=30)
+    return select(
+        Budget.id.label("budget_id"),
+        func.coalesce(func.sum(Transaction.amount), 0.0).label("spent")
+    ).select_from(Budget).outerjoin(
+        Transaction,
+        and_(
+            Transaction.user_id == Budget.user_id,
+            Transaction.category == Budget.category,
+            Transaction.type == "expense",
+            Transaction.date >= Budget.start_date,
+            Transaction.date <= Budget.start_date + func.make_interval(0, 0, 0, period_days)
+        )
+    ).where(
+        and_(Budget.user_id == user_id, Budget.is_active == True)
+    ).group_by(Budget.id).subquery()
+
+async def load_financial_snapshot(db: AsyncSession, user_id) -> Dict[str, Any]:
+    """Compact per-user aggregates used by the coach, from the cache when possible"""
+    return await snapshot_cache.get_or_load(user_id, "snapshot", lambda: query_financial_snapshot(db, user_id))
+
+async def query_financial_snapshot(db: AsyncSession, user_id) -> Dict[str, Any]:
+    """
+    Load the compact per-user aggregates used by the coach.
+
+    Everything is aggregated in the database, so the snapshot stays a few
+    hundred bytes no matter how long the user's history is.
+    """
+    now = datetime.now()
+    start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    # Профиль: имя, возраст и заявленный доход
+    profile_query = select(
+        UserProfile.name,
+        UserProfile.age,
+        UserProfile.monthly_income
+    ).where(UserProfile.user_id == user_id)
+    profile_result = await db.execute(profile_query)
+    profile_row = profile_result.first()
+
+    # Доходы и расходы за текущий месяц
+    totals_query = select(
+        Transaction.type,
+        func.sum(Transaction.amount).label("total")
+    ).where(
+        and_(Transaction.user_id == user_id, Transaction.date >= start_of_month)
+    ).group_by(Transaction.type)
+    totals_result = await db.execute(totals_query)
+    totals = {row.type: row.total or 0.0 for row in totals_result}
+
+    # Расходы по категориям за текущий месяц
+    categories_query = select(
+        Transaction.category,
+        func.sum(Transaction.amount).label("total")
+    ).where(
+        and_(
+            Transaction.user_id == user_id,
+            Transaction.type == "expense",
+            Transaction.date >= start_of_month
+        )
+    ).group_by(
+        Transaction.category
+    ).order_by(
+        func.sum(Transaction.amount).desc()
+    )
+    categories_result = await db.execute(categories_query)
+    categories = [
+        {"category": row.category, "amount": row.total}
+        for row in categories_result
+    ]
+
+    # Active budgets with the amount spent in their period, in one query
+    spent = budget_spend_subquery(user_id)
+    budgets_query = select(
+        Budget.category,
+        Budget.amount,
+        Budget.period,
+        spent.c.spent
+    ).join(spent, spent.c.budget_id == Budget.id)
+    budgets_result = await db.execute(budgets_query)
+    budgets = [
+        {"category": row.category, "amount": row.amount, "period": row.period, "spent": row.spent}
+        for row in budgets_result
+    ]
+
+    # Активные цели
+    goals_query = select(
+        Goal.name,
+        Goal.target_amount,
+        Goal.current_amount,
+        Goal.target_date,
+        Goal.created_at
+    ).where(
+        and_(Goal.user_id == user_id, Goal.is_active == True)
+    )
+    goals_result = await db.execute(goals_query)
+    goals = [
+        {
+            "name": row.name,
+            "target_amount": row.target_amount,
+            "current_amount": row.current_amount,
+            "target_date": row.target_date,
+            "created_at": row.created_at
+        }
+        for row in goals_result
+    ]
+
+    return {
+        "profile": {
+            "name": profile_row.name if profile_row else None,
+            "age": profile_row.age if profile_row else None,
+            "monthly_income": profile_row.monthly_income if profile_row else None
+        },
+        "month_income": totals.get("income", 0.0),
+        "month_expenses": totals.get("expense", 0.0),
+        "categories": categories,
+        "budgets": budgets,
+        "goals": goals,
+        "generated_at": now
+    }
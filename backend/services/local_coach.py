@@ -0,0 +1,124 @@
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+# Rule thresholds for the local advice engine
+TARGET_SAVINGS_RATE = 20.0
+LOW_SAVINGS_RATE = 10.0
+BUDGET_WARNING_RATIO = 0.8
+DOMINANT_CATEGORY_SHARE = 30.0
+CATEGORY_CUT_SHARE = 0.15
+
+def _money(amount: float) -> str:
+    return f"{amount:,.0f}₸"
+
+def _naive(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None:
+        return None
+    return value.replace(tzinfo=None) if value.tzinfo else value
+
+def _months_between(start: datetime, end: datetime) -> float:
+    return (end - start).days / 30.0
+
+def _savings_section(snapshot: Dict[str, Any]) -> List[str]:
+    income = snapshot.get("month_income") or 0.0
+    if income <= 0:
+        income = (snapshot.get("profile") or {}).get("monthly_income") or 0.0
+    expenses = snapshot.get("month_expenses") or 0.0
+
+    if income <= 0:
+        if expenses > 0:
+            return [f"- В этом месяце расходы составили {_money(expenses)}, а доходы не внесены. Добавь доходы, чтобы я мог посчитать норму сбережений."]
+        return ["- Пока нет данных о доходах и расходах за этот месяц. Начни вносить транзакции — и я покажу, куда уходят деньги."]
+
+    savings_rate = (income - expenses) / income * 100
+    if savings_rate < 0:
+        return [f"- **Расходы превышают доходы** на {_money(expenses - income)} ({abs(savings_rate):.0f}% дохода). Первым делом останови перерасход: отложи необязательные покупки до конца месяца."]
+    if savings_rate < LOW_SAVINGS_RATE:
+        gap = income * TARGET_SAVINGS_RATE / 100 - (income - expenses)
+        return [f"- Норма сбережений — {savings_rate:.0f}%. Цель — {TARGET_SAVINGS_RATE:.0f}%: для этого нужно сократить расходы примерно на {_money(gap)} в месяц."]
+    if savings_rate < TARGET_SAVINGS_RATE:
+        return [f"- Норма сбережений — {savings_rate:.0f}%, неплохо. Ещё {_money(income * TARGET_SAVINGS_RATE / 100 - (income - expenses))} в месяц — и выйдешь на {TARGET_SAVINGS_RATE:.0f}%."]
+    return [f"- Отличная норма сбережений — {savings_rate:.0f}% ({_money(income - expenses)} в этом месяце). Направь излишек на самую важную цель."]
+
+def _budget_section(snapshot: Dict[str, Any]) -> List[str]:
+    lines = []
+    budgets = sorted(
+        snapshot.get("budgets") or [],
+        key=lambda b: (b["spent"] / b["amount"]) if b["amount"] > 0 else 0,
+        reverse=True
+    )
+    for budget in budgets:
+        if budget["amount"] <= 0:
+            continue
+        ratio = budget["spent"] / budget["amount"]
+        if ratio > 1:
+            lines.append(f"- **{budget['category']}**: бюджет превышен на {_money(budget['spent'] - budget['amount'])} ({ratio * 100:.0f}% от {_money(budget['amount'])}).")
+        elif ratio >= BUDGET_WARNING_RATIO:
+            lines.append(f"- **{budget['category']}**: израсходовано {ratio * 100:.0f}% бюджета, осталось {_money(budget['amount'] - budget['spent'])}.")
+    return lines
+
+def _category_section(snapshot: Dict[str, Any]) -> List[str]:
+    categories = snapshot.get("categories") or []
+    expenses = snapshot.get("month_expenses") or 0.0
+    if not categories or expenses <= 0:
+        return []
+
+    top = categories[0]
+    share = top["amount"] / expenses * 100
+    if share < DOMINANT_CATEGORY_SHARE:
+        return []
+    cut = top["amount"] * CATEGORY_CUT_SHARE
+    return [f"- На «{top['category']}» уходит {_money(top['amount'])} — {share:.0f}% всех расходов. Сокращение на {CATEGORY_CUT_SHARE * 100:.0f}% сэкономит {_money(cut)} в месяц."]
+
+def _goal_section(snapshot: Dict[str, Any], now: datetime) -> List[str]:
+    lines = []
+    for goal in snapshot.get("goals") or []:
+        remaining = goal["target_amount"] - goal["current_amount"]
+        if remaining <= 0:
+            lines.append(f"- Цель «{goal['name']}» достигнута 🎉 Можно поставить следующую.")
+            continue
+
+        created_at = _naive(goal.get("created_at")) or now
+        months_active = max(_months_between(created_at, now), 1.0)
+        pace = goal["current_amount"] / months_active
+
+        target_date = _naive(goal.get("target_date"))
+        if target_date:
+            months_left = _months_between(now, target_date)
+            if months_left <= 0:
+                lines.append(f"- Срок цели «{goal['name']}» прошёл, осталось собрать {_money(remaining)}. Перенеси дату или увеличь взносы.")
+                continue
+            required = remaining / max(months_left, 1.0)
+            if pace >= required:
+                lines.append(f"- Цель «{goal['name']}» идёт по плану: нужно {_money(required)}/мес, текущий темп {_money(pace)}/мес.")
+            else:
+                lines.append(f"- Цель «{goal['name']}» отстаёт: нужно {_money(required)}/мес, а текущий темп {_money(pace)}/мес. Добавь {_money(required - pace)} в месяц.")
+        elif pace > 0:
+            lines.append(f"- При текущем темпе {_money(pace)}/мес цель «{goal['name']}» будет достигнута примерно через {remaining / pace:.0f} мес.")
+        else:
+            lines.append(f"- По цели «{goal['name']}» ещё нет взносов. Начни с автоматического перевода хотя бы {_money(remaining / 12)} в месяц.")
+    return lines
+
+def build_local_advice(user: Dict[str, Any], snapshot: Dict[str, Any]) -> str:
+    """
+    Build deterministic advice from the user's financial snapshot.
+
+    Used while the LLM provider is unavailable; runs purely in memory.
+    """
+    now = datetime.now()
+    name = user.get("name") or (snapshot.get("profile") or {}).get("name") or user.get("username")
+
+    sections = []
+    budget_lines = _budget_section(snapshot)
+    if budget_lines:
+        sections.append("### Бюджеты\n" + "\n".join(budget_lines))
+
+    spending_lines = _savings_section(snapshot) + _category_section(snapshot)
+    sections.append("### Расходы и сбережения\n" + "\n".join(spending_lines))
+
+    goal_lines = _goal_section(snapshot, now)
+    if goal_lines:
+        sections.append("### Цели\n" + "\n".join(goal_lines))
+
+    header = f"{name}, вот краткий разбор твоих финансов." if name else "Вот краткий разбор твоих финансов."
+    return header + "\n\n" + "\n\n".join(sections) + "\n"
@@ -0,0 +1,39 @@
+"""
+Graceful drain of long-lived responses.
+
+serve.py calls begin_drain() as soon as a worker starts shutting down,
+on SIGTERM or when it is recycled after its maximum request count.
+uvicorn then stops accepting connections and waits up to the graceful
+timeout for in-flight responses. Coach streams keep going and normally
+finish on their own; one still running DRAIN_STREAM_MARGIN seconds
+before the timeout is ended with an error event instead of being cut off
+mid-frame.
+"""
+import os
+import time
+import logging
+from typing import Optional
+
+from utils.metrics import SSE_STREAMS_ACTIVE
+
+logger = logging.getLogger(__name__)
+
+# Streams get this long before the hard shutdown to send their last event
+DRAIN_STREAM_MARGIN = float(os.getenv("DRAIN_STREAM_MARGIN", "5"))
+
+_stream_deadline: Optional[float] = None
+
+def begin_drain(timeout: float) -> None:
+    """Mark this worker as draining; streams must end within timeout seconds"""
+    global _stream_deadline
+    if _stream_deadline is not None:
+        return
+    _stream_deadline = time.monotonic() + max(timeout - DRAIN_STREAM_MARGIN, 0)
+    logger.info(f"Draining: {SSE_STREAMS_ACTIVE.labels().value:.0f} open streams get {max(timeout - DRAIN_STREAM_MARGIN, 0):g}s to finish")
+
+def is_draining() -> bool:
+    return _stream_deadline is not None
+
+def stream_deadline() -> Optional[float]:
+    """Monotonic time by which open streams must end, or None while not draining"""
+    return _stream_deadline
@@ -1,5 +1,6 @@
-from sqlalchemy import and_, or_, func
+from sqlalchemy import and_, or_, func, select, lambda_stmt
 from sqlalchemy.orm import Query
+from sqlalchemy.sql.lambdas import StatementLambdaElement
 from datetime import datetime, date
 from typing import Optional, List
 from models import Transaction
@@ -79,4 +80,63 @@ def get_summary_filters(
         end_date_plus_one = datetime.combine(end_date, datetime.max.time())
         filters.append(Transaction.date <= end_date_plus_one)
     
-    return filters 
\ No newline at end of file
+    return filters
+
+def add_date_range(
+    stmt: StatementLambdaElement,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+) -> StatementLambdaElement:
+    """
+    Append optional date filters to a lambda statement
+    
+    Each combination of present filters is compiled once and then served
+    from the statement cache; the dates themselves are bound parameters.
+    """
+    if start_date:
+        stmt += lambda s: s.where(Transaction.date >= start_date)
+    
+    if end_date:
+        end_date_plus_one = datetime.combine(end_date, datetime.max.time())
+        stmt += lambda s: s.where(Transaction.date <= end_date_plus_one)
+    
+    return stmt
+
+def transaction_list_statement(
+    user_id,
+    transaction_type: Optional[str] = None,
+    category: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    search_text: Optional[str] = None
+) -> StatementLambdaElement:
+    """
+    Cached form of the transaction list query, same filters as apply_transaction_filters
+    
+    Returns:
+        Lambda statement selecting the user's transactions, newest first
+    """
+    stmt = lambda_stmt(
+        lambda: select(Transaction).where(Transaction.user_id == user_id).order_by(Transaction.date.desc())
+    )
+    
+    if transaction_type:
+        if transaction_type.lower() not in ["income", "expense"]:
+            raise ValueError("Transaction type must be 'income' or 'expense'")
+        normalized_type = transaction_type.lower()
+        stmt += lambda s: s.where(Transaction.type == normalized_type)
+    
+    if category:
+        stmt += lambda s: s.where(Transaction.category == category)
+    
+    stmt = add_date_range(stmt, start_date, end_date)
+    
+    if search_text:
+        # Computed outside the lambda so it is tracked as a bound value
+        pattern = f"%{search_text}%"
+        stmt += lambda s: s.where(or_(
+            Transaction.description.ilike(pattern),
+            Transaction.category.ilike(pattern)
+        ))
+    
+    return stmt
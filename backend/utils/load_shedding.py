@@ -0,0 +1,143 @@
+"""
+Overload detection and load shedding.
+
+A worker is overloaded when its event loop falls behind or its requests
+queue for database connections. LoadMonitor measures both:
+
+- event-loop lag: a background task sleeps LOOP_LAG_INTERVAL at a time
+  and measures how late it wakes up, smoothed over recent samples;
+- pool wait: the average time checkouts from the connection pools
+  (data.pool_metrics) waited over the last LOAD_WINDOW seconds.
+
+While either exceeds its threshold, LoadSheddingMiddleware answers
+low-priority routes (analytics and coach by default) with an immediate
+503 and Retry-After. That leaves the loop and the connections to
+transaction writes, auth and the other routes, which are never shed.
+Shedding stops once both signals are below half their threshold, so it
+does not flap at the boundary.
+
+Each worker process decides on its own, from its own loop and pool (see
+serve.py). Current values are in /metrics (event_loop_lag_seconds,
+db_pool_wait_recent_seconds, load_shedding_active, requests_shed_total)
+and /api/diagnostics/load.
+"""
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from fastapi.responses import JSONResponse
+
+from utils.metrics import EVENT_LOOP_LAG, DB_POOL_WAIT_RECENT, LOAD_SHEDDING_ACTIVE, REQUESTS_SHED
+
+logger = logging.getLogger(__name__)
+
+# Kill switch; the monitor keeps measuring either way
+LOAD_SHEDDING = os.getenv("LOAD_SHEDDING", "true").lower() == "true"
+# Shed when the event loop runs this late (smoothed) ...
+SHED_LOOP_LAG_MS = float(os.getenv("SHED_LOOP_LAG_MS", "100"))
+# ... or checkouts waited this long on average over the window
+SHED_POOL_WAIT_MS = float(os.getenv("SHED_POOL_WAIT_MS", "250"))
+# Seconds shed clients are asked to wait
+SHED_RETRY_AFTER = int(os.getenv("SHED_RETRY_AFTER", "5"))
+# Path prefixes answered with 503 while overloaded
+LOW_PRIORITY_PREFIXES = tuple(
+    prefix.strip() for prefix in os.getenv("SHED_LOW_PRIORITY_PREFIXES", "/api/analytics,/api/coach").split(",") if prefix.strip()
+)
+
+LOOP_LAG_INTERVAL = 0.05
+# Weight of the newest loop-lag sample in the smoothed value
+LOOP_LAG_SMOOTHING = 0.3
+# Seconds of pool checkouts the average covers
+LOAD_WINDOW = 2.0
+
+class LoadMonitor:
+    """Event-loop lag and recent pool wait of this worker, and whether it is overloaded"""
+
+    def __init__(self):
+        self.loop_lag = 0.0
+        self.overloaded = False
+        self.overloaded_since: Optional[float] = None
+        # (monotonic time, seconds waited) per checkout within the window, and their sum
+        self._pool_waits: Deque[Tuple[float, float]] = deque()
+        self._pool_wait_total = 0.0
+
+    def record_pool_wait(self, seconds: float) -> None:
+        self._pool_waits.append((time.monotonic(), seconds))
+        self._pool_wait_total += seconds
+
+    def pool_wait(self) -> float:
+        """Average checkout wait over the last LOAD_WINDOW seconds"""
+        cutoff = time.monotonic() - LOAD_WINDOW
+        while self._pool_waits and self._pool_waits[0][0] < cutoff:
+            self._pool_wait_total -= self._pool_waits.popleft()[1]
+        if not self._pool_waits:
+            self._pool_wait_total = 0.0
+            return 0.0
+        return self._pool_wait_total / len(self._pool_waits)
+
+    def update(self) -> None:
+        lag_ms = self.loop_lag * 1000
+        wait_ms = self.pool_wait() * 1000
+        # Leave overload only well below the thresholds
+        factor = 0.5 if self.overloaded else 1.0
+        overloaded = lag_ms > SHED_LOOP_LAG_MS * factor or wait_ms > SHED_POOL_WAIT_MS * factor
+        if overloaded != self.overloaded:
+            if overloaded:
+                self.overloaded_since = time.time()
+                logger.warning(f"Overloaded (loop lag {lag_ms:.0f}ms, pool wait {wait_ms:.0f}ms), shedding {', '.join(LOW_PRIORITY_PREFIXES)}")
+            else:
+                logger.info(f"Load back to normal after {time.time() - self.overloaded_since:.1f}s")
+                self.overloaded_since = None
+            self.overloaded = overloaded
+        EVENT_LOOP_LAG.set(self.loop_lag)
+        DB_POOL_WAIT_RECENT.set(wait_ms / 1000)
+        LOAD_SHEDDING_ACTIVE.set(1 if self.overloaded and LOAD_SHEDDING else 0)
+
+    async def run(self) -> None:
+        """Background loop sampling the event-loop lag"""
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(LOOP_LAG_INTERVAL)
+            lag = max(time.perf_counter() - started - LOOP_LAG_INTERVAL, 0.0)
+            self.loop_lag += LOOP_LAG_SMOOTHING * (lag - self.loop_lag)
+            self.update()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "loop_lag_ms": round(self.loop_lag * 1000, 1),
+            "pool_wait_ms": round(self.pool_wait() * 1000, 1),
+            "overloaded": self.overloaded,
+            "overloaded_since": self.overloaded_since,
+            "shedding": LOAD_SHEDDING and self.overloaded,
+            "thresholds": {"loop_lag_ms": SHED_LOOP_LAG_MS, "pool_wait_ms": SHED_POOL_WAIT_MS},
+            "low_priority_prefixes": list(LOW_PRIORITY_PREFIXES),
+        }
+
+# Per worker process, like the other diagnostics (see serve.py)
+load_monitor = LoadMonitor()
+
+class LoadSheddingMiddleware:
+    """Answer low-priority routes with 503 and Retry-After while the worker is overloaded"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (LOAD_SHEDDING and load_monitor.overloaded):
+            await self.app(scope, receive, send)
+            return
+        prefix = next((p for p in LOW_PRIORITY_PREFIXES if scope["path"].startswith(p)), None)
+        if prefix is None:
+            await self.app(scope, receive, send)
+            return
+
+        REQUESTS_SHED.labels(prefix).inc()
+        response = JSONResponse(
+            {"detail": "The server is busy. Please try again shortly."},
+            status_code=503,
+            headers={"Retry-After": str(SHED_RETRY_AFTER)},
+        )
+        await response(scope, receive, send)
@@ -0,0 +1,172 @@
+"""
+Event-loop watchdog: finds code that blocks the loop.
+
+Everything in a worker shares one event loop, so a handler that does
+blocking work (bcrypt, file I/O, a long pure-Python computation) stalls
+every other request on the worker for that long. The continuous loop-lag
+measurement (utils.load_shedding) shows that this happens. The watchdog
+shows where:
+
+- a heartbeat task on the loop stamps the time every WATCHDOG_INTERVAL;
+- a daemon thread checks the stamp. Once it is older than
+  BLOCKING_THRESHOLD_MS, the loop is stuck in a single callback. The
+  thread then captures the loop thread's stack (sys._current_frames()),
+  which is the blocking code itself, and logs it;
+- when the loop is running again, the thread hands the stall, with its
+  duration and the application frame closest to the blocking call, to
+  the loop to be recorded. Metrics are only updated on the loop thread
+  (see utils.metrics); the thread itself only logs and writes the
+  report file.
+
+Stalls are counted in event_loop_blocks_total by that frame
+("routes/auth.py:142 in login"), with durations in
+event_loop_block_seconds. The most recent ones are listed at
+/api/diagnostics/blocking. With LOOP_WATCHDOG_REPORT set, every stall is
+also appended as a JSON line to that file, one per worker.
+benchmarks.blocking_check runs the load test against a server with this
+enabled and fails when new blocking sites show up.
+
+C code that holds the GIL while it blocks also keeps the watchdog thread
+from running. Such stalls are still measured, but their stack is
+captured only once the GIL is released, so it may point just past the
+culprit.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from utils.metrics import LOOP_BLOCKS, LOOP_BLOCK_DURATION
+
+logger = logging.getLogger(__name__)
+
+LOOP_WATCHDOG = os.getenv("LOOP_WATCHDOG", "true").lower() == "true"
+# A callback running longer than this counts as blocking
+BLOCKING_THRESHOLD_MS = float(os.getenv("BLOCKING_THRESHOLD_MS", "100"))
+# Append every stall as a JSON line to this file (used by benchmarks.blocking_check)
+LOOP_WATCHDOG_REPORT = os.getenv("LOOP_WATCHDOG_REPORT", "")
+# Number of recent stalls kept for /diagnostics/blocking
+BLOCKING_LOG_SIZE = int(os.getenv("BLOCKING_LOG_SIZE", "50"))
+
+WATCHDOG_INTERVAL = 0.02
+# Deepest stack kept per stall
+MAX_STACK_FRAMES = 40
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_WATCHDOG_FILE = os.path.abspath(__file__)
+
+def _is_app_frame(filename: str) -> bool:
+    filename = os.path.abspath(filename)
+    return (
+        filename.startswith(BACKEND_DIR)
+        and "site-packages" not in filename
+        and filename != _WATCHDOG_FILE
+    )
+
+def blocking_site(frames: List[traceback.FrameSummary]) -> str:
+    """Innermost application frame of a stack, as "routes/auth.py:142 in login" """
+    for frame in reversed(frames):
+        if _is_app_frame(frame.filename):
+            return f"{os.path.relpath(frame.filename, BACKEND_DIR)}:{frame.lineno} in {frame.name}"
+    if frames:
+        return f"{os.path.basename(frames[-1].filename)}:{frames[-1].lineno} in {frames[-1].name}"
+    return "unknown"
+
+class LoopWatchdog:
+    """Heartbeat on the event loop plus a thread that captures the loop's stack when the heartbeat stops"""
+
+    def __init__(self, threshold_ms: float = BLOCKING_THRESHOLD_MS):
+        self.threshold = threshold_ms / 1000
+        self.recent: Deque[Dict[str, Any]] = deque(maxlen=BLOCKING_LOG_SIZE)
+        self._last_tick = time.monotonic()
+        # Gap between the last two heartbeats beyond the interval, i.e. how long the loop was stuck
+        self._last_gap = 0.0
+        self._stall: Optional[Dict[str, Any]] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    async def _beat(self) -> None:
+        while True:
+            await asyncio.sleep(WATCHDOG_INTERVAL)
+            now = time.monotonic()
+            self._last_gap = max(now - self._last_tick - WATCHDOG_INTERVAL, 0.0)
+            self._last_tick = now
+
+    def _capture(self, stalled: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        frames = traceback.extract_stack(frame, limit=MAX_STACK_FRAMES) if frame is not None else []
+        self._stall = {
+            "at": time.time(),
+            "site": blocking_site(frames),
+            "stack": traceback.format_list(frames),
+            "pid": os.getpid(),
+        }
+        logger.warning(
+            f"Event loop blocked for more than {stalled * 1000:.0f}ms at {self._stall['site']}, stack:\n"
+            + "".join(self._stall["stack"])
+        )
+
+    def _record(self, stall: Dict[str, Any]) -> None:
+        # On the loop thread, like every other metric update
+        LOOP_BLOCKS.labels(stall["site"]).inc()
+        LOOP_BLOCK_DURATION.observe(stall["blocked_ms"] / 1000)
+        self.recent.append(stall)
+
+    def _finish(self) -> None:
+        stall, self._stall = self._stall, None
+        stall["blocked_ms"] = round(self._last_gap * 1000, 1)
+        try:
+            self._loop.call_soon_threadsafe(self._record, stall)
+        except RuntimeError:
+            # The loop closed while shutting down
+            pass
+        if LOOP_WATCHDOG_REPORT:
+            try:
+                with open(LOOP_WATCHDOG_REPORT, "a") as f:
+                    f.write(json.dumps(stall) + "\n")
+            except OSError as e:
+                logger.error(f"Could not write the blocking report: {e!r}")
+
+    def _watch(self) -> None:
+        while not self._stop.wait(WATCHDOG_INTERVAL):
+            stalled = time.monotonic() - self._last_tick
+            if stalled >= self.threshold + WATCHDOG_INTERVAL:
+                if self._stall is None:
+                    self._capture(stalled)
+            elif self._stall is not None and stalled < WATCHDOG_INTERVAL * 2:
+                # The heartbeat ran again, so _last_gap now holds the stall's length
+                self._finish()
+
+    def start(self) -> None:
+        """Start the heartbeat on the running loop and the watching thread"""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._stop.clear()
+        self._heartbeat = asyncio.create_task(self._beat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info(f"Loop watchdog reporting callbacks that block for more than {self.threshold * 1000:.0f}ms")
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._heartbeat:
+            self._heartbeat.cancel()
+            await asyncio.gather(self._heartbeat, return_exceptions=True)
+        if self._thread:
+            await asyncio.to_thread(self._thread.join, 1)
+
+    def get_recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        return list(self.recent)[-limit:][::-1]
+
+# Per worker process, like the other diagnostics (see serve.py)
+loop_watchdog = LoopWatchdog()
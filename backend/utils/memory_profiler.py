@@ -0,0 +1,271 @@
+"""
+Memory profiling with tracemalloc, started and read by an admin.
+
+Worker RSS grows under analytics-heavy traffic. To find the code that
+holds the memory:
+
+    POST /api/diagnostics/memory/start?frames=10   start tracing, take the baseline
+    GET  /api/diagnostics/memory/diff              growth since the baseline
+    GET  /api/diagnostics/memory/top               everything traced right now
+    POST /api/diagnostics/memory/stop              stop tracing, free the traces
+
+Allocations are grouped either by module ("sqlalchemy.orm.loading") or
+by site, the application line closest to the allocation
+("services/analytics.py:88"). With a few frames per trace, the rows of a
+scalars().all() show up under the route that asked for them even though
+SQLAlchemy allocated them.
+
+Tracing has a cost while it runs: every allocation records its stack,
+which slows the worker down and takes memory of its own (tracemalloc_kb
+in the responses). So it is off until started, records at most
+MEMORY_TRACE_MAX_FRAMES frames, and stops by itself after
+MEMORY_TRACE_MAX_SECONDS. Snapshots are aggregated in a thread, and of
+the baseline only the per-group totals are kept.
+
+ORM objects stay in their session's identity map until the session
+closes. /api/diagnostics/memory/sessions lists the identity-map size of
+every open session, and while tracing, the largest identity map each
+route's sessions reached.
+
+Tracing is per worker process (see serve.py): start, read and stop it on
+the same worker, e.g. by running one worker or checking the pid in the
+responses.
+"""
+import os
+import time
+import asyncio
+import logging
+import sysconfig
+import tracemalloc
+import weakref
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from utils.request_timing import current_route
+
+logger = logging.getLogger(__name__)
+
+# Frames recorded per allocation unless the start request asks otherwise
+MEMORY_TRACE_FRAMES = int(os.getenv("MEMORY_TRACE_FRAMES", "10"))
+# Tracing stops by itself after this long
+MEMORY_TRACE_MAX_SECONDS = float(os.getenv("MEMORY_TRACE_MAX_SECONDS", "600"))
+
+MEMORY_TRACE_MAX_FRAMES = 25
+GROUPINGS = ("module", "site")
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_STDLIB_DIR = sysconfig.get_paths()["stdlib"]
+# Allocations made by tracing and importing, not by the application
+_IGNORED = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+def _is_app_file(filename: str) -> bool:
+    return filename.startswith(BACKEND_DIR + os.sep) and "site-packages" not in filename
+
+@lru_cache(maxsize=4096)
+def _module_of(filename: str) -> str:
+    """Dotted module name of a source file, "sqlalchemy.orm.loading" or "routes.analytics" """
+    if filename.startswith("<"):
+        return filename
+    if "site-packages" + os.sep in filename:
+        path = filename.split("site-packages" + os.sep, 1)[1]
+    elif _is_app_file(filename):
+        path = os.path.relpath(filename, BACKEND_DIR)
+    elif filename.startswith(_STDLIB_DIR + os.sep):
+        path = os.path.relpath(filename, _STDLIB_DIR)
+    else:
+        path = os.path.basename(filename)
+    module = os.path.splitext(path)[0].replace(os.sep, ".")
+    return module[:-len(".__init__")] if module.endswith(".__init__") else module
+
+def _site_of(traceback: tracemalloc.Traceback) -> str:
+    """Innermost application line of an allocation, or the allocating line itself"""
+    for frame in reversed(traceback):
+        if _is_app_file(frame.filename):
+            return f"{os.path.relpath(frame.filename, BACKEND_DIR)}:{frame.lineno}"
+    frame = traceback[-1]
+    return f"{_module_of(frame.filename)}:{frame.lineno}"
+
+def _take_totals() -> Dict[str, Dict[str, List[int]]]:
+    """[bytes, blocks] per module and per site of everything traced right now"""
+    snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORED)
+    totals: Dict[str, Dict[str, List[int]]] = {grouping: {} for grouping in GROUPINGS}
+    for stat in snapshot.statistics("traceback"):
+        for grouping, key in (("module", _module_of(stat.traceback[-1].filename)), ("site", _site_of(stat.traceback))):
+            entry = totals[grouping].setdefault(key, [0, 0])
+            entry[0] += stat.size
+            entry[1] += stat.count
+    return totals
+
+def _rows(totals: Dict[str, List[int]], limit: int, baseline: Optional[Dict[str, List[int]]] = None) -> List[Dict[str, Any]]:
+    rows = []
+    for key in totals.keys() | (baseline.keys() if baseline is not None else set()):
+        size, count = totals.get(key, (0, 0))
+        row = {"group": key, "size_kb": round(size / 1024, 1), "count": count}
+        if baseline is not None:
+            base_size, base_count = baseline.get(key, (0, 0))
+            row["size_diff_kb"] = round((size - base_size) / 1024, 1)
+            row["count_diff"] = count - base_count
+        rows.append(row)
+    sort_key = "size_diff_kb" if baseline is not None else "size_kb"
+    rows.sort(key=lambda row: row[sort_key], reverse=True)
+    return rows[:limit]
+
+def _rss_kb() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError):
+        return None
+
+# Sessions of this worker that have begun a transaction; entries go away with the session
+_sessions: "weakref.WeakSet[Session]" = weakref.WeakSet()
+
+@event.listens_for(Session, "after_begin")
+def _track_session(session, transaction, connection) -> None:
+    if "memory_route" not in session.info:
+        # Sessions outside requests, or opened before routing, are background work
+        session.info["memory_route"] = current_route() or "background"
+        session.info["memory_opened_at"] = time.time()
+        _sessions.add(session)
+
+def _record_identity_map(session, instance) -> None:
+    # Listens to every loaded row, so only while tracing
+    route = session.info.get("memory_route", "background")
+    size = len(session.identity_map)
+    if size > memory_profiler.identity_map_peaks.get(route, 0):
+        memory_profiler.identity_map_peaks[route] = size
+
+class MemoryProfiler:
+    """tracemalloc tracing of this worker, with a baseline to diff against"""
+
+    def __init__(self):
+        self.started_at: Optional[float] = None
+        self.baseline_at: Optional[float] = None
+        # route -> largest identity map its sessions reached while tracing
+        self.identity_map_peaks: Dict[str, int] = {}
+        self._baseline: Optional[Dict[str, Dict[str, List[int]]]] = None
+        self._expiry: Optional[asyncio.Task] = None
+        # Snapshots and start/stop run one at a time
+        self._lock = asyncio.Lock()
+
+    @property
+    def tracing(self) -> bool:
+        return self.started_at is not None
+
+    async def start(self, frames: int = MEMORY_TRACE_FRAMES) -> Dict[str, Any]:
+        """Start tracing and take the baseline; when already tracing, only take a new baseline"""
+        async with self._lock:
+            if not self.tracing:
+                # PYTHONTRACEMALLOC may have started it at boot
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start(min(frames, MEMORY_TRACE_MAX_FRAMES))
+                self.started_at = time.time()
+                self.identity_map_peaks.clear()
+                event.listen(Session, "loaded_as_persistent", _record_identity_map)
+                self._expiry = asyncio.create_task(self._stop_after(MEMORY_TRACE_MAX_SECONDS))
+                logger.warning(
+                    f"Memory tracing started with {tracemalloc.get_traceback_limit()} frames, "
+                    f"stops within {MEMORY_TRACE_MAX_SECONDS:.0f}s"
+                )
+            self._baseline = await asyncio.to_thread(_take_totals)
+            self.baseline_at = time.time()
+            return self.status()
+
+    async def _stop_after(self, seconds: float) -> None:
+        await asyncio.sleep(seconds)
+        logger.warning(f"Memory tracing ran for {seconds:.0f}s, stopping it")
+        await self.stop()
+
+    async def stop(self) -> Dict[str, Any]:
+        """Stop tracing and free the traces and the baseline"""
+        async with self._lock:
+            if self.tracing:
+                if self._expiry is not None and self._expiry is not asyncio.current_task():
+                    self._expiry.cancel()
+                self._expiry = None
+                event.remove(Session, "loaded_as_persistent", _record_identity_map)
+                tracemalloc.stop()
+                self.started_at = None
+                self.baseline_at = None
+                self._baseline = None
+                logger.info("Memory tracing stopped")
+            return self.status()
+
+    async def diff(self, group_by: str = "module", limit: int = 20, reset: bool = False) -> Optional[Dict[str, Any]]:
+        """Groups that grew the most since the baseline; None when not tracing"""
+        async with self._lock:
+            if not self.tracing:
+                return None
+            totals = await asyncio.to_thread(_take_totals)
+            report = {
+                **self.status(),
+                "group_by": group_by,
+                "groups": _rows(totals[group_by], limit, self._baseline[group_by]),
+            }
+            if reset:
+                self._baseline = totals
+                self.baseline_at = time.time()
+            return report
+
+    async def top(self, group_by: str = "module", limit: int = 20) -> Optional[Dict[str, Any]]:
+        """Groups holding the most traced memory right now; None when not tracing"""
+        async with self._lock:
+            if not self.tracing:
+                return None
+            totals = await asyncio.to_thread(_take_totals)
+            return {**self.status(), "group_by": group_by, "groups": _rows(totals[group_by], limit)}
+
+    def status(self) -> Dict[str, Any]:
+        status = {
+            "pid": os.getpid(),
+            "tracing": self.tracing,
+            "rss_kb": _rss_kb(),
+        }
+        if self.tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            status.update({
+                "started_at": self.started_at,
+                "stops_at": self.started_at + MEMORY_TRACE_MAX_SECONDS,
+                "baseline_at": self.baseline_at,
+                "frames": tracemalloc.get_traceback_limit(),
+                "traced_kb": round(current / 1024, 1),
+                "traced_peak_kb": round(peak / 1024, 1),
+                "tracemalloc_kb": round(tracemalloc.get_tracemalloc_memory() / 1024, 1),
+            })
+        return status
+
+    def sessions(self, limit: int = 50) -> Dict[str, Any]:
+        """Identity-map size of every open session, largest first, and the peaks per route while tracing"""
+        sessions = []
+        for session in list(_sessions):
+            size = len(session.identity_map)
+            if size == 0 and not session.in_transaction():
+                continue
+            models = Counter(type(instance).__name__ for instance in session.identity_map.values())
+            sessions.append({
+                "route": session.info.get("memory_route"),
+                "opened_at": session.info.get("memory_opened_at"),
+                "identity_map_size": size,
+                "pending": len(session.new),
+                "by_model": dict(models.most_common(5)),
+            })
+        sessions.sort(key=lambda s: s["identity_map_size"], reverse=True)
+        return {
+            "pid": os.getpid(),
+            "open_sessions": len(sessions),
+            "identity_map_total": sum(s["identity_map_size"] for s in sessions),
+            "sessions": sessions[:limit],
+            "identity_map_peaks": dict(sorted(self.identity_map_peaks.items(), key=lambda item: -item[1])),
+        }
+
+# Per worker process, like the other diagnostics (see serve.py)
+memory_profiler = MemoryProfiler()
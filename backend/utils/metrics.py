@@ -0,0 +1,247 @@
+"""
+Minimal Prometheus metrics (text exposition format 0.0.4).
+
+The registry is per worker process. Under serve.py every sample carries a
+worker="<index>" label, so scrapes that land on different workers behind
+the shared port stay separate series; sum() across workers in queries.
+
+Metric values are plain attributes updated without locks: all updates
+happen on the event loop thread, where a read-modify-write cannot be
+interleaved with another coroutine. Collectors registered with
+register_collector refresh gauges that mirror external state (pool,
+caches) right before each scrape.
+"""
+import os
+import math
+from bisect import bisect_left
+from typing import Callable, Dict, List, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Set by serve.py for each worker; indexes are reused when a worker is recycled
+WORKER_ID = os.getenv("WORKER_ID")
+
+_metrics: List["_Metric"] = []
+_collectors: List[Callable[[], None]] = []
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _label_string(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    if WORKER_ID is not None:
+        pairs.append(f'worker="{WORKER_ID}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        _metrics.append(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children[key] = self._new_child()
+        return child
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in list(self._children.items()):
+            lines.extend(self._render_child(key, child))
+        return lines
+
+class _CounterValue:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        # Only ever goes up; rate() treats any decrease as a restart
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        self.value += amount
+
+class _GaugeValue(_CounterValue):
+    __slots__ = ()
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterValue()
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+    def _render_child(self, key, child) -> List[str]:
+        return [f"{self.name}{_label_string(self.labelnames, key)} {_format_value(child.value)}"]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeValue()
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def dec(self, amount: float = 1) -> None:
+        self.labels().dec(amount)
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = bounds
+        # Per-bucket counts; made cumulative only when rendered
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _render_child(self, key, child) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), child.counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{self.name}_bucket{_label_string(self.labelnames, key, le)} {cumulative}")
+        labels = _label_string(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+def register_collector(collector: Callable[[], None]) -> None:
+    """Run collector before every scrape, typically to refresh mirrored gauges"""
+    _collectors.append(collector)
+
+def render_metrics() -> str:
+    for collector in _collectors:
+        collector()
+    # Derived from the cache counters, so it goes after the collectors
+    _collect_cache_hit_ratio()
+    lines: List[str] = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# HTTP
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests by route template and status", ["method", "route", "status"])
+HTTP_REQUEST_DURATION = Histogram("http_request_duration_seconds", "HTTP request latency by route template", ["method", "route"])
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being handled")
+
+# Database
+DB_QUERIES = Counter("db_queries_total", "SQL statements executed")
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "SQL statement execution time",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+DB_POOL_SIZE = Gauge("db_pool_size", "Configured connection pool size", ["engine"])
+DB_POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Connections currently checked out", ["engine"])
+DB_POOL_OVERFLOW = Gauge("db_pool_overflow", "Connections open beyond the pool size", ["engine"])
+DB_POOL_WAIT = Histogram(
+    "db_pool_wait_seconds", "Time spent waiting for a pooled connection", ["engine"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+)
+DB_POOL_WAIT_RECENT = Gauge("db_pool_wait_recent_seconds", "Average connection checkout wait over the last few seconds")
+DB_CONNECTION_HOLD = Histogram(
+    "db_connection_hold_seconds", "How long connections stayed checked out of the pool, by route",
+    ["engine", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+)
+DB_CONNECTIONS_HELD_LONG = Counter("db_connections_held_long_total", "Connections held past the warning threshold, by route", ["route"])
+DB_CONNECTIONS_HELD_STREAMING = Counter(
+    "db_connections_held_streaming_total", "Connections checked out before a streaming response started and held into it", ["route"]
+)
+STATEMENT_TIMEOUTS = Counter("statement_timeouts_total", "Statements cancelled by their route's statement timeout", ["route"])
+
+# Load shedding
+EVENT_LOOP_LAG = Gauge("event_loop_lag_seconds", "How late the event loop runs scheduled callbacks, smoothed")
+LOAD_SHEDDING_ACTIVE = Gauge("load_shedding_active", "1 while low-priority routes are answered with 503")
+REQUESTS_SHED = Counter("requests_shed_total", "Requests answered with 503 because the worker was overloaded", ["route"])
+LOOP_BLOCKS = Counter("event_loop_blocks_total", "Callbacks that blocked the event loop past the threshold, by code site", ["site"])
+LOOP_BLOCK_DURATION = Histogram(
+    "event_loop_block_seconds", "How long blocking callbacks held up the event loop",
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+
+# Caches
+CACHE_REQUESTS = Counter("cache_requests_total", "Cache lookups by cache and result (hit/miss)", ["cache", "result"])
+CACHE_HIT_RATIO = Gauge("cache_hit_ratio", "Share of cache lookups that were hits, since start", ["cache"])
+CACHE_INVALIDATIONS = Counter("cache_invalidations_total", "Cache scopes invalidated by cache", ["cache"])
+CACHE_ERRORS = Counter("cache_errors_total", "Failed cache backend operations by cache", ["cache"])
+SINGLE_FLIGHT_CALLS = Counter(
+    "single_flight_calls_total", "Coalesced endpoint calls by role (leader ran it, follower shared it)", ["endpoint", "role"]
+)
+SINGLE_FLIGHT_QUERIES_SAVED = Counter(
+    "single_flight_queries_saved_total", "SQL statements followers did not run because they shared a call", ["endpoint"]
+)
+
+# Coach
+COACH_STREAM_DURATION = Histogram(
+    "coach_stream_duration_seconds", "Duration of coach answer streams by outcome", ["outcome"],
+    buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+)
+COACH_FIRST_TOKEN = Histogram(
+    "coach_first_token_seconds", "Time until the provider streamed the first chunk",
+    buckets=(0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0, 15.0)
+)
+COACH_TOKENS = Counter("coach_tokens_total", "LLM tokens used by the coach", ["kind"])
+SSE_STREAMS_ACTIVE = Gauge("sse_streams_active", "Server-Sent Event streams currently open")
+SSE_STREAMS_CUT = Counter("sse_streams_cut_total", "Streams ended early because the worker was shutting down")
+
+def _collect_cache_hit_ratio():
+    totals: Dict[str, List[float]] = {}
+    for (cache, result), child in list(CACHE_REQUESTS._children.items()):
+        entry = totals.setdefault(cache, [0.0, 0.0])
+        entry[0 if result == "hit" else 1] += child.value
+    for cache, (hits, misses) in totals.items():
+        if hits + misses:
+            CACHE_HIT_RATIO.labels(cache).set(round(hits / (hits + misses), 4))
@@ -0,0 +1,217 @@
+"""
+On-demand sampling profiler for single requests.
+
+An admin opts a request in with the X-Profile: 1 header (or ?profile=1)
+next to a valid X-Admin-Token. A background thread then samples the
+request every PROFILE_INTERVAL_MS until the response is fully sent:
+
+- while the request's task is running, the event loop thread's stack;
+- while it is suspended, the task's chain of awaiting coroutines, ending
+  in a "[waiting ...]" frame, so time spent awaiting the database or the
+  LLM shows up under the await that caused it.
+
+Samples are stored as collapsed stacks ("a;b;c 42"), the input format of
+flamegraph.pl, inferno and speedscope, and served by
+/api/diagnostics/profiles/{id}. The response carries X-Profile-Id.
+
+Sampling takes the GIL every interval, so at most PROFILE_MAX_PER_MINUTE
+requests are profiled per worker and only one at a time; requests over
+the limit run normally and get X-Profile: rate-limited.
+"""
+import os
+import sys
+import time
+import uuid
+import asyncio
+import threading
+from collections import Counter, deque, OrderedDict
+from typing import Deque, Dict, Any, List, Optional
+from urllib.parse import parse_qs
+
+from auth.security import is_admin_token
+from utils.request_timing import route_template
+
+# Kill switch; profiling still needs the admin token per request
+REQUEST_PROFILING = os.getenv("REQUEST_PROFILING", "true").lower() == "true"
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_MAX_PER_MINUTE = int(os.getenv("PROFILE_MAX_PER_MINUTE", "6"))
+# Sampling stops after this long, e.g. for long coach streams
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "30"))
+# Finished profiles kept in memory
+PROFILE_STORE_SIZE = int(os.getenv("PROFILE_STORE_SIZE", "20"))
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+_MAX_DEPTH = 200
+
+# Per worker process, as is the rate limit (see serve.py)
+profiles: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_profile_starts: Deque[float] = deque()
+_active = 0
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    if filename.startswith(_BACKEND_DIR):
+        filename = filename[len(_BACKEND_DIR):]
+    elif "site-packages" + os.sep in filename:
+        filename = filename.split("site-packages" + os.sep, 1)[1]
+    else:
+        filename = os.path.basename(filename)
+    # ";" separates frames in the collapsed format
+    return f"{code.co_qualname} ({filename}:{frame.f_lineno})".replace(";", ",")
+
+def _await_chain(coro) -> List[str]:
+    """Labels of a suspended coroutine and everything it is awaiting, outermost first"""
+    labels = []
+    while coro is not None and len(labels) < _MAX_DEPTH:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None) or getattr(coro, "ag_frame", None)
+        if frame is None:
+            break
+        labels.append(_frame_label(frame))
+        awaited = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None) or getattr(coro, "ag_await", None)
+        if awaited is not None and not hasattr(awaited, "cr_frame") and not hasattr(awaited, "gi_frame"):
+            # asyncio futures are awaited through their C iterator type
+            kind = type(awaited).__name__.replace("FutureIter", "Future")
+            labels.append(f"[waiting {kind}]")
+            break
+        coro = awaited
+    return labels
+
+def _thread_stack(frame, stop_code) -> List[str]:
+    """Labels of a thread's stack, outermost first, starting at the frame running stop_code"""
+    labels = []
+    while frame is not None and len(labels) < _MAX_DEPTH:
+        labels.append(_frame_label(frame))
+        if frame.f_code is stop_code:
+            break
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+class _Sampler(threading.Thread):
+    def __init__(self, task: asyncio.Task, loop_thread_id: int):
+        super().__init__(name="request-profiler", daemon=True)
+        self.task = task
+        self.loop_thread_id = loop_thread_id
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        deadline = time.monotonic() + PROFILE_MAX_SECONDS
+        interval = PROFILE_INTERVAL_MS / 1000
+        while not self._stop_event.wait(interval) and time.monotonic() < deadline:
+            try:
+                self._sample()
+            except Exception:
+                # Frames change under us; a torn sample is simply skipped
+                continue
+
+    def _sample(self) -> None:
+        coro = self.task.get_coro()
+        if getattr(coro, "cr_running", False):
+            frame = sys._current_frames().get(self.loop_thread_id)
+            stack = _thread_stack(frame, coro.cr_code)
+        else:
+            stack = _await_chain(coro)
+        if stack:
+            self.stacks[";".join(stack)] += 1
+            self.samples += 1
+
+    def stop(self) -> None:
+        """Ask the thread to finish; join it off the event loop before reading the stacks"""
+        self._stop_event.set()
+
+def _acquire_slot() -> bool:
+    global _active
+    now = time.monotonic()
+    while _profile_starts and now - _profile_starts[0] > 60:
+        _profile_starts.popleft()
+    if _active or len(_profile_starts) >= PROFILE_MAX_PER_MINUTE:
+        return False
+    _profile_starts.append(now)
+    _active += 1
+    return True
+
+def _release_slot() -> None:
+    global _active
+    _active -= 1
+
+def _store(profile: Dict[str, Any]) -> None:
+    profiles[profile["id"]] = profile
+    while len(profiles) > PROFILE_STORE_SIZE:
+        profiles.popitem(last=False)
+
+def list_profiles() -> List[Dict[str, Any]]:
+    """Stored profiles without their stacks, newest first"""
+    return [{k: v for k, v in p.items() if k != "stacks"} for p in reversed(profiles.values())]
+
+def collapsed_stacks(profile_id: str) -> Optional[str]:
+    """A stored profile in collapsed-stack format, or None if unknown"""
+    profile = profiles.get(profile_id)
+    if profile is None:
+        return None
+    return "".join(f"{stack} {count}\n" for stack, count in profile["stacks"].most_common())
+
+def _wants_profile(scope) -> bool:
+    headers = dict(scope.get("headers") or [])
+    requested = headers.get(b"x-profile") == b"1" or parse_qs(scope.get("query_string", b"").decode()).get("profile") == ["1"]
+    if not requested:
+        return False
+    token = headers.get(b"x-admin-token")
+    return is_admin_token(token.decode("latin-1") if token else None)
+
+class ProfilingMiddleware:
+    """Run admin-flagged requests under the sampling profiler"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not REQUEST_PROFILING or not _wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        if not _acquire_slot():
+            async def send_rate_limited(message):
+                if message["type"] == "http.response.start":
+                    message["headers"] = list(message.get("headers", [])) + [(b"x-profile", b"rate-limited")]
+                await send(message)
+
+            await self.app(scope, receive, send_rate_limited)
+            return
+
+        profile_id = uuid.uuid4().hex[:12]
+        status_code = 500
+
+        async def send_with_profile_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        sampler = _Sampler(asyncio.current_task(), threading.get_ident())
+        started_at = time.time()
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            sampler.stop()
+            _release_slot()
+            duration_ms = round((time.perf_counter() - started) * 1000, 1)
+            # A sample may be in progress; waiting for it here would stall the loop
+            await asyncio.to_thread(sampler.join)
+            _store({
+                "id": profile_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": route_template(scope),
+                "status": status_code,
+                "started_at": started_at,
+                "duration_ms": duration_ms,
+                "interval_ms": PROFILE_INTERVAL_MS,
+                "samples": sampler.samples,
+                "stacks": sampler.stacks,
+            })
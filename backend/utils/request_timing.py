@@ -0,0 +1,106 @@
+import os
+import time
+import logging
+from collections import deque
+from contextvars import ContextVar
+from typing import Deque, Dict, Any, List, Optional
+
+from data.query_stats import RequestQueryStats, current_query_stats
+from utils.metrics import HTTP_REQUESTS, HTTP_REQUEST_DURATION, HTTP_IN_FLIGHT
+
+logger = logging.getLogger("request_metrics")
+
+# Add the Server-Timing header with database and total time to every response
+SERVER_TIMING_HEADER = os.getenv("SERVER_TIMING_HEADER", "true").lower() == "true"
+# Number of recent requests kept in memory for /diagnostics/requests
+REQUEST_LOG_SIZE = int(os.getenv("REQUEST_LOG_SIZE", "200"))
+
+# Per worker process, like the other diagnostics (see serve.py)
+recent_requests: Deque[Dict[str, Any]] = deque(maxlen=REQUEST_LOG_SIZE)
+# ASGI scope of the request being handled, for code that attributes work to routes
+current_request_scope: ContextVar[Optional[Dict[str, Any]]] = ContextVar("current_request_scope", default=None)
+
+def route_template(scope) -> Optional[str]:
+    """Path template of the matched API route ("/api/goals/{goal_id}"), if any"""
+    return getattr(scope.get("route"), "path", None)
+
+def current_route() -> Optional[str]:
+    """Route template of the request being handled; None outside requests or before routing"""
+    scope = current_request_scope.get()
+    return route_template(scope) if scope is not None else None
+
+def get_recent_requests(limit: int = 50) -> List[Dict[str, Any]]:
+    return list(recent_requests)[-limit:][::-1]
+
+class RequestTimingMiddleware:
+    """
+    Count SQL statements and database time per request.
+
+    The totals go out as a Server-Timing header, a log line with
+    structured fields and an entry in an in-memory ring buffer; latency
+    and status also feed the Prometheus HTTP metrics.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestQueryStats()
+        token = current_query_stats.set(stats)
+        scope_token = current_request_scope.set(scope)
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if SERVER_TIMING_HEADER:
+                    # Streaming responses report what ran before the first byte
+                    total_ms = (time.perf_counter() - started) * 1000
+                    timing = (
+                        f'db;dur={stats.db_time * 1000:.1f};desc="{stats.count} queries", '
+                        f"app;dur={total_ms:.1f}"
+                    )
+                    message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing.encode())]
+            elif message["type"] == "http.response.body" and message.get("more_body") and "streaming_since" not in scope:
+                # Connections still held from here on are held into the stream (data.connection_lifetimes)
+                scope["streaming_since"] = time.perf_counter()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            current_query_stats.reset(token)
+            current_request_scope.reset(scope_token)
+            self._record(scope, status_code, stats, time.perf_counter() - started)
+
+    def _record(self, scope, status_code: int, stats: RequestQueryStats, elapsed: float) -> None:
+        template = route_template(scope)
+        record = {
+            "method": scope["method"],
+            "route": template or scope["path"],
+            "status": status_code,
+            "duration_ms": round(elapsed * 1000, 2),
+            "db_queries": stats.count,
+            "db_ms": round(stats.db_time * 1000, 2),
+            "slowest_query_ms": round(stats.slowest_time * 1000, 2),
+            "slowest_query": stats.slowest_statement,
+            "at": time.time(),
+        }
+        # Raw paths (static files, 404s) would make label cardinality unbounded
+        metric_route = template or "unmatched"
+        HTTP_REQUESTS.labels(record["method"], metric_route, status_code).inc()
+        HTTP_REQUEST_DURATION.labels(record["method"], metric_route).observe(elapsed)
+        recent_requests.append(record)
+        logger.info(
+            f"{record['method']} {record['route']} status={status_code} duration_ms={record['duration_ms']} "
+            f"db_queries={stats.count} db_ms={record['db_ms']}",
+            extra={"request_metrics": record}
+        )
@@ -0,0 +1,122 @@
+"""
+Single-flight coalescing for identical concurrent reads.
+
+When the frontend opens, several components (or tabs) ask for the same
+summary at the same moment. With @coalesce_per_user on an endpoint, the
+first request for a given user, endpoint and query parameters runs the
+handler. Identical requests that arrive while it is still running wait for
+it and get the same result, or the same exception, instead of running
+their own copy of the queries. Nothing is kept once the call finishes;
+caching across time is data.cache's job, so the decorator goes outside
+@cached_per_user and also coalesces the misses.
+
+Calls are only shared within one worker process (see serve.py). If the
+leading request is cancelled (client gone, timeout), the requests waiting
+on it do not inherit the cancellation. One of them runs the handler
+itself.
+
+Each endpoint counts its leaders and followers. Followers also add the
+statement count of the call they shared (data.query_stats) to the queries
+saved. Both appear in /metrics and in /api/diagnostics/single-flight.
+"""
+import asyncio
+import functools
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from data.query_stats import current_query_stats
+from utils.metrics import SINGLE_FLIGHT_CALLS, SINGLE_FLIGHT_QUERIES_SAVED
+
+class _LeaderCancelled(Exception):
+    """The call followers were waiting on was cancelled before it finished"""
+
+class _Call:
+    """One running call and the statements it issued"""
+
+    __slots__ = ("future", "queries")
+
+    def __init__(self):
+        self.future = asyncio.get_running_loop().create_future()
+        self.queries = 0
+
+class SingleFlight:
+    """At most one running call per key; concurrent callers with the same key share its outcome"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self.leaders = 0
+        self.followers = 0
+        self.queries_saved = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        while key in self._calls:
+            call = self._calls[key]
+            try:
+                # Shielded, so a follower that is cancelled does not cancel the shared call
+                result = await asyncio.shield(call.future)
+            except _LeaderCancelled:
+                continue
+            except Exception:
+                self._record_follower(call)
+                raise
+            self._record_follower(call)
+            return result
+        return await self._lead(key, fn)
+
+    def _record_follower(self, call: _Call) -> None:
+        self.followers += 1
+        self.queries_saved += call.queries
+        SINGLE_FLIGHT_CALLS.labels(self.name, "follower").inc()
+        SINGLE_FLIGHT_QUERIES_SAVED.labels(self.name).inc(call.queries)
+
+    async def _lead(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        call = _Call()
+        self._calls[key] = call
+        self.leaders += 1
+        SINGLE_FLIGHT_CALLS.labels(self.name, "leader").inc()
+        stats = current_query_stats.get()
+        queries_before = stats.count if stats else 0
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            call.future.set_exception(_LeaderCancelled())
+            raise
+        except Exception as e:
+            call.queries = stats.count - queries_before if stats else 0
+            call.future.set_exception(e)
+            raise
+        else:
+            call.queries = stats.count - queries_before if stats else 0
+            call.future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+            if not call.future.done():
+                call.future.set_exception(_LeaderCancelled())
+            # Followers may all be gone; retrieve the exception so asyncio does not warn about it
+            call.future.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "queries_saved": self.queries_saved,
+        }
+
+_groups: Dict[str, SingleFlight] = {}
+
+def single_flight_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: group.stats() for name, group in _groups.items()}
+
+def coalesce_per_user(endpoint):
+    """Share one run of an endpoint between identical concurrent requests of the same user"""
+    # "analytics.get_financial_health"
+    name = f"{endpoint.__module__.rsplit('.', 1)[-1]}.{endpoint.__name__}"
+    group = _groups.setdefault(name, SingleFlight(name))
+
+    @functools.wraps(endpoint)
+    async def wrapper(**kwargs):
+        params = tuple(sorted((name, str(value)) for name, value in kwargs.items() if name not in ("current_user", "db")))
+        return await group.do((kwargs["current_user"].id, params), lambda: endpoint(**kwargs))
+    return wrapper
@@ -0,0 +1,29 @@
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+def calculate_spending_volatility(daily_amounts: List[float]) -> float:
+    """Population standard deviation of daily spending (0 with fewer than two days)"""
+    if len(daily_amounts) <= 1:
+        return 0.0
+    mean = sum(daily_amounts) / len(daily_amounts)
+    variance = sum((x - mean) ** 2 for x in daily_amounts) / len(daily_amounts)
+    return variance ** 0.5
+
+def find_most_active_month(dates: Iterable[datetime]) -> Optional[str]:
+    """Month with the most transactions, formatted like "March 2025" """
+    # Group transactions by month manually
+    month_counts = {}
+    for transaction_date in dates:
+        month_key = transaction_date.strftime("%Y-%m")
+        month_counts[month_key] = month_counts.get(month_key, 0) + 1
+
+    if not month_counts:
+        return None
+    # Find the month with the most transactions
+    most_active_month_key = max(month_counts, key=month_counts.get)
+    # Convert to readable format
+    try:
+        month_date = datetime.strptime(most_active_month_key, "%Y-%m")
+        return month_date.strftime("%B %Y")
+    except ValueError:
+        return None
@@ -0,0 +1,152 @@
+import os
+import time
+import asyncio
+import logging
+from typing import AsyncIterator, Optional
+import anyio
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+from utils.drain import stream_deadline
+from utils.metrics import SSE_STREAMS_ACTIVE, SSE_STREAMS_CUT
+
+logger = logging.getLogger(__name__)
+
+# Deltas are buffered until either limit is hit, so one event carries many tokens
+SSE_COALESCE_WINDOW = float(os.getenv("SSE_COALESCE_WINDOW_MS", "20")) / 1000
+SSE_COALESCE_MAX_CHARS = int(os.getenv("SSE_COALESCE_MAX_CHARS", "512"))
+# Idle connections get a comment line so proxies do not time them out
+SSE_HEARTBEAT_INTERVAL = float(os.getenv("SSE_HEARTBEAT_INTERVAL", "15"))
+# Reconnection delay suggested to EventSource clients, in milliseconds
+SSE_RETRY_MS = 3000
+
+HEARTBEAT = ": ping\n\n"
+
+def format_event(data: str, event: Optional[str] = None, event_id: Optional[int] = None) -> str:
+    """Serialize one Server-Sent Event; multi-line data becomes several data fields"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    for line in data.split("\n"):
+        lines.append(f"data: {line}")
+    return "\n".join(lines) + "\n\n"
+
+async def coalesce_events(
+    request: Request,
+    deltas: AsyncIterator[str],
+    window: float = SSE_COALESCE_WINDOW,
+    max_chars: int = SSE_COALESCE_MAX_CHARS,
+    heartbeat: float = SSE_HEARTBEAT_INTERVAL
+) -> AsyncIterator[str]:
+    """
+    Turn a stream of small text deltas into framed SSE events.
+
+    Deltas are read by a separate task so heartbeats and disconnect checks
+    keep running while the upstream is silent. When the client goes away
+    the reader task is cancelled, which closes the upstream request. A
+    stream still open when its draining worker runs out of time ends with
+    an error event (see utils.drain).
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    finished = object()
+
+    async def pump():
+        try:
+            async for delta in deltas:
+                queue.put_nowait(delta)
+            queue.put_nowait(finished)
+        except Exception as e:
+            queue.put_nowait(e)
+
+    reader = asyncio.create_task(pump())
+    event_id = 0
+    buffer = []
+    buffered = 0
+    flush_at = None
+    last_sent = time.monotonic()
+
+    SSE_STREAMS_ACTIVE.inc()
+    try:
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        while True:
+            now = time.monotonic()
+            deadline = flush_at if flush_at is not None else last_sent + heartbeat
+            # A draining worker's deadline comes before the next flush or heartbeat
+            shutdown_at = stream_deadline()
+            cut_off = shutdown_at is not None and shutdown_at <= deadline
+            if cut_off:
+                deadline = shutdown_at
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=max(deadline - now, 0))
+            except asyncio.TimeoutError:
+                if cut_off:
+                    if buffer:
+                        event_id += 1
+                        yield format_event("".join(buffer), event_id=event_id)
+                    logger.info("Worker shutting down, ending SSE stream")
+                    SSE_STREAMS_CUT.inc()
+                    event_id += 1
+                    yield format_event("server restarting", event="error", event_id=event_id)
+                    break
+                if buffer:
+                    event_id += 1
+                    yield format_event("".join(buffer), event_id=event_id)
+                    buffer, buffered, flush_at = [], 0, None
+                else:
+                    if await request.is_disconnected():
+                        logger.info("SSE client disconnected, cancelling upstream")
+                        break
+                    yield HEARTBEAT
+                last_sent = time.monotonic()
+                continue
+
+            if isinstance(item, str):
+                buffer.append(item)
+                buffered += len(item)
+                if flush_at is None:
+                    flush_at = time.monotonic() + window
+                if buffered < max_chars and time.monotonic() < flush_at:
+                    continue
+
+            if buffer:
+                event_id += 1
+                yield format_event("".join(buffer), event_id=event_id)
+                buffer, buffered, flush_at = [], 0, None
+                last_sent = time.monotonic()
+
+            if item is finished:
+                event_id += 1
+                yield format_event("", event="done", event_id=event_id)
+                break
+            if isinstance(item, Exception):
+                logger.warning(f"SSE source failed: {item!r}")
+                event_id += 1
+                yield format_event("stream failed", event="error", event_id=event_id)
+                break
+    finally:
+        SSE_STREAMS_ACTIVE.dec()
+        reader.cancel()
+        await asyncio.gather(reader, return_exceptions=True)
+
+class EventSourceResponse(StreamingResponse):
+    """Streaming response for SSE that always closes its source, even on disconnect"""
+
+    media_type = "text/event-stream"
+
+    def __init__(self, content: AsyncIterator[str], headers: Optional[dict] = None, **kwargs):
+        headers = {
+            "Cache-Control": "no-cache",
+            # Disable proxy buffering (nginx) so events reach the client immediately
+            "X-Accel-Buffering": "no",
+            **(headers or {})
+        }
+        super().__init__(content, headers=headers, **kwargs)
+
+    async def stream_response(self, send) -> None:
+        try:
+            await super().stream_response(send)
+        finally:
+            with anyio.CancelScope(shield=True):
+                await self.body_iterator.aclose()
@@ -1,6 +1,14 @@
+import os
 import time
+import asyncio
+import logging
+from typing import Iterator
+
 import psycopg2
-import os
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
 
 host = os.getenv("POSTGRES_HOST", "localhost")
 port = os.getenv("POSTGRES_PORT", "5432")
@@ -8,18 +16,56 @@ user = os.getenv("POSTGRES_USER", "postgres")
 password = os.getenv("POSTGRES_PASSWORD", "postgres")
 dbname = os.getenv("POSTGRES_DB", "postgres")
 
-while True:
-    try:
-        conn = psycopg2.connect(
-            host=host,
-            port=port,
-            user=user,
-            password=password,
-            dbname=dbname
-        )
-        conn.close()
-        print("✅ PostgreSQL is ready.")
-        break
-    except psycopg2.OperationalError:
-        print("⏳ Waiting for PostgreSQL...")
-        time.sleep(1)
+# Give up waiting after this many seconds
+DB_WAIT_TIMEOUT = float(os.getenv("DB_WAIT_TIMEOUT", "60"))
+# First retry delay; doubled after every failed attempt up to the maximum
+DB_WAIT_INITIAL_DELAY = float(os.getenv("DB_WAIT_INITIAL_DELAY", "0.05"))
+DB_WAIT_MAX_DELAY = float(os.getenv("DB_WAIT_MAX_DELAY", "2"))
+
+def backoff_delays(initial: float = DB_WAIT_INITIAL_DELAY, maximum: float = DB_WAIT_MAX_DELAY) -> Iterator[float]:
+    """Exponentially growing retry delays, capped at maximum"""
+    delay = initial
+    while True:
+        yield delay
+        delay = min(delay * 2, maximum)
+
+def wait_for_postgres(timeout: float = DB_WAIT_TIMEOUT) -> None:
+    """Block until PostgreSQL accepts connections (used by entrypoint.sh before migrations)"""
+    deadline = time.monotonic() + timeout
+    for delay in backoff_delays():
+        try:
+            conn = psycopg2.connect(
+                host=host,
+                port=port,
+                user=user,
+                password=password,
+                dbname=dbname,
+                connect_timeout=max(1, int(DB_WAIT_MAX_DELAY))
+            )
+            conn.close()
+            print("✅ PostgreSQL is ready.")
+            return
+        except psycopg2.OperationalError:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"PostgreSQL not ready after {timeout:g}s")
+            print(f"⏳ Waiting for PostgreSQL, retrying in {min(delay, remaining):.2f}s...")
+            time.sleep(min(delay, remaining))
+
+async def wait_for_database(engine: AsyncEngine, timeout: float = DB_WAIT_TIMEOUT) -> None:
+    """Retry SELECT 1 on the app's engine with exponential backoff until it succeeds"""
+    deadline = time.monotonic() + timeout
+    for attempt, delay in enumerate(backoff_delays(), start=1):
+        try:
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+            return
+        except Exception as e:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"Database not ready after {timeout:g}s") from e
+            logger.info(f"Database not ready (attempt {attempt}: {e.__class__.__name__}), retrying in {min(delay, remaining):.2f}s")
+            await asyncio.sleep(min(delay, remaining))
+
+if __name__ == "__main__":
+    wait_for_postgres()
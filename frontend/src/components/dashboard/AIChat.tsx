@@ -16,28 +16,64 @@ const initialMessage: Message = {
   content: "Привет! Я — BaiAI, ваш личный финансовый коуч. Чем могу помочь сегодня?"
 };
 
+const CONVERSATION_KEY = 'bai-conversation-id';
+
+const parseSSEEvent = (rawEvent: string): { event: string; data: string | null } => {
+  let event = "message";
+  const dataLines: string[] = [];
+  for (const line of rawEvent.split("\n")) {
+    if (line.startsWith(":")) continue; // heartbeat / comment
+    const separator = line.indexOf(":");
+    const field = separator === -1 ? line : line.slice(0, separator);
+    let value = separator === -1 ? "" : line.slice(separator + 1);
+    if (value.startsWith(" ")) value = value.slice(1);
+    if (field === "event") event = value;
+    if (field === "data") dataLines.push(value);
+  }
+  return { event, data: dataLines.length ? dataLines.join("\n") : null };
+};
+
 const streamAIResponse = async (userMessageContent: string, onChunk: (chunk: string) => void) => {
   const token = localStorage.getItem("token");
+  const conversationId = localStorage.getItem(CONVERSATION_KEY);
   const response = await fetch("/api/coach/ask", {
     method: "POST",
     headers: {
       "Content-Type": "application/json",
       ...(token ? { Authorization: `Bearer ${token}` } : {})
     },
-    body: JSON.stringify({ message: userMessageContent })
+    body: JSON.stringify({ message: userMessageContent, ...(conversationId ? { conversation_id: conversationId } : {}) })
   });
+  if (response.status === 404 && conversationId) {
+    // Разговор удалён на сервере — начинаем новый
+    localStorage.removeItem(CONVERSATION_KEY);
+    return streamAIResponse(userMessageContent, onChunk);
+  }
+  const newConversationId = response.headers.get("X-Conversation-Id");
+  if (newConversationId) localStorage.setItem(CONVERSATION_KEY, newConversationId);
   if (!response.body) throw new Error("Нет ответа от сервера");
   const reader = response.body.getReader();
   const decoder = new TextDecoder();
   let done = false;
   let fullText = "";
+  let pending = "";
   while (!done) {
     const { value, done: doneReading } = await reader.read();
     done = doneReading;
     if (value) {
-      const chunk = decoder.decode(value);
-      fullText += chunk;
-      onChunk(fullText);
+      pending += decoder.decode(value, { stream: true });
+      // Ответ приходит в виде SSE-событий, разделённых пустой строкой
+      const events = pending.split("\n\n");
+      pending = events.pop() ?? "";
+      for (const rawEvent of events) {
+        const { event, data } = parseSSEEvent(rawEvent);
+        if (event === "done") return;
+        if (event === "error") throw new Error("Ошибка при получении ответа");
+        if (data !== null) {
+          fullText += data;
+          onChunk(fullText);
+        }
+      }
     }
   }
 };
@@ -80,6 +116,7 @@ export default function AIChat() {
 
   const handleClearChat = () => {
     localStorage.removeItem('bai-chat');
+    localStorage.removeItem(CONVERSATION_KEY);
     setMessages([initialMessage]);
   };
   